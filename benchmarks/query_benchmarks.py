@@ -0,0 +1,167 @@
+# query_benchmarks.py
+# Times representative ranking queries against MovieGenreFact_dim under different physical designs
+# (utils.physical_design). The star schema is built once from synthetic data and reloaded with each design,
+# so the only difference between runs is the fact table's storage, indexes and statistics.
+# Runs against a sqlite stand-in by default; pass --sql-url to measure a real SQL Server / Azure SQL database.
+#
+#   python -m benchmarks.query_benchmarks --titles 250000 --designs keys_only default
+#   python -m benchmarks.query_benchmarks --designs keys_only columnstore --sql-url "mssql+pyodbc://..."
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import time
+
+import sqlalchemy as sa
+
+from benchmarks.synthetic_data import generate_datasets
+from utils.local_blob import LocalBlobServiceClient
+from utils.physical_design import PhysicalDesign, decade_boundaries
+from utils.runtime import PipelineRuntime, set_runtime
+
+DESIGNS = {
+    # The fact table as it was before physical designs: the primary key only
+    "keys_only": PhysicalDesign(fk_indexes=False, year_index=False, statistics=None),
+    "fk_indexes": PhysicalDesign(year_index=False),
+    "default": PhysicalDesign(),
+    "partitioned": PhysicalDesign(partition_years=decade_boundaries()),
+    "columnstore": PhysicalDesign(storage="columnstore", partition_years=decade_boundaries()),
+}
+
+
+def _tables(schema: str):
+    metadata = sa.MetaData(schema=schema)
+    fact = sa.Table("MovieGenreFact_dim", metadata, *[sa.Column(name) for name in
+                    ["MovieID", "GenreID", "MovieTypeID", "CountryID", "Rating", "NumRatings", "ReleaseYear", "Popularity"]])
+    movie = sa.Table("Movie_dim", metadata, sa.Column("MovieID"), sa.Column("MovieTitle"))
+    country = sa.Table("Country_dim", metadata, sa.Column("CountryID"), sa.Column("Continent"))
+    return fact, movie, country
+
+
+def query_params(engine, schema: str):
+    # The most common genre, country, movie type and year, so every query has work to do
+    fact, _, _ = _tables(schema)
+    params = {}
+    with engine.connect() as con:
+        for column in ["GenreID", "CountryID", "MovieTypeID", "ReleaseYear"]:
+            c = fact.c[column]
+            params[column] = con.execute(sa.select(c).group_by(c).order_by(sa.func.count().desc()).limit(1)).scalar()
+    return params
+
+
+def ranking_queries(schema: str, params: dict):
+    fact, movie, country = _tables(schema)
+    top = [fact.c.Rating.desc(), fact.c.NumRatings.desc()]
+    ranked = sa.select(movie.c.MovieTitle, fact.c.Rating, fact.c.NumRatings).join(movie, movie.c.MovieID == fact.c.MovieID)
+    year = params["ReleaseYear"]
+    return {
+        # GET /movies/top?genre=...&year=...
+        "top_genre_year": ranked.where(fact.c.GenreID == params["GenreID"], fact.c.ReleaseYear == year)
+                                .order_by(*top).limit(10),
+        # GET /movies/top?country=...&min_votes=1000
+        "top_country_min_votes": ranked.where(fact.c.CountryID == params["CountryID"], fact.c.NumRatings >= 1000)
+                                       .order_by(*top).limit(10),
+        # GET /movies/top?movie_type=...&year=... over a decade
+        "top_type_decade": ranked.where(fact.c.MovieTypeID == params["MovieTypeID"],
+                                        fact.c.ReleaseYear.between(year - 9, year)).order_by(*top).limit(10),
+        # Dashboard rollup: genre x year since the 1990s
+        "genre_year_rollup": sa.select(fact.c.GenreID, fact.c.ReleaseYear, sa.func.count(), sa.func.avg(fact.c.Rating))
+                               .where(fact.c.ReleaseYear >= 1990).group_by(fact.c.GenreID, fact.c.ReleaseYear),
+        # Dimension join: average rating per continent
+        "continent_join": sa.select(country.c.Continent, sa.func.avg(fact.c.Rating))
+                            .join(country, country.c.CountryID == fact.c.CountryID).group_by(country.c.Continent),
+    }
+
+
+def time_queries(engine, queries: dict, repeat: int):
+    results = {}
+    with engine.connect() as con:
+        for name, query in queries.items():
+            con.execute(query).fetchall()  # warm up
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                con.execute(query).fetchall()
+                timings.append(time.perf_counter() - start)
+            results[name] = {"median_ms": round(statistics.median(timings) * 1000, 3),
+                             "min_ms": round(min(timings) * 1000, 3)}
+    return results
+
+
+def run(titles: int, designs: list, workdir: str, repeat: int = 5, sql_url: str = None, seed: int = 0):
+    root = os.path.join(workdir, f"queries-{titles}")
+    print(f"📦 Generating {titles} synthetic titles in {root}")
+    generate_datasets(os.path.join(root, "csv-files"), titles, seed=seed)
+    if sql_url is None:
+        sqlite_path = os.path.join(root, "warehouse.sqlite")
+        if os.path.exists(sqlite_path):
+            os.remove(sqlite_path)
+        sql_url = f"sqlite:///{sqlite_path}"
+    runtime = set_runtime(PipelineRuntime(sql_url=sql_url, blob_service_client=LocalBlobServiceClient(root)))
+
+    import main
+
+    etl = main.MainETL()
+    with contextlib.redirect_stdout(io.StringIO()):
+        etl.extract_and_transform()
+    schema = "dbo" if runtime.engine.dialect.name == "mssql" else None
+
+    report = {"titles": titles, "dialect": runtime.engine.dialect.name, "fact_rows": len(etl.fact_table), "designs": {}}
+    params = None
+    for name in designs:
+        etl.physical_design = DESIGNS[name]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            etl.load()
+        load_s = time.perf_counter() - start
+        params = params or query_params(runtime.engine, schema)
+        timings = time_queries(runtime.engine, ranking_queries(schema, params), repeat)
+        report["designs"][name] = {"load_s": round(load_s, 3), "queries": timings}
+        print(f"\n🏗️ {name}: loaded in {load_s:.2f}s")
+        for query, metrics in timings.items():
+            print(f"   {query:<24} {metrics['median_ms']:>10.2f} ms median")
+    report["params"] = {key: (value.item() if hasattr(value, "item") else value) for key, value in params.items()}
+    return report
+
+
+def compare(report: dict):
+    # Every design against the first one
+    names = list(report["designs"])
+    baseline = report["designs"][names[0]]["queries"]
+    for name in names[1:]:
+        print(f"\n📊 {name} vs {names[0]}")
+        for query, metrics in report["designs"][name]["queries"].items():
+            before = baseline[query]["median_ms"]
+            ratio = metrics["median_ms"] / before if before else float("nan")
+            flag = "🔻" if ratio < 0.9 else ("🔺" if ratio > 1.1 else "  ")
+            print(f"{flag} {query:<24} {before:>10.2f} ms -> {metrics['median_ms']:>10.2f} ms ({ratio:.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ranking queries under different fact table physical designs")
+    parser.add_argument("--titles", type=int, default=250_000)
+    parser.add_argument("--designs", nargs="+", default=["keys_only", "default"], choices=list(DESIGNS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workdir", default="./data/benchmarks/work")
+    parser.add_argument("--sql-url", default=None, help="SQLAlchemy URL of the target database (default: sqlite)")
+    parser.add_argument("--output", default="./data/benchmarks/queries.json")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-data", action="store_true", help="keep the generated datasets and sqlite file")
+    args = parser.parse_args(argv)
+
+    report = run(args.titles, args.designs, args.workdir, repeat=args.repeat, sql_url=args.sql_url, seed=args.seed)
+    compare(report)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Wrote query benchmark results to {args.output}")
+    if not args.keep_data:
+        shutil.rmtree(os.path.join(args.workdir, f"queries-{args.titles}"), ignore_errors=True)
+    return report
+
+
+if __name__ == "__main__":
+    main()
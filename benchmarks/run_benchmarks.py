@@ -0,0 +1,193 @@
+# run_benchmarks.py
+# Times and memory-profiles the ETL stages on synthetic data, against local stand-ins for Azure:
+# a filesystem blob container (utils.local_blob) and a sqlite database. Results are written as JSON
+# so runs from different commits can be compared.
+#
+#   python -m benchmarks.run_benchmarks --scales 100k 1m --output ./data/benchmarks/results.json
+#   python -m benchmarks.run_benchmarks --scales 100k --compare ./data/benchmarks/results.json
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+from benchmarks.synthetic_data import COUNTRY_BLOB, GENRE_BLOB, IMDB_BLOB, TMDB_BLOB, generate_datasets
+from utils.datasetup import AzureDB
+from utils.dimension_classes import (COUNTRY_COLUMNS, GENRE_COLUMNS, IMDB_COLUMNS, TMDB_COLUMNS, CountryDimension,
+                                     FactTableGenerator, GenreDimension, MovieDimension, MovieTypeDimension,
+                                     clean_genres, parse_genre_ids)
+from utils.instrumentation import RSSSampler, Tracer, rss_bytes, set_tracer
+from utils.local_blob import LocalBlobServiceClient
+from utils.runtime import PipelineRuntime
+
+SCALES = {"100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+STAGES = [
+    "access_blob_csv", "clean_genres", "parse_genre_ids", "dimension_generator_upgraded",
+    "generate_fact_table", "generate_fact_table_merge", "sql_upload",
+]
+
+
+def measure(name: str, func, rows=None):
+    # Runs func once and returns (result, metrics); rows is a callable on the result or a fixed count
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    with RSSSampler() as sampler:
+        result = func()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    metrics = {
+        "wall_s": round(wall, 4),
+        "cpu_s": round(cpu, 4),
+        "peak_rss_delta_mb": round((sampler.peak_rss - sampler.start_rss) / 1024 ** 2, 1),
+        "end_rss_mb": round(rss_bytes() / 1024 ** 2, 1),
+    }
+    if rows is not None:
+        metrics["rows"] = int(rows(result) if callable(rows) else rows)
+        metrics["rows_per_s"] = round(metrics["rows"] / wall, 1) if wall > 0 else None
+    print(f"⏱️ {name:<48} {wall:>8.2f}s wall {cpu:>8.2f}s cpu {metrics['peak_rss_delta_mb']:>8.1f} MB peak")
+    return result, metrics
+
+
+def run_scale(label: str, titles: int, workdir: str, stages: list, seed: int = 0):
+    root = os.path.join(workdir, label)
+    container = "csv-files"
+    print(f"\n📦 Generating {label} synthetic titles ({titles}) in {root}")
+    _, generate = measure(f"{label}/generate_datasets",
+                          lambda: generate_datasets(os.path.join(root, container), titles, seed=seed))
+
+    # Local stand-ins: filesystem blobs (through the same ETag blob cache) and a sqlite warehouse
+    sqlite_path = os.path.join(root, "warehouse.sqlite")
+    if os.path.exists(sqlite_path):
+        os.remove(sqlite_path)
+    engine = create_engine(f"sqlite:///{sqlite_path}")
+    blob_service_client = LocalBlobServiceClient(root)
+    runtime = PipelineRuntime(blob_service_client=blob_service_client, engine=engine)
+    shutil.rmtree(os.path.join(root, "cache"), ignore_errors=True)
+    database = AzureDB(local_path=os.path.join(root, "cache"), blob_service_client=blob_service_client,
+                       runtime=runtime, sql_engine=engine)
+    database.access_container(container)
+
+    results = {"titles": titles, "stages": {"generate_datasets": generate}}
+
+    def record(stage, func, rows=None):
+        result, metrics = measure(f"{label}/{stage}", func, rows)
+        results["stages"][stage] = metrics
+        return result
+
+    # Source reads always run: every later stage needs the frames
+    sources = {}
+    for blob_name, columns in [(IMDB_BLOB, IMDB_COLUMNS), (TMDB_BLOB, TMDB_COLUMNS),
+                               (COUNTRY_BLOB, COUNTRY_COLUMNS), (GENRE_BLOB, GENRE_COLUMNS)]:
+        stage = f"access_blob_csv[{os.path.splitext(blob_name)[0]}]"
+        sources[blob_name] = record(stage, lambda: database.access_blob_csv(blob_name, usecols=columns), len)
+        results["stages"][stage]["bytes"] = os.path.getsize(os.path.join(root, container, blob_name))
+    imdb, tmdb = sources[IMDB_BLOB], sources[TMDB_BLOB]
+
+    if "clean_genres" in stages:
+        record("clean_genres", lambda: tmdb['genre_ids'].apply(clean_genres).explode(), len)
+    if "parse_genre_ids" in stages:
+        record("parse_genre_ids", lambda: parse_genre_ids(tmdb['genre_ids']), lambda result: len(result[0]))
+
+    dim_country = CountryDimension(sources[COUNTRY_BLOB])
+    dim_genre = GenreDimension(sources[GENRE_BLOB])
+    if "dimension_generator_upgraded" in stages:
+        dim_country = record("dimension_generator_upgraded[Country]", lambda: CountryDimension(sources[COUNTRY_BLOB]),
+                             lambda dim: len(dim.dimension_table))
+        record("dimension_generator_upgraded[Movie]", lambda: MovieDimension(imdb), lambda dim: len(dim.dimension_table))
+        dim_genre = record("dimension_generator_upgraded[Genre]", lambda: GenreDimension(sources[GENRE_BLOB]),
+                           lambda dim: len(dim.dimension_table))
+
+    def fact_generator(join_strategy):
+        return FactTableGenerator(imdb, tmdb, sources[GENRE_BLOB], dim_genre.dimension_table,
+                                  MovieTypeDimension().dimension_table, dim_country.dimension_table.copy(),
+                                  join_strategy=join_strategy)
+
+    fact_table = None
+    if "generate_fact_table_merge" in stages:
+        fact_table = record("generate_fact_table_merge", lambda: fact_generator("merge").generate_fact_table(), len)
+    if "generate_fact_table" in stages or "sql_upload" in stages:
+        del fact_table
+        fact_table = record("generate_fact_table", lambda: fact_generator("lean").generate_fact_table(), len)
+    if "sql_upload" in stages:
+        record("sql_upload[MovieGenreFact_dim]",
+               lambda: database.bulk_loader.load("MovieGenreFact_dim", fact_table, if_exists="replace"), len(fact_table))
+
+    engine.dispose()
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline: dict, current: dict):
+    # Per-stage wall time and peak memory ratios (current / baseline) for the scales both runs have
+    print(f"\n📊 {current.get('commit')} vs baseline {baseline.get('commit')}")
+    for label, scale in current["scales"].items():
+        if label not in baseline["scales"]:
+            continue
+        for stage, metrics in scale["stages"].items():
+            before = baseline["scales"][label]["stages"].get(stage)
+            if not before or not before["wall_s"]:
+                continue
+            ratio = metrics["wall_s"] / before["wall_s"]
+            flag = "🔺" if ratio > 1.1 else ("🔻" if ratio < 0.9 else "  ")
+            print(f"{flag} {label}/{stage:<40} {before['wall_s']:>8.2f}s -> {metrics['wall_s']:>8.2f}s ({ratio:.2f}x)  "
+                  f"{before['peak_rss_delta_mb']:>8.1f} -> {metrics['peak_rss_delta_mb']:>8.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the CineRank ETL stages on synthetic data")
+    parser.add_argument("--scales", nargs="+", default=list(SCALES), help=f"any of {', '.join(SCALES)} or a title count")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--workdir", default="./data/benchmarks/work")
+    parser.add_argument("--output", default=None, help="JSON results path (default ./data/benchmarks/<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-data", action="store_true", help="keep the generated datasets and sqlite files")
+    args = parser.parse_args(argv)
+
+    commit = _git_commit()
+    # Sub-stage spans (joins, explode, lookups, batches) are kept quiet and written next to the results
+    tracer = set_tracer(Tracer(echo=False))
+    report = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": args.seed,
+        "scales": {},
+    }
+    for label in args.scales:
+        titles = SCALES.get(label.lower()) or int(label)
+        report["scales"][label] = run_scale(label, titles, args.workdir, args.stages, seed=args.seed)
+        if not args.keep_data:
+            shutil.rmtree(os.path.join(args.workdir, label), ignore_errors=True)
+
+    output = args.output or os.path.join("./data/benchmarks", f"{commit or 'results'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    spans_path = tracer.export_jsonl(os.path.splitext(output)[0] + ".spans.jsonl", append=False)
+    print(f"\n💾 Wrote benchmark results to {output} (stage spans in {spans_path})")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
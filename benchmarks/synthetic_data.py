@@ -0,0 +1,108 @@
+# synthetic_data.py
+# Synthetic source datasets with the same columns and value shapes as the real csv blobs:
+# imdb_dataset_with_region.csv, tmdb_dataset.csv, country_annotation.csv and tmdb_genre_list_dataset.csv.
+# Written in chunks, so even the 10M-title scale never holds a whole table in memory.
+import os
+
+import numpy as np
+import pandas as pd
+
+IMDB_BLOB = "imdb_dataset_with_region.csv"
+TMDB_BLOB = "tmdb_dataset.csv"
+COUNTRY_BLOB = "country_annotation.csv"
+GENRE_BLOB = "tmdb_genre_list_dataset.csv"
+
+# TMDb's movie genre list
+TMDB_GENRES = [
+    (28, "Action"), (12, "Adventure"), (16, "Animation"), (35, "Comedy"), (80, "Crime"), (99, "Documentary"),
+    (18, "Drama"), (10751, "Family"), (14, "Fantasy"), (36, "History"), (27, "Horror"), (10402, "Music"),
+    (9648, "Mystery"), (10749, "Romance"), (878, "Science Fiction"), (10770, "TV Movie"), (53, "Thriller"),
+    (10752, "War"), (37, "Western"),
+]
+
+COUNTRIES = [
+    ("US", "United States", "NA", "English"), ("GB", "United Kingdom", "EU", "English"),
+    ("FR", "France", "EU", "French"), ("DE", "Germany", "EU", "German"), ("IN", "India", "AS", "Hindi, English"),
+    ("JP", "Japan", "AS", "Japanese"), ("CA", "Canada", "NA", "English, French"), ("IT", "Italy", "EU", "Italian"),
+    ("ES", "Spain", "EU", "Spanish"), ("BR", "Brazil", "SA", "Portuguese"), ("KR", "South Korea", "AS", "Korean"),
+    ("AU", "Australia", "OC", "English"), ("MX", "Mexico", "NA", "Spanish"), ("SE", "Sweden", "EU", "Swedish"),
+]
+
+TITLE_TYPES = ['movie', 'short', 'tvEpisode', 'tvSeries', 'tvMovie', 'video', 'tvMiniSeries', 'videoGame']
+TITLE_TYPE_WEIGHTS = [0.30, 0.12, 0.35, 0.08, 0.06, 0.05, 0.02, 0.02]
+IMDB_GENRES = ['Drama', 'Comedy', 'Documentary', 'Action', 'Romance', 'Thriller', 'Crime', 'Horror', 'Adventure']
+LANGUAGES = ['en', 'fr', 'de', 'ja', 'es', 'hi', 'ko', 'it']
+
+
+def _imdb_chunk(rng, start: int, rows: int):
+    ids = np.arange(start, start + rows)
+    tconst = pd.Series(ids).map("tt{:08d}".format)
+    start_year = rng.integers(1900, 2025, rows).astype(float)
+    start_year[rng.random(rows) < 0.02] = np.nan
+    rating = np.round(rng.normal(6.3, 1.3, rows).clip(1, 10), 1)
+    region_codes = np.array([c[0] for c in COUNTRIES] + ["XWW", None], dtype=object)
+    region = region_codes[rng.integers(0, len(region_codes), rows)]
+    genre_count = rng.integers(1, 4, rows)
+    genres = [",".join(rng.choice(IMDB_GENRES, k, replace=False)) for k in genre_count]
+    return pd.DataFrame({
+        'tconst': tconst,
+        'titleType': rng.choice(TITLE_TYPES, rows, p=TITLE_TYPE_WEIGHTS),
+        'primaryTitle': pd.Series(ids).map("Title {}".format),
+        'originalTitle': pd.Series(ids).map("Original Title {}".format),
+        'isAdult': (rng.random(rows) < 0.02).astype(int),
+        'startYear': start_year,
+        'endYear': np.nan,
+        'runtimeMinutes': rng.integers(1, 240, rows),
+        'genres': genres,
+        'averageRating': rating,
+        'numVotes': rng.zipf(1.6, rows).clip(5, 3_000_000),
+        'region': region,
+    })
+
+
+def _tmdb_chunk(rng, tconst: pd.Series):
+    rows = len(tconst)
+    genre_ids = np.array([genre_id for genre_id, _ in TMDB_GENRES])
+    genre_count = rng.integers(0, 4, rows)
+    genre_lists = ["[" + ", ".join(map(str, rng.choice(genre_ids, k, replace=False))) + "]" for k in genre_count]
+    tmdb_ids = rng.integers(1, 1_500_000, rows)
+    return pd.DataFrame({
+        'adult': False,
+        'backdrop_path': pd.Series(tmdb_ids).map("/backdrop{}.jpg".format),
+        'id': tmdb_ids,
+        'title': pd.Series(tmdb_ids).map("Title {}".format),
+        'original_title': pd.Series(tmdb_ids).map("Original Title {}".format),
+        'overview': "A synthetic overview long enough to look like a real plot summary from the TMDb API.",
+        'poster_path': pd.Series(tmdb_ids).map("/poster{}.jpg".format),
+        'media_type': "movie",
+        'original_language': rng.choice(LANGUAGES, rows),
+        'genre_ids': genre_lists,
+        'popularity': np.round(rng.exponential(8.0, rows), 3),
+        'release_date': pd.Series(rng.integers(1900, 2025, rows)).map("{}-01-01".format),
+        'video': False,
+        'vote_average': np.round(rng.uniform(0, 10, rows), 1),
+        'vote_count': rng.integers(0, 30_000, rows),
+        'imdb_id': tconst.to_numpy(),
+    })
+
+
+def generate_datasets(directory: str, titles: int, seed: int = 0, tmdb_match_rate: float = 0.8,
+                      chunk_rows: int = 500_000):
+    # Writes the four source csvs for `titles` IMDb titles into directory and returns blob name -> path.
+    # About tmdb_match_rate of the titles get a TMDb record, in shuffled order within each chunk.
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = {name: os.path.join(directory, name) for name in (IMDB_BLOB, TMDB_BLOB, COUNTRY_BLOB, GENRE_BLOB)}
+
+    for start in range(0, titles, chunk_rows):
+        rows = min(chunk_rows, titles - start)
+        imdb = _imdb_chunk(rng, start, rows)
+        matched = imdb['tconst'][rng.random(rows) < tmdb_match_rate].sample(frac=1, random_state=int(rng.integers(2 ** 31)))
+        tmdb = _tmdb_chunk(rng, matched.reset_index(drop=True))
+        first = start == 0
+        imdb.to_csv(paths[IMDB_BLOB], mode="w" if first else "a", header=first, index=False)
+        tmdb.to_csv(paths[TMDB_BLOB], mode="w" if first else "a", header=first, index=False)
+
+    pd.DataFrame(COUNTRIES, columns=['code', 'name', 'continent', 'languages']).to_csv(paths[COUNTRY_BLOB], index=False)
+    pd.DataFrame(TMDB_GENRES, columns=['id', 'name']).to_csv(paths[GENRE_BLOB], index=False)
+    return paths
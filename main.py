@@ -1,16 +1,108 @@
-import os, uuid
-from azure.identity import DefaultAzureCredential
-from azure.storage.blob import BlobServiceClient, BlobClient, ContainerClient
+import os, uuid, contextlib
 from dotenv import load_dotenv
+from sqlalchemy.exc import OperationalError
 from utils.datasetup import *
 from utils.dimension_classes import *
 from utils.tmdb_csv_uploader import *
+from utils.dag_scheduler import DAGScheduler
+from utils.fact_partitions import LoaderPartitionSink
+from utils.duckdb_engine import SOURCE_COLUMNS, DuckDBTransformEngine, EngineDimension, compare_star_schemas
+from utils.instrumentation import Tracer, set_tracer, span
+from utils.rollups import ROLLUPS, RollupBuilder, RollupPartitionSink, compute_rollups, load_rollups
+from utils.checkpoints import RunManifest
+from utils.integrity import MODES as INTEGRITY_MODES, QUARANTINE_TABLE, IntegrityChecker
+from utils.physical_design import PhysicalDesign
+from utils.runtime import PipelineRuntime, get_runtime, set_runtime
+from utils.sampling import sample_label, validate_fraction
+
+# Source blobs in the csv-files container
+SOURCE_BLOBS = {
+    "countries": "country_annotation.csv",
+    "imdb": "imdb_dataset_with_region.csv",
+    "tmdb": "tmdb_dataset.csv",
+    "genres": "tmdb_genre_list_dataset.csv",
+}
+# Sources sampled by title in sample mode, and their tconst column; the lookup sources are always read whole
+SAMPLED_SOURCES = {
+    "imdb_dataset_with_region.csv": "tconst",
+    "tmdb_dataset.csv": "imdb_id",
+}
 
 class MainETL():
     # List of columns need to be replaced
-    def __init__(self) -> None:
+    def __init__(self, source_format: str = "csv", staging_storage: str = "local", load_mode: str = "replace",
+                 max_workers: int = 4, fact_partitions: int = None, fact_workers: int = None,
+                 transform_engine: str = "pandas", duckdb_options: dict = None, trace_path: str = None,
+                 metrics_path: str = None, profile_stages: list = (), trace_memory_stages: list = (),
+                 rollups: bool = False, rollup_prior_votes: int = 25_000, checkpoint_dir: str = None,
+                 resume: bool = True, integrity: str = "report", movie_details: bool = False,
+                 physical_design: PhysicalDesign = None, sample: float = None,
+                 sample_sql_url: str = "sqlite:///./data/sample.sqlite") -> None:
         self.drop_columns = []
         self.dimension_tables = []
+        # "parquet" reads every source blob through its typed Parquet staging copy
+        self.source_format = source_format
+        self.staging_storage = staging_storage
+        # "incremental" merges changed rows into the existing tables instead of replacing them
+        self.load_mode = load_mode
+        # Worker threads for the extract/transform and load dependency graphs
+        self.max_workers = max_workers
+        # Hash partitions for the fact table, generated on a process pool and bulk-loaded partition by partition
+        if fact_partitions and load_mode == "incremental":
+            raise ValueError("Partitioned fact generation streams into a full load; it can't be combined with load_mode='incremental'")
+        self.fact_partitions = fact_partitions
+        self.fact_workers = fact_workers
+        # "duckdb" builds the dimensions and the fact table as SQL over the source files
+        # (duckdb_options: database, threads, memory_limit, temp_directory)
+        if transform_engine not in ("pandas", "duckdb"):
+            raise ValueError(f"Unknown transform engine '{transform_engine}', expected 'pandas' or 'duckdb'")
+        if fact_partitions and transform_engine == "duckdb":
+            raise ValueError("fact_partitions applies to the pandas transform engine only")
+        self.transform_engine = transform_engine
+        self.duckdb_options = duckdb_options or {}
+        # Stage spans from mainLoop: appended as JSON lines to trace_path, summed into a Prometheus textfile at
+        # metrics_path; stages matching profile_stages / trace_memory_stages run under cProfile / tracemalloc
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.profile_stages = profile_stages
+        self.trace_memory_stages = trace_memory_stages
+        # Pre-aggregated rollup tables (utils.rollups) built from the fact table and loaded next to it
+        self.rollups = rollups
+        self.rollup_prior_votes = rollup_prior_votes
+        self.rollup_tables = {}
+        # Transformed tables are checkpointed as Parquet under checkpoint_dir with a manifest (utils.checkpoints);
+        # a run with unchanged source blobs resumes at its first incomplete step (resume=False starts over)
+        self.checkpoint_dir = checkpoint_dir
+        self.resume = resume
+        self.manifest = None
+        # Client-side referential integrity check before the load (utils.integrity): "report", "quarantine"
+        # (orphan fact rows go to MovieGenreFact_quarantine instead of the fact table), "strict" or None to skip it
+        if integrity is not None and integrity not in INTEGRITY_MODES:
+            raise ValueError(f"Unknown integrity mode '{integrity}', expected one of {', '.join(INTEGRITY_MODES)} or None")
+        self.integrity = integrity
+        # Adds runtime, budget, revenue, release status, release date, certification and Wikidata ID to the Movie
+        # dimension from a TMDb dataset fetched with APICSVUploader's enrich=True
+        if movie_details and transform_engine == "duckdb":
+            raise ValueError("movie_details applies to the pandas transform engine only")
+        self.movie_details = movie_details
+        # Fact table storage (rowstore/columnstore, ReleaseYear partitions), indexes and statistics refresh
+        # (utils.physical_design), built with the keys after a full load; statistics are refreshed after every load
+        self.physical_design = physical_design or PhysicalDesign()
+        # Dev runs on a deterministic sample of titles (utils.sampling), e.g. sample=0.01 for 1%: the IMDb and TMDb
+        # extracts are cut down to the sampled tconsts, mainLoop loads into sample_sql_url instead of the
+        # warehouse, and checkpoints go to their own directory under checkpoint_dir
+        self.sample = validate_fraction(sample) if sample is not None else None
+        self.sample_sql_url = sample_sql_url
+        if self.sample and checkpoint_dir:
+            self.checkpoint_dir = os.path.join(checkpoint_dir, f"sample-{sample_label(self.sample)}")
+
+    def read_source(self, database, blob_name: str, columns: list):
+        if self.sample and blob_name in SAMPLED_SOURCES:
+            return database.access_blob_sample(blob_name, SAMPLED_SOURCES[blob_name], self.sample, columns=columns,
+                                               source_format=self.source_format, storage=self.staging_storage)
+        if self.source_format == "parquet":
+            return database.access_blob_parquet(blob_name, columns=columns, storage=self.staging_storage)
+        return database.access_blob_csv(blob_name=blob_name, usecols=columns)
         
     # def extract(self, csv_file: str):
     #     # Step 1: Extract: use pandas read_csv to open the csv file and extract data
@@ -20,180 +112,387 @@ class MainETL():
     #     print(f'Step 1 finished')
         
     def extract_and_transform(self):
-        print("🔍 Starting data extraction and transformation...")
+        with span("extract_and_transform", transform_engine=self.transform_engine, source_format=self.source_format):
+            if self.restore_checkpoint():
+                print("♻️ Step 1 and 2 skipped: source blobs unchanged, tables read back from the checkpoint.")
+                return
+            self._extract_and_transform()
+            self.save_checkpoint()
+        print("🎯 Step 1 and 2 finished: All dimension tables extracted & transformed, fact table generated.")
 
+    def open_manifest(self):
+        # The checkpoint manifest for the current source blobs, or None without a checkpoint_dir
+        if self.checkpoint_dir is None:
+            return None
+        if self.manifest is None:
+            database=AzureDB()
+            database.access_container("csv-files")
+            inputs = {blob_name: database.blob_fingerprint(blob_name) for blob_name in SOURCE_BLOBS.values()}
+            options = {"source_format": self.source_format, "transform_engine": self.transform_engine,
+                       "load_mode": self.load_mode, "fact_partitioned": bool(self.fact_partitions),
+                       "rollups": self.rollups, "rollup_prior_votes": self.rollup_prior_votes,
+                       "movie_details": self.movie_details, "sample": self.sample}
+            self.manifest = RunManifest(self.checkpoint_dir, inputs, options, resume=self.resume)
+        return self.manifest
+
+    def checkpoint_tables(self):
+        tables = ["MovieType_dim", "Country_dim", "Movie_dim", "Genre_dim", "MovieGenreFact_dim"]
+        return tables + (list(ROLLUPS) if self.rollups else [])
+
+    def restore_checkpoint(self):
+        # Read every table back from the checkpoint, or return False if any of them is missing
+        manifest = self.open_manifest()
+        if manifest is None or not manifest.has_tables(self.checkpoint_tables()):
+            return False
+        with span("extract_and_transform.restore"):
+            for table_name in self.checkpoint_tables()[:4]:
+                name = table_name[:-len("_dim")]
+                columns = manifest.table(table_name)["info"]["columns"]
+                self.dimension_tables.append(EngineDimension(manifest.read_table(table_name), name, columns, f"{name}ID"))
+                if name != "MovieType":
+                    self.drop_columns += columns
+            self.fact_table = manifest.read_table("MovieGenreFact_dim")
+            self.rollup_tables = {name: manifest.read_table(name) for name in self.checkpoint_tables()[5:]}
+        return True
+
+    def save_checkpoint(self):
+        manifest = self.open_manifest()
+        if manifest is None:
+            return
+        with span("extract_and_transform.checkpoint"):
+            for table in self.dimension_tables:
+                manifest.save_table(f"{table.name}_dim", table.dimension_table, columns=list(table.columns))
+            if isinstance(self.fact_table, pd.DataFrame):
+                # A partitioned fact table is checkpointed partition by partition while it loads
+                manifest.save_table("MovieGenreFact_dim", self.fact_table)
+            for name, table in self.rollup_tables.items():
+                manifest.save_table(name, table)
+
+    def _extract_and_transform(self):
         # blob_name="imdb_dataset.csv"
         # database=AzureDB()
         # database.access_container("csv-files")
         # df = database.access_blob_csv(blob_name=blob_name)
 
-        # Fetch movie type dimension table
-        dim_movie_types = MovieTypeDimension()
-        self.dimension_tables.append(dim_movie_types)
-        print("✅ Loaded MovieType dimension")
-        print(dim_movie_types.dimension_table.head())  # Show the first few rows
-
-
-        # Fetch country data
         database=AzureDB()
         database.access_container("csv-files")
-        df = database.access_blob_csv(blob_name="country_annotation.csv")
-        print("📥 Retrieved country annotation CSV")
+        if self.transform_engine == "duckdb":
+            return self.extract_and_transform_duckdb(database)
+
+        # Downloads run concurrently; each dimension is built as soon as its inputs have arrived
+        dag = DAGScheduler("extract_and_transform", max_workers=self.max_workers)
+        dag.add("movie_types", self.build_movie_type_dimension)
+        dag.add("country_csv", lambda: self.read_source(database, "country_annotation.csv", COUNTRY_COLUMNS))
+        dag.add("imdb_csv", lambda: self.read_source(database, "imdb_dataset_with_region.csv", IMDB_COLUMNS))
+        tmdb_columns = TMDB_COLUMNS + (list(MOVIE_DETAIL_COLUMNS) if self.movie_details else [])
+        dag.add("tmdb_csv", lambda: self.read_source(database, "tmdb_dataset.csv", tmdb_columns))
+        dag.add("genre_csv", lambda: self.read_source(database, "tmdb_genre_list_dataset.csv", GENRE_COLUMNS))
+        dag.add("country_dim", self.build_country_dimension, ["country_csv"])
+        dag.add("movie_dim", self.build_movie_dimension, ["imdb_csv", "tmdb_csv"])
+        dag.add("genre_dim", self.build_genre_dimension, ["genre_csv"])
+        dag.add("fact_table", self.build_fact_table,
+                ["imdb_csv", "tmdb_csv", "genre_csv", "genre_dim", "movie_types", "country_dim"])
+        if self.rollups and not self.fact_partitions:
+            # Partitioned fact tables are aggregated partition by partition during load instead
+            dag.add("rollups", lambda fact_table: compute_rollups(fact_table, prior_votes=self.rollup_prior_votes),
+                    ["fact_table"])
+        results = dag.run()
+        self.extract_timings = dag.timings()
+
+        # Same order as the sequential build, so loads and FKs line up
+        for name in ["movie_types", "country_dim", "movie_dim", "genre_dim"]:
+            self.dimension_tables.append(results[name])
+        for name in ["country_dim", "movie_dim", "genre_dim"]:
+            self.drop_columns += results[name].columns
+        self.fact_table = results["fact_table"]  # a FactTableGenerator when fact_partitions is set
+        self.rollup_tables = results.get("rollups", {})
+
+    def extract_and_transform_duckdb(self, database):
+        # Source files are fetched concurrently, then DuckDB scans them and builds every table in SQL
+        dag = DAGScheduler("extract_and_transform", max_workers=self.max_workers)
+        source_blobs = SOURCE_BLOBS
+        for name, blob_name in source_blobs.items():
+            if self.sample and blob_name in SAMPLED_SOURCES:
+                # Sampled sources reach DuckDB as DataFrames of the sampled rows
+                dag.add(f"{name}_file", lambda name=name, blob_name=blob_name: self.read_source(
+                    database, blob_name, SOURCE_COLUMNS[name]))
+                continue
+            dag.add(f"{name}_file", lambda blob_name=blob_name: database.local_source_path(
+                blob_name, source_format=self.source_format, storage=self.staging_storage))
+
+        def build(*paths):
+            engine = DuckDBTransformEngine(**self.duckdb_options)
+            try:
+                return engine.build(dict(zip(source_blobs, paths)), source_format=self.source_format)
+            finally:
+                engine.close()
+
+        dag.add("duckdb_star_schema", build, [f"{name}_file" for name in source_blobs])
+        results = dag.run()["duckdb_star_schema"]
+        self.extract_timings = dag.timings()
+
+        for name in ["movie_types", "country_dim", "movie_dim", "genre_dim"]:
+            self.dimension_tables.append(results[name])
+        for name in ["country_dim", "movie_dim", "genre_dim"]:
+            self.drop_columns += results[name].columns
+        self.fact_table = results["fact_table"]
+        if self.rollups:
+            self.rollup_tables = compute_rollups(self.fact_table, prior_votes=self.rollup_prior_votes)
+
+    def star_schema(self):
+        # Table name -> DataFrame for everything load() would upload
+        tables = {f"{table.name}_dim": table.dimension_table for table in self.dimension_tables}
+        tables["MovieGenreFact_dim"] = self.fact_table
+        tables.update(self.rollup_tables)
+        return tables
+
+    def check_transform_engines(self):
+        # Equivalence check: builds the star schema with both engines from the same sources and
+        # raises AssertionError on the first table whose rows or values differ
+        options = dict(source_format=self.source_format, staging_storage=self.staging_storage, max_workers=self.max_workers,
+                       sample=self.sample)
+        pandas_etl = MainETL(transform_engine="pandas", **options)
+        duckdb_etl = MainETL(transform_engine="duckdb", duckdb_options=self.duckdb_options, **options)
+        pandas_etl.extract_and_transform()
+        duckdb_etl.extract_and_transform()
+        compare_star_schemas(pandas_etl.star_schema(), duckdb_etl.star_schema())
+        print("🎯 pandas and DuckDB transform engines produce the same star schema")
+
+    def build_movie_type_dimension(self):
+        # Fetch movie type dimension table
+        return MovieTypeDimension()
 
+    def build_country_dimension(self, df):
         # Fetch country dimension table
         dim_country = CountryDimension(df)
-        self.drop_columns += dim_country.columns
-        self.dimension_tables.append(dim_country)
-        print("✅ Loaded Country dimension")
-        print(dim_country.dimension_table.head())  # Show the first few rows
 
         # Add derived column: IsEnglishSpeaking
         dim_country.dimension_table['IsEnglishSpeaking'] = dim_country.dimension_table['LanguagesSpoken'].apply(
             lambda x: "English" in x
         )
-        print("➕ Added 'IsEnglishSpeaking' column to Country dimension")
-
-        # Fetch IMDb movie data
-        df_imdb_movies = database.access_blob_csv(blob_name="imdb_dataset_with_region.csv")
-        df = df_imdb_movies
-        print("📥 Retrieved IMDb dataset with region")
+        return dim_country
 
+    def build_movie_dimension(self, df_imdb_movies, df_tmdb_movies):
         # Fetch movie dimension table
-        dim_movie = MovieDimension(df)
-        self.drop_columns += dim_movie.columns
-        self.dimension_tables.append(dim_movie)
-        print("✅ Loaded Movie dimension")
-        print(dim_movie.dimension_table.head())  # Show the first few rows
-
-        # Fetch TMDb movie data
-        df_tmdb_movies = database.access_blob_csv(blob_name="tmdb_dataset.csv")
-        df = df_tmdb_movies
-        print("📥 Retrieved TMDb dataset")
-
-        # Add PosterString and OriginalLanguage to Movie dimension
-        dim_movie.dimension_table['PosterString'] = df['poster_path']
-        dim_movie.dimension_table['OriginalLanguage'] = df['original_language']
-        print("➕ Added 'PosterString' and 'OriginalLanguage' columns to Movie dimension")
-
-        # Fetch genre data
-        df_genres = database.access_blob_csv(blob_name="tmdb_genre_list_dataset.csv")
-        df = df_genres
-        print("📥 Retrieved genre list CSV")
-
+        dim_movie = MovieDimension(df_imdb_movies)
+
+        # Add PosterString and OriginalLanguage to Movie dimension, looked up by IMDb id (first TMDb row per title)
+        tmdb_by_movie = df_tmdb_movies.dropna(subset=['imdb_id']).drop_duplicates('imdb_id').set_index('imdb_id')
+        movie_ids = dim_movie.dimension_table['MovieID']
+        dim_movie.dimension_table['PosterString'] = movie_ids.map(tmdb_by_movie['poster_path'])
+        dim_movie.dimension_table['OriginalLanguage'] = movie_ids.map(tmdb_by_movie['original_language'])
+        if self.movie_details:
+            for column, dim_column in MOVIE_DETAIL_COLUMNS.items():
+                dim_movie.dimension_table[dim_column] = movie_ids.map(tmdb_by_movie[column])
+            dim_movie.dimension_table['RegionalReleaseDate'] = pd.to_datetime(
+                dim_movie.dimension_table['RegionalReleaseDate'], errors="coerce")
+        return dim_movie
+
+    def build_genre_dimension(self, df_genres):
         # Fetch genre dimension table
-        dim_genre = GenreDimension(df)
-        self.drop_columns += dim_genre.columns
-        self.dimension_tables.append(dim_genre)
-        print("✅ Loaded Genre dimension")
-        print(dim_genre.dimension_table.head())  # Show the first few rows
+        return GenreDimension(df_genres)
 
+    def build_fact_table(self, df_imdb_movies, df_tmdb_movies, df_genres, dim_genre, dim_movie_types, dim_country):
         # Generate fact table
-        print("⚙️ Generating fact table...")
-        self.fact_table = FactTableGenerator(
+        generator = FactTableGenerator(
             df_imdb_movies=df_imdb_movies,
             df_tmdb_movies=df_tmdb_movies,
             df_genres=df_genres,
             df_genre_list=dim_genre.dimension_table,
             df_movie_types=dim_movie_types.dimension_table,
             df_countries=dim_country.dimension_table
-        ).generate_fact_table()
-
-        print("🎯 Step 1 and 2 finished: All dimension tables extracted & transformed, fact table generated.")
-        
-    def load(self):
-        # Load all the dimension tables into the database
+        )
+        if self.fact_partitions:
+            # Generated during load, straight into the fact table
+            return generator
+        return generator.generate_fact_table()
+
+    def check_integrity(self):
+        # Dimension keys are checked for uniqueness and the fact table's foreign keys against them before any
+        # table is touched; a partitioned fact table is checked partition by partition as it is generated
+        if self.integrity is None:
+            return None
+        checker = IntegrityChecker({f"{table.name}_dim": table.dimension_table for table in self.dimension_tables},
+                                   mode=self.integrity)
+        checker.raise_for_problems()
         for table in self.dimension_tables:
-            table.load()
-
-        # Connect to the database and begin a transaction
-        with engine.connect() as con:
-            trans = con.begin()
+            table.dimension_table = checker.clean_dimension(f"{table.name}_dim", table.dimension_table)
+        if isinstance(self.fact_table, pd.DataFrame):
+            self.fact_table = checker.apply(self.fact_table)
+            if checker.report.quarantined and self.rollups:
+                # Rollups only count the rows that are loaded
+                self.rollup_tables = compute_rollups(self.fact_table, prior_votes=self.rollup_prior_votes)
+            checker.finish()
+        return checker
 
+    def load(self):
+        incremental = self.load_mode == "incremental"
+        database=AzureDB()
+        # Tables and steps a checkpointed earlier attempt already finished are skipped
+        manifest = self.manifest
+
+        def loaded(table_name):
+            return manifest is not None and manifest.is_loaded(table_name)
+
+        def mark_loaded(table_name):
+            if manifest is not None:
+                manifest.mark_loaded(table_name, self.load_mode)
+
+        checker = self.check_integrity()
+
+        if not incremental:
+            # Full loads start from an empty star schema; every table is created with its final types,
+            # bulk-filled, and keyed in one pass at the end, so a rerun after a failure starts clean
+            pending = [name for name in database.star_schema.specs if not loaded(name)]
+            if len(pending) < len(database.star_schema.specs):
+                print(f"♻️ Resuming load, already loaded: {', '.join(n for n in database.star_schema.specs if n not in pending)}")
+            database.star_schema.drop(pending)
+
+        def load_dimension(table):
+            if not loaded(f"{table.name}_dim"):
+                table.load(incremental=incremental, build_keys=incremental)
+                mark_loaded(f"{table.name}_dim")
+
+        # Load all the dimension tables in parallel, then the fact table, then the keys
+        dag = DAGScheduler("load", max_workers=self.max_workers)
+        dimension_loads = [
+            dag.add(f"load_{table.name}_dim", lambda table=table: load_dimension(table))
+            for table in self.dimension_tables
+        ]
+
+        def load_fact(*_):
+            if loaded("MovieGenreFact_dim"):
+                return not incremental
+            if isinstance(self.fact_table, FactTableGenerator):
+                sink = LoaderPartitionSink(database, f'MovieGenreFact_dim', build_keys=False)
+                if self.rollups:
+                    builder = RollupBuilder(prior_votes=self.rollup_prior_votes)
+                    sink = RollupPartitionSink(sink, builder)
+                if checker is not None:
+                    sink = checker.partition_sink(sink)
+                if manifest is not None:
+                    sink = manifest.partition_sink("MovieGenreFact_dim", sink)
+                self.fact_table.generate_fact_table_partitioned(sink, partitions=self.fact_partitions, workers=self.fact_workers)
+                if checker is not None:
+                    checker.finish()
+                if self.rollups:
+                    self.rollup_tables = builder.tables()
+                    if manifest is not None:
+                        for name, table in self.rollup_tables.items():
+                            manifest.save_table(name, table)
+                created = True
+            elif incremental:
+                # Merge only changed fact rows; keys and indexes from the first load stay in place
+                # (a fact table created by the fallback full load gets its keys straight away)
+                created = database.upsert_dataframe_sqldatabase(f'MovieGenreFact_dim', self.fact_table, ['MovieID', 'GenreID'])
+            else:
+                database.upload_dataframe_sqldatabase(f'MovieGenreFact_dim', self.fact_table, build_keys=False)
+                created = True
+            mark_loaded("MovieGenreFact_dim")
+            return created
+
+        def build_keys(created):
+            # Primary keys, foreign keys and indexes of every star schema table, in one pass
+            if not incremental and not (manifest is not None and manifest.step_done("build_keys")):
+                database.star_schema.build_keys(design=self.physical_design)
+                if manifest is not None:
+                    manifest.mark_step("build_keys")
+
+        def load_rollup_tables(_):
+            for name, table in self.rollup_tables.items():
+                if not loaded(name):
+                    load_rollups(database, {name: table}, incremental=incremental)
+                    mark_loaded(name)
+
+        def load_quarantine(_):
+            # Replaced on every checked load, so it only ever holds the rows held back from the current fact table
+            if checker is not None and checker.mode == "quarantine" and checker.report.fact_rows \
+                    and not loaded(QUARANTINE_TABLE):
+                database.upload_dataframe_sqldatabase(QUARANTINE_TABLE, checker.quarantined_rows())
+                mark_loaded(QUARANTINE_TABLE)
+
+        dag.add("load_MovieGenreFact_dim", load_fact, dimension_loads)
+        dag.add("load_quarantine", load_quarantine, ["load_MovieGenreFact_dim"])
+        def refresh_statistics(*_):
+            database.star_schema.refresh_statistics(design=self.physical_design)
+
+        dag.add("build_keys", build_keys, ["load_MovieGenreFact_dim"])
+        if self.rollups:
+            dag.add("load_rollups", load_rollup_tables, ["load_MovieGenreFact_dim"])
+        dag.add("statistics", refresh_statistics, ["build_keys"])
+        with span("load", load_mode=self.load_mode):
+            results = dag.run()
+        self.load_timings = dag.timings()
+        # Tells readers (utils.ranking_service) that a complete new star schema is in place
+        self.load_id = database.record_load_completed(self.load_mode)
+        if manifest is not None:
+            manifest.mark_step("load", load_id=self.load_id)
+
+        if results["load_MovieGenreFact_dim"]:
+            print(f'Step 3 finished: Fact table and dimension tables uploaded successfully with composite key.')
+        else:
+            print(f'Step 3 finished: Fact table and dimension tables merged incrementally.')
+
+    @contextlib.contextmanager
+    def sample_target(self):
+        # A sample run loads into sample_sql_url, never into the warehouse; blobs are still read from storage
+        if not self.sample:
+            yield
+            return
+        runtime = get_runtime()
+        if self.sample_sql_url.startswith("sqlite:///"):
+            os.makedirs(os.path.dirname(os.path.abspath(self.sample_sql_url[len("sqlite:///"):])), exist_ok=True)
+        sample_runtime = set_runtime(PipelineRuntime(sql_url=self.sample_sql_url, blob_pool_size=runtime.blob_pool_size,
+                                                     blob_service_client=runtime.blob_service_client))
+        print(f"🎲 Sample run: {sample_label(self.sample)} of titles, loading into {sample_runtime.engine.url}")
+        try:
+            yield
+        finally:
+            set_runtime(runtime)
+            sample_runtime.close()
 
-            database=AzureDB()
-            database.upload_dataframe_sqldatabase(f'MovieGenreFact_dim', self.fact_table)
-
-            # Add foreign key constraints for each dimension table
-            # for table in self.dimension_tables:
-            #     con.execute(
-            #         text(f'ALTER TABLE [dbo].[MovieGenreFact_dim] WITH NOCHECK '
-            #             f'ADD CONSTRAINT [FK_{table.__class__.__name__}_dim] FOREIGN KEY ([{table.__class__.__name__}ID]) '
-            #             f'REFERENCES [dbo].[{table.__class__.__name__}_dim] ([{table.__class__.__name__}ID]) '
-            #             f'ON UPDATE CASCADE ON DELETE CASCADE;')
-            #     )
-            #     print(f'''
-            #         ALTER TABLE [dbo].[MovieGenreFact_dim] WITH NOCHECK
-            #         ADD CONSTRAINT [FK_{table.__class__.__name__}_dim] FOREIGN KEY ([{table.__class__.__name__}ID])
-            #         REFERENCES [dbo].[{table.__class__.__name__}_dim] ([{table.__class__.__name__}ID])
-            #         ON UPDATE CASCADE ON DELETE CASCADE;
-            #         ''')
-
-            # MovieTypeID
-            con.execute(
-                text('ALTER TABLE [dbo].[MovieGenreFact_dim] '
-                    'ALTER COLUMN MovieTypeID INT NOT NULL;')
-            )
-            con.execute(
-                text('ALTER TABLE [dbo].[MovieGenreFact_dim] WITH NOCHECK '
-                    'ADD CONSTRAINT [FK_MovieType_dim] FOREIGN KEY ([MovieTypeID]) '
-                    'REFERENCES [dbo].[MovieType_dim] ([MovieTypeID]) '
-                    'ON UPDATE CASCADE ON DELETE CASCADE;')
-            )
-
-            # MovieID
-            con.execute(
-                text('ALTER TABLE [dbo].[MovieGenreFact_dim] WITH NOCHECK '
-                    'ADD CONSTRAINT [FK_Movie_dim] FOREIGN KEY ([MovieID]) '
-                    'REFERENCES [dbo].[Movie_dim] ([MovieID]) '
-                    'ON UPDATE CASCADE ON DELETE CASCADE;')
-            )
-
-            # GenreID
-            con.execute(
-                text('ALTER TABLE [dbo].[MovieGenreFact_dim] WITH NOCHECK '
-                    'ADD CONSTRAINT [FK_Genre_dim] FOREIGN KEY ([GenreID]) '
-                    'REFERENCES [dbo].[Genre_dim] ([GenreID]) '
-                    'ON UPDATE CASCADE ON DELETE CASCADE;')
-            )
-
-            # CountryID
-            con.execute(
-                text('ALTER TABLE [dbo].[MovieGenreFact_dim] '
-                    'ALTER COLUMN CountryID varchar(20) NOT NULL;')
-            )
-            con.execute(
-                text('ALTER TABLE [dbo].[MovieGenreFact_dim] WITH NOCHECK '
-                    'ADD CONSTRAINT [FK_Country_dim] FOREIGN KEY ([CountryID]) '
-                    'REFERENCES [dbo].[Country_dim] ([CountryID]) '
-                    'ON UPDATE CASCADE ON DELETE CASCADE;')
-            )
-
-            # Commit the transaction
-            trans.commit()
-
-
-        print(f'Step 3 finished: Fact table and dimension tables uploaded successfully with composite key.')
-   
     def mainLoop(self):    
-        # Step 1
-        # self.extract("ETL_Example_Data.csv")
-        # Step 2
-        self.extract_and_transform()
-        # Step 3
+        tracer = set_tracer(Tracer(profile_stages=self.profile_stages, trace_memory_stages=self.trace_memory_stages))
         try:
-            self.load()
-        except:
-            self.load()
+            with self.sample_target(), span("etl", sample=self.sample):
+                manifest = self.open_manifest()
+                if manifest is not None and manifest.complete:
+                    print(f"♻️ Source blobs unchanged since load {manifest.manifest['steps']['load']['load_id']}, nothing to do")
+                    return
+                # Step 1
+                # self.extract("ETL_Example_Data.csv")
+                # Step 2
+                self.extract_and_transform()
+                # Step 3
+                try:
+                    self.load()
+                except OperationalError as ex:
+                    # One retry for a dropped connection or timeout, resuming after the last checkpointed table;
+                    # anything else is a real failure
+                    print(f"⚠️ Load failed ({ex.orig}), retrying once")
+                    self.load()
+        finally:
+            if self.trace_path:
+                tracer.export_jsonl(self.trace_path)
+            if self.metrics_path:
+                tracer.export_prometheus(self.metrics_path)
         
 def main():
     print("running main..")
 
     # Generate TMDb CSV
     # imdb_id_list = APICSVUploader.retrieve_imdb_ids()
-    # APICSVUploader.generate_tmdb_csv(imdb_id_list)
+    # tmdb_cache = TMDbCache("./data/tmdb_cache.sqlite") # Only missing or stale IDs are re-fetched
+    # APICSVUploader.generate_tmdb_csv(imdb_id_list, concurrent=True, requests_per_second=40, cache=tmdb_cache)
+    # Or stream the records straight into the blob as they are fetched (no local CSV, no separate upload_blob);
+    # a "tmdb_dataset.csv.gz" or "tmdb_dataset.parquet" blob name writes gzip CSV or Parquet row groups instead
+    # APICSVUploader.stream_tmdb_to_blob(imdb_id_list, "tmdb_dataset.csv", requests_per_second=40, cache=tmdb_cache)
+    # enrich=True adds runtime, budget, revenue, release dates and Wikidata IDs (one /movie/{id} request per title),
+    # loaded into Movie_dim with MainETL(movie_details=True)
+    # APICSVUploader.stream_tmdb_to_blob(imdb_id_list, "tmdb_dataset.csv", requests_per_second=40, cache=tmdb_cache, enrich=True)
 
     #Generate TMDb Genre List
-    # APICSVUploader.generate_tmdb_movie_csv()
+    # APICSVUploader.generate_tmdb_movie_csv(cache=tmdb_cache)
 
     # Upload local csv files to Azure blob storage
     # database = AzureDB()
@@ -206,7 +505,15 @@ def main():
     # database.upload_blob("imdb_dataset_with_region.csv")
 
     # create an instance of MainETL
-    main = MainETL()
+    main = MainETL(checkpoint_dir="./data/checkpoints") # MainETL(source_format="parquet") reads projected columns from Parquet staging copies
+    # Reruns resume from ./data/checkpoints and skip everything while the source blobs are unchanged (resume=False starts over)
+    # main = MainETL(rollups=True) # Also loads GenreYear_rollup, CountryYear_rollup, ... (merged incrementally with load_mode="incremental")
+    # main = MainETL(fact_partitions=16) # Builds and loads the fact table in hash partitions on all cores
+    # main = MainETL(transform_engine="duckdb", duckdb_options={"memory_limit": "4GB", "temp_directory": "./data/duckdb_tmp"})
+    # main.check_transform_engines() # Asserts the DuckDB engine reproduces the pandas tables
+    # After each load the ranking API reloads itself: uvicorn --factory utils.ranking_service:create_app
+    # main = MainETL(sample=0.01) # Dev run on a fixed 1% of titles, loaded into ./data/sample.sqlite
+    # main = MainETL(trace_path="./data/spans.jsonl", metrics_path="./data/cinerank.prom", profile_stages=["transform.fact*"])
     main.mainLoop()
 
 
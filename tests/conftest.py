@@ -0,0 +1,78 @@
+# conftest.py
+# Shared fixtures: a local stub HTTP server standing in for the TMDb API, and synthetic source csvs
+# (benchmarks.synthetic_data) laid out as a csv-files container for LocalBlobServiceClient.
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def synthetic_root(tmp_path_factory):
+    # Blob root holding csv-files/ with the four source csvs for 3,000 titles
+    from benchmarks.synthetic_data import generate_datasets
+
+    root = tmp_path_factory.mktemp("blobs")
+    generate_datasets(str(root / "csv-files"), 3000, seed=7)
+    return root
+
+
+@pytest.fixture
+def pipeline_runtime(synthetic_root, tmp_path, monkeypatch):
+    # The whole pipeline on the synthetic sources with a sqlite target; ./data (blob cache, staging) lands in tmp_path
+    from utils.local_blob import LocalBlobServiceClient
+    from utils.runtime import PipelineRuntime, get_runtime, set_runtime
+
+    monkeypatch.chdir(tmp_path)
+    previous = get_runtime()
+    runtime = set_runtime(PipelineRuntime(sql_url=f"sqlite:///{tmp_path / 'warehouse.sqlite'}",
+                                          blob_service_client=LocalBlobServiceClient(str(synthetic_root))))
+    yield runtime
+    set_runtime(previous)
+    runtime.close()
+
+
+@pytest.fixture
+def stub_server():
+    # start(route) serves route(path, query) -> (status, headers, body) and returns the base URL;
+    # every request is recorded as (monotonic time, path, query) in start.requests
+    servers = []
+
+    def start(route):
+        requests = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urllib.parse.urlparse(self.path)
+                query = {key: values[0] for key, values in urllib.parse.parse_qs(url.query).items()}
+                requests.append((time.monotonic(), url.path, query))
+                status, headers, body = route(url.path, query)
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        start.requests = requests
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
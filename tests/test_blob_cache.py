@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from utils.blob_cache import BlobCache
+from utils.local_blob import LocalBlobServiceClient
+
+
+class CountingContainer:
+    # Container client that counts the downloads that actually transfer the blob
+    def __init__(self, container_client):
+        self.container_client = container_client
+        self.container_name = container_client.container_name
+        self.downloads = []
+
+    def download_blob(self, blob: str, **kwargs):
+        downloader = self.container_client.download_blob(blob, **kwargs)
+        self.downloads.append(blob)
+        return downloader
+
+
+@pytest.fixture
+def container(tmp_path):
+    container_client = LocalBlobServiceClient(str(tmp_path / "blobs")).create_container("csv-files")
+    return CountingContainer(container_client)
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_unchanged_etag_is_served_from_disk(container, tmp_path):
+    container.container_client.upload_blob("a.csv", b"tconst\ntt0000001\n")
+    cache = BlobCache(str(tmp_path / "cache"))
+    first = cache.fetch(container, "a.csv")
+    second = cache.fetch(container, "a.csv")
+    assert first == second and read(second) == b"tconst\ntt0000001\n"
+    assert container.downloads == ["a.csv"]
+    # The index survives a restart
+    assert BlobCache(str(tmp_path / "cache")).fetch(container, "a.csv") == first
+    assert container.downloads == ["a.csv"]
+
+
+def test_changed_etag_downloads_again(container, tmp_path):
+    container.container_client.upload_blob("a.csv", b"tconst\ntt0000001\n")
+    cache = BlobCache(str(tmp_path / "cache"))
+    cache.fetch(container, "a.csv")
+    container.container_client.upload_blob("a.csv", b"tconst\ntt0000001\ntt0000002\n", overwrite=True)
+    assert read(cache.fetch(container, "a.csv")) == b"tconst\ntt0000001\ntt0000002\n"
+    assert container.downloads == ["a.csv", "a.csv"]
+
+
+def test_least_recently_used_blob_is_evicted(container, tmp_path):
+    for name in ["a.csv", "b.csv", "c.csv"]:
+        container.container_client.upload_blob(name, name.encode() * 25)  # 100 bytes each
+    cache = BlobCache(str(tmp_path / "cache"), max_bytes=250)
+    a = cache.fetch(container, "a.csv")
+    b = cache.fetch(container, "b.csv")
+    cache.fetch(container, "a.csv")  # a is now more recently used than b
+    c = cache.fetch(container, "c.csv")
+    assert os.path.exists(a) and os.path.exists(c) and not os.path.exists(b)
+    assert set(cache.index) == {"csv-files/a.csv", "csv-files/c.csv"}
+    assert sum(entry["size"] for entry in cache.index.values()) <= 250
+    cache.fetch(container, "b.csv")
+    assert container.downloads == ["a.csv", "b.csv", "c.csv", "b.csv"]
@@ -0,0 +1,21 @@
+from utils.dag_scheduler import DAGScheduler
+from utils.instrumentation import Tracer, get_tracer, set_tracer, span
+
+
+def test_node_spans_do_not_collide_with_the_spans_they_wrap():
+    previous = get_tracer()
+    tracer = set_tracer(Tracer(echo=False, sample_rss=False))
+    try:
+        def build_keys(_):
+            with span("load.build_keys"):
+                return "keys"
+
+        dag = DAGScheduler("load", max_workers=2)
+        dag.add("load_fact", lambda: "fact")
+        dag.add("build_keys", build_keys, ["load_fact"])
+        with span("load"):
+            assert dag.run()["build_keys"] == "keys"
+    finally:
+        set_tracer(previous)
+    names = [s.name for s in tracer.spans]
+    assert sorted(names) == ["load", "load.build_keys", "load.node[build_keys]", "load.node[load_fact]"]
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.dimension_classes import (CountryDimension, FactTableGenerator, GenreDimension, MovieTypeDimension,
+                                     clean_genres, explode_genres, parse_genre_ids)
+
+WELL_FORMED = ["[28, 12]", "[]", "[ 18 ]", "[-1,0]", "[16,35,10751]"]
+MALFORMED = [
+    "[99999999999999999999]", "[1, 99999999999999999999]", "[-99999999999999999999]", "[9223372036854775808]",
+    "[1,,2]", "[1, 'a']", "[1.5]", "[True]", "(1, 2)", "5", "not a list", "[", "",
+    None, np.nan, 12, [3, 4], [],
+]
+
+
+def reference(genre_ids: pd.Series):
+    exploded = genre_ids.apply(clean_genres).explode()
+    return exploded.index.to_numpy(), exploded.tolist()
+
+
+def same_values(parsed, expected):
+    # NaN for rows without genres, otherwise equal values (genre ids may come back as float64 next to NaNs)
+    assert len(parsed) == len(expected)
+    for value, want in zip(parsed, expected):
+        if isinstance(want, float) and np.isnan(want):
+            assert pd.isna(value)
+        else:
+            assert value == want
+            assert isinstance(value, bool) == isinstance(want, bool)
+
+
+@pytest.mark.parametrize("values", [WELL_FORMED, MALFORMED, WELL_FORMED + MALFORMED,
+                                    ["[28, 12]", "[99999999999999999999]", "[1, -99999999999999999999]"],
+                                    [v for pair in zip(MALFORMED, WELL_FORMED * 4) for v in pair]])
+def test_parse_genre_ids_matches_clean_genres(values):
+    genre_ids = pd.Series(values, dtype=object)
+    positions, parsed = parse_genre_ids(genre_ids)
+    expected_positions, expected = reference(genre_ids)
+    assert positions.tolist() == expected_positions.tolist()
+    same_values(list(parsed), expected)
+
+
+def test_string_dtype_column():
+    genre_ids = pd.Series(["[28, 12]", None, "[99999999999999999999]", "junk"], dtype="string")
+    positions, parsed = parse_genre_ids(genre_ids)
+    expected_positions, expected = reference(genre_ids.astype(object).where(genre_ids.notna(), np.nan))
+    assert positions.tolist() == expected_positions.tolist()
+    same_values(list(parsed), expected)
+
+
+def test_explode_genres_keeps_other_columns():
+    df = pd.DataFrame({"imdb_id": ["tt1", "tt2", "tt3"], "genre_ids": ["[1, 2]", "[99999999999999999999]", "[]"]})
+    exploded = explode_genres(df)
+    assert exploded["imdb_id"].tolist() == ["tt1", "tt1", "tt2", "tt3"]
+    assert exploded["genre_ids"].tolist()[:3] == [1, 2, 99999999999999999999]
+    assert pd.isna(exploded["genre_ids"].iloc[3])
+
+
+IMDB = pd.DataFrame({
+    # tt3 is listed twice, so its TMDb rows join two IMDb rows each
+    "tconst": ["tt1", "tt2", "tt3", "tt3", "tt4", "tt5", "tt6"],
+    "titleType": ["movie", "short", "movie", "tvSeries", "podcast", "movie", "video"],
+    "averageRating": [7.1, 6.0, 8.2, 5.5, 9.0, np.nan, 4.4],
+    "numVotes": [100, 20, 3000, 40, 5, 60, 70],
+    "startYear": [1999.0, 2001.0, 1985.0, 2010.0, 2020.0, 1970.0, np.nan],
+    "region": ["Us", "GB", "fr", "zz", "US", np.nan, "gB"],
+})
+TMDB = pd.DataFrame({
+    # tt9 and the missing id have no IMDb row; 99 and 12345 are genres that aren't in the genre list
+    "imdb_id": ["tt3", "tt1", "tt9", None, "tt2", "tt4", "tt5", "tt6", "tt3", "tt1"],
+    "genre_ids": ["[28, 12]", "[18, 99]", "[28]", "[12]", "[]", "[35]", "[28]", "[18, 12345]", "junk", "[35, 28]"],
+    "popularity": [10.5, 3.2, 1.0, 2.0, 4.0, 5.0, 6.0, np.nan, 7.0, 8.0],
+})
+GENRES = pd.DataFrame({"id": [28, 12, 18, 35], "name": ["Action", "Adventure", "Drama", "Comedy"]})
+COUNTRIES = pd.DataFrame({"code": ["US", "Gb", "fr"], "name": ["United States", "United Kingdom", "France"],
+                          "continent": ["NA", "EU", "EU"], "languages": ["English", "English", "French"]})
+
+
+def fact_generator(join_strategy, genres=GENRES):
+    # Fresh dimension tables per generator, as the joins lower-case the country keys in place
+    return FactTableGenerator(IMDB.copy(), TMDB.copy(), genres.copy(), GenreDimension(genres.copy()).dimension_table,
+                              MovieTypeDimension().dimension_table, CountryDimension(COUNTRIES.copy()).dimension_table,
+                              join_strategy=join_strategy)
+
+
+@pytest.mark.parametrize("genres", [GENRES, pd.concat([GENRES, pd.DataFrame({"id": [28], "name": ["Action & Adventure"]})],
+                                                      ignore_index=True)],
+                         ids=["unique keys", "duplicate genre id"])
+def test_lean_fact_table_matches_merge(genres):
+    lean = fact_generator("lean", genres)
+    # A duplicated genre id makes the lookups ambiguous, so lean falls back to the merge chain
+    assert lean._dimension_keys_unique() == genres["id"].is_unique
+    fact_table = lean.generate_fact_table()
+    expected = fact_generator("merge", genres).generate_fact_table()
+    assert len(expected) > 0 and expected["MovieID"].eq("tt3").sum() > 1
+    pd.testing.assert_frame_equal(fact_table, expected)
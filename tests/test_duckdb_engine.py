@@ -0,0 +1,29 @@
+import pytest
+
+import main
+from utils.duckdb_engine import compare_star_schemas
+
+
+def build(**options):
+    etl = main.MainETL(**options)
+    etl.extract_and_transform()
+    return etl.star_schema()
+
+
+@pytest.mark.parametrize("options", [{}, {"source_format": "parquet"}, {"sample": 0.2}, {"rollups": True}],
+                         ids=["csv", "parquet", "sample", "rollups"])
+def test_duckdb_engine_matches_pandas(pipeline_runtime, options):
+    pandas_tables = build(transform_engine="pandas", **options)
+    duckdb_tables = build(transform_engine="duckdb", **options)
+    assert len(pandas_tables["MovieGenreFact_dim"]) > 0
+    compare_star_schemas(pandas_tables, duckdb_tables)
+
+
+def test_compare_star_schemas_catches_a_difference(pipeline_runtime):
+    tables = build(transform_engine="pandas")
+    changed = dict(tables)
+    fact = tables["MovieGenreFact_dim"].copy()
+    fact.loc[fact.index[0], "Rating"] = fact["Rating"].iloc[0] + 1
+    changed["MovieGenreFact_dim"] = fact
+    with pytest.raises(AssertionError):
+        compare_star_schemas(tables, changed)
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.dimension_classes import CountryDimension, FactTableGenerator, GenreDimension, MovieTypeDimension
+from utils.fact_partitions import ParquetPartitionSink, read_fact_partitions
+
+
+@pytest.fixture(scope="module")
+def sources(synthetic_root):
+    read = lambda name: pd.read_csv(synthetic_root / "csv-files" / name)
+    return {"imdb": read("imdb_dataset_with_region.csv"), "tmdb": read("tmdb_dataset.csv"),
+            "genres": read("tmdb_genre_list_dataset.csv"), "countries": read("country_annotation.csv")}
+
+
+def with_gaps(sources, case):
+    # Lookups that miss: TMDb rows without an IMDb title, genres and movie types missing from their dimensions
+    imdb, tmdb, genres = sources["imdb"].copy(), sources["tmdb"].copy(), sources["genres"]
+    if case == "imdb":
+        tmdb.loc[::13, "imdb_id"] = "tt_missing"
+        tmdb.loc[::17, "imdb_id"] = np.nan
+        tmdb.loc[::19, "genre_ids"] = "[]"
+    elif case == "genre":
+        genres = genres.iloc[::2]
+    elif case == "movie_type":
+        imdb.loc[imdb.index % 7 == 0, "titleType"] = "weird"
+    return imdb, tmdb, genres
+
+
+def generator(sources, imdb, tmdb, genres):
+    return FactTableGenerator(imdb, tmdb, genres, GenreDimension(genres).dimension_table,
+                              MovieTypeDimension().dimension_table,
+                              CountryDimension(sources["countries"]).dimension_table)
+
+
+@pytest.mark.parametrize("gaps", [None, "imdb", "genre", "movie_type"])
+def test_partitioned_matches_single_process(sources, tmp_path, gaps):
+    imdb, tmdb, genres = with_gaps(sources, gaps)
+    expected = generator(sources, imdb.copy(), tmdb.copy(), genres).generate_fact_table()
+    rows = generator(sources, imdb.copy(), tmdb.copy(), genres).generate_fact_table_partitioned(
+        ParquetPartitionSink(str(tmp_path / "parts")), partitions=5, workers=2)
+    assert rows == len(expected) > 0
+    partitioned = read_fact_partitions(str(tmp_path / "parts"))
+    pd.testing.assert_frame_equal(partitioned, expected)
+    # Row for row, whatever order the partitions finished in
+    pd.testing.assert_frame_equal(partitioned.sort_values(["MovieID", "GenreID"]).reset_index(drop=True),
+                                  expected.sort_values(["MovieID", "GenreID"]).reset_index(drop=True))
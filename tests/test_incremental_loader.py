@@ -0,0 +1,27 @@
+import pandas as pd
+import sqlalchemy as sa
+
+from utils.bulk_loader import BulkLoader
+from utils.incremental_loader import HASH_COLUMN, IncrementalLoader, add_row_hash
+
+MOVIES = pd.DataFrame({"MovieID": ["tt0000001", "tt0000002", "tt0000003"],
+                       "MovieTitle": ["Carmencita", "Le clown et ses chiens", "Pauvre Pierrot"]})
+
+
+def test_rows_without_a_stored_hash_are_merged(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'target.sqlite'}")
+    bulk_loader = BulkLoader(engine, progress=False)
+    bulk_loader.load("Movie_dim", add_row_hash(MOVIES), if_exists="replace")
+    with engine.begin() as con:
+        # A table filled without hashes, edited in the target since
+        con.exec_driver_sql(f"UPDATE Movie_dim SET {HASH_COLUMN} = NULL, MovieTitle = 'edited' WHERE MovieID <> 'tt0000001'")
+
+    loader = IncrementalLoader(engine, bulk_loader)
+    upserts, deleted = loader.diff("Movie_dim", add_row_hash(MOVIES), ["MovieID"])
+    assert upserts["MovieID"].tolist() == ["tt0000002", "tt0000003"] and deleted.empty
+
+    assert loader.upsert("Movie_dim", MOVIES, ["MovieID"]) == (2, 0)
+    stored = pd.read_sql("SELECT * FROM Movie_dim ORDER BY MovieID", engine)
+    assert stored["MovieTitle"].tolist() == MOVIES["MovieTitle"].tolist()
+    assert stored[HASH_COLUMN].notna().all()
+    assert loader.upsert("Movie_dim", MOVIES, ["MovieID"]) == (0, 0)
@@ -0,0 +1,83 @@
+import sqlalchemy as sa
+
+from utils.physical_design import PhysicalDesign, decade_boundaries
+from utils.star_schema import StarSchema
+
+FACT = "MovieGenreFact_dim"
+
+
+def mssql_schema(design):
+    # DDL rendered for SQL Server without a connection
+    return StarSchema(sa.create_mock_engine("mssql+pyodbc://", lambda *args, **kwargs: None), design=design)
+
+
+def test_rowstore_with_fk_indexes():
+    schema = mssql_schema(PhysicalDesign())
+    statements = schema.key_sql([FACT])
+    assert statements[0] == ("ALTER TABLE dbo.[MovieGenreFact_dim] ADD CONSTRAINT [PK_MovieGenreFact_dim] "
+                             "PRIMARY KEY CLUSTERED ([MovieID], [GenreID])")
+    assert sum("FOREIGN KEY" in statement for statement in statements) == 4
+    assert statements[-4:] == [
+        "CREATE NONCLUSTERED INDEX [IX_MovieGenreFact_GenreID] ON dbo.[MovieGenreFact_dim] ([GenreID])",
+        "CREATE NONCLUSTERED INDEX [IX_MovieGenreFact_MovieTypeID] ON dbo.[MovieGenreFact_dim] ([MovieTypeID])",
+        "CREATE NONCLUSTERED INDEX [IX_MovieGenreFact_CountryID] ON dbo.[MovieGenreFact_dim] ([CountryID])",
+        "CREATE NONCLUSTERED INDEX [IX_MovieGenreFact_ReleaseYear] ON dbo.[MovieGenreFact_dim] ([ReleaseYear]) "
+        "INCLUDE ([GenreID], [Rating], [NumRatings])",
+    ]
+    assert not any("PARTITION" in statement or "COLUMNSTORE" in statement for statement in statements)
+    assert schema.statistics_sql([FACT]) == ["UPDATE STATISTICS dbo.[MovieGenreFact_dim]"]
+
+
+def test_keys_only():
+    statements = mssql_schema(PhysicalDesign(fk_indexes=False, year_index=False, statistics=None)).key_sql([FACT])
+    assert not any("CREATE" in statement for statement in statements)
+    assert mssql_schema(PhysicalDesign(statistics=None)).statistics_sql([FACT]) == []
+
+
+def test_columnstore():
+    schema = mssql_schema(PhysicalDesign(storage="columnstore", fk_indexes=False, statistics="fullscan"))
+    statements = schema.key_sql([FACT])
+    assert statements[:2] == [
+        "CREATE CLUSTERED COLUMNSTORE INDEX [CCI_MovieGenreFact_dim] ON dbo.[MovieGenreFact_dim]",
+        "ALTER TABLE dbo.[MovieGenreFact_dim] ADD CONSTRAINT [PK_MovieGenreFact_dim] "
+        "PRIMARY KEY NONCLUSTERED ([MovieID], [GenreID])",
+    ]
+    assert not any("IX_MovieGenreFact_GenreID" in statement for statement in statements)
+    assert schema.statistics_sql([FACT, "Movie_dim"]) == [
+        "UPDATE STATISTICS dbo.[Movie_dim] WITH FULLSCAN", "UPDATE STATISTICS dbo.[MovieGenreFact_dim] WITH FULLSCAN"]
+
+
+def test_partitioned_rowstore():
+    statements = mssql_schema(PhysicalDesign(partition_years=[2010, 1990, 2000])).key_sql([FACT])
+    assert statements[:6] == [
+        "IF EXISTS (SELECT 1 FROM sys.partition_schemes WHERE name = N'PS_ReleaseYear') "
+        "DROP PARTITION SCHEME [PS_ReleaseYear]",
+        "IF EXISTS (SELECT 1 FROM sys.partition_functions WHERE name = N'PF_ReleaseYear') "
+        "DROP PARTITION FUNCTION [PF_ReleaseYear]",
+        "CREATE PARTITION FUNCTION [PF_ReleaseYear] (smallint) AS RANGE RIGHT FOR VALUES (1990, 2000, 2010)",
+        "CREATE PARTITION SCHEME [PS_ReleaseYear] AS PARTITION [PF_ReleaseYear] ALL TO ([PRIMARY])",
+        "CREATE CLUSTERED INDEX [CIX_MovieGenreFact_dim_ReleaseYear] ON dbo.[MovieGenreFact_dim] ([ReleaseYear]) "
+        "ON [PS_ReleaseYear]([ReleaseYear])",
+        "ALTER TABLE dbo.[MovieGenreFact_dim] ADD CONSTRAINT [PK_MovieGenreFact_dim] "
+        "PRIMARY KEY NONCLUSTERED ([MovieID], [GenreID]) ON [PRIMARY]",
+    ]
+    # The clustered index already orders the table by ReleaseYear
+    assert not any("IX_MovieGenreFact_ReleaseYear" in statement for statement in statements)
+
+
+def test_partitioned_columnstore():
+    statements = mssql_schema(PhysicalDesign(storage="columnstore", partition_years=decade_boundaries(1990, 2020))).key_sql([FACT])
+    assert "FOR VALUES (1990, 2000, 2010, 2020)" in statements[2]
+    assert statements[4] == ("CREATE CLUSTERED COLUMNSTORE INDEX [CCI_MovieGenreFact_dim] ON dbo.[MovieGenreFact_dim] "
+                             "ON [PS_ReleaseYear]([ReleaseYear])")
+    assert "IX_MovieGenreFact_ReleaseYear" in statements[-1]
+
+
+def test_other_dialects_get_indexes_and_analyze():
+    schema = StarSchema(sa.create_engine("sqlite://"), design=PhysicalDesign(storage="columnstore", partition_years=[2000]))
+    statements = schema.key_sql([FACT])
+    assert statements[0] == 'CREATE UNIQUE INDEX "PK_MovieGenreFact_dim" ON "MovieGenreFact_dim" ("MovieID", "GenreID")'
+    assert statements[-1] == ('CREATE INDEX "IX_MovieGenreFact_ReleaseYear" ON "MovieGenreFact_dim" '
+                              '("ReleaseYear", "GenreID", "Rating", "NumRatings")')
+    assert not any("PARTITION" in statement or "COLUMNSTORE" in statement for statement in statements)
+    assert schema.statistics_sql([FACT]) == ['ANALYZE "MovieGenreFact_dim"']
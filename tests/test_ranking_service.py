@@ -0,0 +1,163 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from utils.ranking_index import RankingIndex
+from utils.ranking_service import RankingService, admin_guard, create_app
+
+GENRES = pd.DataFrame({"GenreID": [28, 18, 35, 12], "GenreName": ["Action", "Drama", "Comedy", "Adventure"]})
+MOVIE_TYPES = pd.DataFrame({"MovieTypeID": [1, 4, 5], "MovieTypeName": ["short", "movie", "tvSeries"]})
+COUNTRIES = pd.DataFrame({"CountryID": ["us", "gb", "fr"], "CountryName": ["United States", "United Kingdom", "France"]})
+
+
+def star_schema(movies: int = 80, seed: int = 3):
+    # One fact row per (movie, genre) with the movie's attributes repeated, as the ETL writes them; ratings and vote
+    # counts come from small sets so ties are broken by the secondary keys
+    rng = np.random.default_rng(seed)
+    rows = []
+    for number in rng.permutation(movies):
+        attributes = {"MovieID": f"tt{number:07d}", "MovieTypeID": int(rng.choice([1, 4, 5])),
+                      "CountryID": str(rng.choice(["US", "us", "gb", "Fr"])), "Rating": float(rng.choice([6.5, 7.0, 8.0])),
+                      "NumRatings": int(rng.choice([50, 500, 5000])), "ReleaseYear": int(rng.choice([1999, 2001])),
+                      "Popularity": float(rng.integers(1, 100))}
+        for genre_id in rng.choice(GENRES["GenreID"], size=rng.integers(1, 4), replace=False):
+            rows.append({**attributes, "GenreID": int(genre_id)})
+    fact_table = pd.DataFrame(rows)
+    movie_ids = fact_table["MovieID"].unique()
+    movies = pd.DataFrame({"MovieID": movie_ids, "MovieTitle": [f"Title {movie_id}" for movie_id in movie_ids]})
+    return fact_table, movies
+
+
+def reference_top(fact_table, genre=None, year=None, country=None, movie_type=None, min_votes=0, limit=10):
+    # Sort by rating, votes and MovieID, filter, and keep each movie's first row
+    genre_ids = dict(zip(GENRES["GenreName"].str.lower(), GENRES["GenreID"]))
+    type_ids = dict(zip(MOVIE_TYPES["MovieTypeName"].str.lower(), MOVIE_TYPES["MovieTypeID"]))
+    rows = fact_table.sort_values(["Rating", "NumRatings", "MovieID"], ascending=[False, False, True], kind="stable")
+    keep = rows["NumRatings"].to_numpy() >= min_votes
+    if genre is not None:
+        keep &= rows["GenreID"].to_numpy() == (int(genre) if str(genre).isdigit() else genre_ids.get(str(genre).lower()))
+    if year is not None:
+        keep &= rows["ReleaseYear"].to_numpy() == year
+    if country is not None:
+        keep &= rows["CountryID"].str.lower().to_numpy() == country.lower()
+    if movie_type is not None:
+        keep &= rows["MovieTypeID"].to_numpy() == (int(movie_type) if str(movie_type).isdigit()
+                                                   else type_ids.get(str(movie_type).lower()))
+    return rows[keep].drop_duplicates("MovieID").head(limit)
+
+
+def ranked(movies):
+    return [(movie["MovieID"], movie["Rating"], movie["NumRatings"]) for movie in movies]
+
+
+def test_index_top_matches_a_pandas_sort():
+    fact_table, movies = star_schema()
+    index = RankingIndex(fact_table, movies, GENRES, MOVIE_TYPES, COUNTRIES, version="1")
+    genres = [None, 28, "18", "drama", "ADVENTURE", 99, "Horror"]
+    countries = [None, "us", "GB", "fr", "zz"]
+    movie_types = [None, 4, "1", "tvseries", "Movie", "video"]
+    settings = [(None, 0, 100), (1999, 500, 3), (2001, 50, 1), (1800, 0, 10)]
+    for (genre, country, movie_type), (year, min_votes, limit) in zip(
+            itertools.product(genres, countries, movie_types), itertools.cycle(settings)):
+        expected = reference_top(fact_table, genre, year, country, movie_type, min_votes, limit)
+        result = index.top(genre=genre, year=year, country=country, movie_type=movie_type,
+                           min_votes=min_votes, limit=limit)
+        assert ranked(result) == list(expected[["MovieID", "Rating", "NumRatings"]].itertuples(index=False, name=None)), \
+            (genre, year, country, movie_type, min_votes, limit)
+    assert len(index.top(genre="drama", country="US", movie_type="movie", min_votes=500, limit=100)) > 1
+
+    best = index.top(limit=1)[0]
+    rows = fact_table[fact_table["MovieID"] == best["MovieID"]]
+    assert best["MovieTitle"] == f"Title {best['MovieID']}"
+    assert best["CountryName"] == {"us": "United States", "gb": "United Kingdom", "fr": "France"}[best["CountryID"]]
+    assert best["Genres"] == sorted(GENRES.set_index("GenreID").loc[rows["GenreID"], "GenreName"])
+
+
+def test_group_ordering_slices_follow_the_global_ranking():
+    fact_table, movies = star_schema()
+    index = RankingIndex(fact_table, movies, GENRES, MOVIE_TYPES, COUNTRIES)
+    columns = {"genre": index.genre_id, "year": index.release_year, "country": index.country_ids[index.country_code],
+               "movie_type": index.movie_type_id}
+    for group, values in columns.items():
+        ordering = index.groups[group]
+        for value in np.unique(values).tolist():
+            expected = index.global_order[values[index.global_order] == value]
+            assert ordering.rows(value).tolist() == expected.tolist()
+        assert len(ordering.rows(-1)) == 0
+
+
+def test_admin_guard_requires_the_token():
+    guard = admin_guard("s3cret")
+    guard("Bearer s3cret")
+    for authorization in [None, "", "Bearer wrong", "s3cret", "Basic s3cret"]:
+        with pytest.raises(HTTPException) as error:
+            guard(authorization)
+        assert error.value.status_code == 401
+
+
+def test_admin_endpoints_are_disabled_without_a_token():
+    with pytest.raises(HTTPException) as error:
+        admin_guard(None)("Bearer anything")
+    assert error.value.status_code == 404
+
+
+def test_reload_endpoint_is_guarded(monkeypatch):
+    monkeypatch.delenv("RANKING_ADMIN_TOKEN", raising=False)
+    app = create_app(service=object(), poll_interval=0, admin_token="s3cret")
+    route = next(route for route in app.routes if getattr(route, "path", None) == "/admin/reload")
+    assert [dependency.call.__name__ for dependency in route.dependant.dependencies] == ["guard"]
+
+
+class Versions:
+    # Stand-in for the EtlLoadLog lookup: the latest load id, plus a loader that counts index builds
+    def __init__(self):
+        self.current = "1"
+        self.loads = 0
+        self.fact_table, self.movies = star_schema()
+
+    def load(self, version):
+        self.loads += 1
+        return RankingIndex(self.fact_table, self.movies, GENRES, MOVIE_TYPES, COUNTRIES, version=version)
+
+
+def test_service_caches_results_until_the_version_changes():
+    versions = Versions()
+    service = RankingService(versions.load, version=lambda: versions.current, cache_size=8)
+    with pytest.raises(RuntimeError):
+        service.top()
+    assert service.refresh() and versions.loads == 1
+    assert not service.refresh()
+
+    movies, cached, version = service.top(genre="Drama", min_votes=500)
+    assert (cached, version) == (False, "1")
+    # Names are matched case-insensitively, so this is the same cache entry
+    assert service.top(genre="drama", min_votes=500) == (movies, True, "1")
+
+    versions.current = "2"
+    assert service.refresh() and versions.loads == 2
+    assert service.top(genre="drama", min_votes=500) == (movies, False, "2")
+    assert service.top(genre="drama", min_votes=500)[1]
+
+
+def test_top_endpoint_reports_cache_hits():
+    pytest.importorskip("httpx")
+    from fastapi.testclient import TestClient
+
+    versions = Versions()
+    service = RankingService(versions.load, version=lambda: versions.current)
+    app = create_app(service, poll_interval=0, admin_token="s3cret")
+    params = {"genre": "drama", "country": "US", "limit": 5}
+    with TestClient(app) as client:
+        first = client.get("/movies/top", params=params).json()
+        assert (first["version"], first["cached"]) == ("1", False)
+        assert client.get("/movies/top", params=params).json() == {**first, "cached": True}
+
+        versions.current = "2"
+        assert client.post("/admin/reload", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+        reloaded = client.get("/movies/top", params=params).json()
+        assert (reloaded["version"], reloaded["cached"]) == ("2", False)
+        assert reloaded["movies"] == first["movies"]
+        assert client.get("/movies/top", params={**params, "limit": 1000}).status_code == 422
@@ -0,0 +1,156 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import requests
+
+from utils.tmdb_cache import TMDbCache
+from utils.tmdb_csv_uploader import APICSVUploader
+
+# Responses recorded from the TMDb API
+FIXTURES = Path(__file__).parent / "fixtures" / "tmdb"
+
+
+def fixture(name):
+    return json.loads((FIXTURES / name).read_text())
+
+MATRIX = {"id": 603, "title": "The Matrix", "popularity": 80.5}
+
+
+def find_route(path, query):
+    imdb_id = path.rsplit("/", 1)[-1]
+    if imdb_id == "tt0000401":
+        return 401, None, {"status_code": 7, "status_message": "Invalid API key", "success": False}
+    if imdb_id == "tt0000500":
+        return 503, None, {"status_code": 43, "success": False}
+    return 200, None, {"movie_results": [MATRIX] if imdb_id == "tt0133093" else [], "tv_results": []}
+
+
+def test_sequential_fetch_keeps_errors_out_of_the_cache(stub_server, tmp_path):
+    base_url = stub_server(find_route)
+    imdb_ids = ["tt0133093", "tt0000401", "tt0000500", "tt0000001"]
+    with TMDbCache(str(tmp_path / "cache.sqlite")) as cache:
+        fetched = dict(APICSVUploader.iter_fetched(imdb_ids, cache=cache, base_url=base_url))
+        assert fetched == {"tt0133093": [MATRIX], "tt0000001": []}
+        # Real empty results are cached as negatives; failed requests are retried on the next run
+        assert cache.get_many(imdb_ids) == fetched
+
+
+def enrich_route(path, query):
+    # tt0133093 is fully recorded; the other two titles are found but their details request fails
+    # (a 404, and an error payload sent with a 200)
+    if path.startswith("/find/"):
+        imdb_id = path.rsplit("/", 1)[-1]
+        found = {"tt0133093": fixture("find_tt0133093.json")["movie_results"],
+                 "tt0000404": [{**MATRIX, "id": 999999}], "tt0000200": [{**MATRIX, "id": 999998}]}
+        return 200, None, {"movie_results": found.get(imdb_id, []), "tv_results": []}
+    assert query == {"append_to_response": "release_dates,external_ids"}
+    if path == "/movie/603":
+        return 200, None, fixture("movie_603.json")
+    return (404 if path == "/movie/999999" else 200), None, fixture("movie_not_found.json")
+
+
+@pytest.mark.parametrize("concurrent", [False, True], ids=["sequential", "concurrent"])
+def test_enriched_records_from_recorded_responses(stub_server, tmp_path, concurrent):
+    base_url = stub_server(enrich_route)
+    imdb_ids = ["tt0133093", "tt0000404", "tt0000200", "tt0000001"]
+    output_path = tmp_path / "tmdb_dataset.csv"
+    with TMDbCache(str(tmp_path / "cache.sqlite")) as cache:
+        APICSVUploader.generate_tmdb_csv(imdb_ids, output_path=str(output_path), concurrent=concurrent,
+                                         base_url=base_url, requests_per_second=0, cache=cache, enrich=True)
+        # Failed details are left out of the cache, so the next run asks again
+        assert set(APICSVUploader.get_cached(cache, imdb_ids, enrich=True)) == {"tt0133093", "tt0000001"}
+
+    records = pd.read_csv(output_path, keep_default_na=False)
+    assert records["imdb_id"].tolist() == ["tt0133093"]
+    matrix = records.iloc[0]
+    assert (matrix["id"], matrix["title"], matrix["genre_ids"]) == (603, "The Matrix", "[28, 878]")
+    assert {column: matrix[column] for column in ["runtime", "budget", "revenue", "status", "regional_release_date",
+                                                  "certification", "wikidata_id"]} == {
+        "runtime": 136, "budget": 63000000, "revenue": 463517383, "status": "Released",
+        # The US theatrical release, not the premiere
+        "regional_release_date": "1999-03-31", "certification": "R", "wikidata_id": "Q83495"}
+
+
+def test_flatten_movie_details_without_release_dates():
+    details = {**fixture("movie_603.json"), "runtime": 0, "budget": 0, "revenue": 0, "release_dates": {"results": []},
+               "external_ids": {}}
+    assert APICSVUploader.flatten_movie_details(details) == {
+        "runtime": None, "budget": None, "revenue": None, "status": "Released", "regional_release_date": None,
+        "certification": None, "wikidata_id": None}
+    assert APICSVUploader.flatten_movie_details(fixture("movie_603.json"), region="GB")["certification"] == "15"
+
+
+def details_route(path, query):
+    # The Matrix as recorded, and a second title whose details differ from it
+    if path.startswith("/find/"):
+        imdb_id = path.rsplit("/", 1)[-1]
+        found = {"tt0133093": fixture("find_tt0133093.json")["movie_results"], "tt0000002": [{**MATRIX, "id": 604}]}
+        return 200, None, {"movie_results": found.get(imdb_id, []), "tv_results": []}
+    if path == "/movie/603":
+        return 200, None, fixture("movie_603.json")
+    return 200, None, {**fixture("movie_603.json"), "id": 604, "runtime": 90, "budget": 1000}
+
+
+def test_movie_details_land_on_their_own_movie(stub_server, synthetic_root, tmp_path, monkeypatch):
+    import main
+    from utils.local_blob import LocalBlobServiceClient
+    from utils.runtime import PipelineRuntime, get_runtime, set_runtime
+
+    container = tmp_path / "blobs" / "csv-files"
+    container.mkdir(parents=True)
+    for name in ["country_annotation.csv", "tmdb_genre_list_dataset.csv"]:
+        (container / name).write_bytes((synthetic_root / "csv-files" / name).read_bytes())
+    # The IMDb rows are in a different order from the TMDb rows, and the first title has no TMDb row at all
+    imdb = pd.read_csv(synthetic_root / "csv-files" / "imdb_dataset_with_region.csv").head(3)
+    imdb["tconst"] = ["tt0000001", "tt0000002", "tt0133093"]
+    imdb.to_csv(container / "imdb_dataset_with_region.csv", index=False)
+    APICSVUploader.generate_tmdb_csv(["tt0133093", "tt0000002"], output_path=str(container / "tmdb_dataset.csv"),
+                                     base_url=stub_server(details_route), requests_per_second=0, enrich=True)
+
+    monkeypatch.chdir(tmp_path)
+    previous = get_runtime()
+    runtime = set_runtime(PipelineRuntime(sql_url=f"sqlite:///{tmp_path / 'warehouse.sqlite'}",
+                                          blob_service_client=LocalBlobServiceClient(str(tmp_path / "blobs"))))
+    try:
+        etl = main.MainETL(movie_details=True)
+        etl.extract_and_transform()
+    finally:
+        set_runtime(previous)
+        runtime.close()
+
+    movies = next(table for table in etl.dimension_tables if table.name == "Movie").dimension_table
+    movies = movies.set_index("MovieID")
+    assert movies.loc["tt0133093", ["Runtime", "Budget", "PosterString"]].tolist() == [
+        136, 63000000, "/p96dm7sCMn4VYAStA6siNz30G1r.jpg"]
+    assert movies.loc["tt0000002", ["Runtime", "Budget"]].tolist() == [90, 1000]
+    assert movies.loc["tt0000001", ["Runtime", "Budget", "PosterString"]].isna().all()
+
+
+def test_genre_list_errors_are_not_cached(stub_server, tmp_path):
+    responses = [(401, {"status_code": 7, "status_message": "Invalid API key", "success": False}),
+                 (200, {"status_code": 34, "success": False}),
+                 (200, {"genres": []}),
+                 (200, {"genres": [{"id": 28, "name": "Action"}, {"id": 878, "name": "Science Fiction"}]})]
+
+    def route(path, query):
+        assert (path, query) == ("/genre/movie/list", {"language": "en"})
+        status, body = responses.pop(0)
+        return status, None, body
+
+    base_url = stub_server(route)
+    output_path = tmp_path / "tmdb_genre_list_dataset.csv"
+    with TMDbCache(str(tmp_path / "cache.sqlite")) as cache:
+        for _ in range(2):
+            with pytest.raises(requests.HTTPError):
+                APICSVUploader.generate_tmdb_movie_csv(str(output_path), cache=cache, base_url=base_url)
+            assert cache.get("genre/movie/list") is None
+        APICSVUploader.generate_tmdb_movie_csv(str(output_path), cache=cache, base_url=base_url)
+        assert cache.get("genre/movie/list") is None
+        APICSVUploader.generate_tmdb_movie_csv(str(output_path), cache=cache, base_url=base_url)
+        assert cache.get("genre/movie/list") == [{"id": 28, "name": "Action"}, {"id": 878, "name": "Science Fiction"}]
+        # Served from the cache from now on
+        APICSVUploader.generate_tmdb_movie_csv(str(output_path), cache=cache, base_url=base_url)
+    assert len(stub_server.requests) == 4
+    assert pd.read_csv(output_path)["name"].tolist() == ["Action", "Science Fiction"]
@@ -0,0 +1,58 @@
+import time
+
+import pytest
+import requests
+
+from utils.tmdb_fetcher import TMDbFetcher
+
+FOUND = {"movie_results": [{"id": 603, "title": "The Matrix"}], "tv_results": []}
+
+
+def sequence(*responses):
+    # Route answering with each response in turn, then repeating the last one
+    responses = list(responses)
+
+    def route(path, query):
+        return responses.pop(0) if len(responses) > 1 else responses[0]
+    return route
+
+
+def test_429_waits_for_retry_after(stub_server):
+    base_url = stub_server(sequence((429, {"Retry-After": "1"}, {"status_code": 25}), (200, None, FOUND)))
+    with TMDbFetcher("token", base_url=base_url, requests_per_second=0, backoff_base=0) as fetcher:
+        assert fetcher.find_by_imdb_id("tt0133093") == FOUND["movie_results"]
+    (first, path, query), (second, _, _) = stub_server.requests
+    assert path == "/find/tt0133093" and query == {"external_source": "imdb_id"}
+    assert second - first >= 0.9
+
+
+def test_5xx_backs_off_then_succeeds(stub_server):
+    base_url = stub_server(sequence((503, None, {}), (502, None, {}), (200, None, FOUND)))
+    with TMDbFetcher("token", base_url=base_url, requests_per_second=0, backoff_base=0.01) as fetcher:
+        assert fetcher.find_by_imdb_id("tt0133093") == FOUND["movie_results"]
+    assert len(stub_server.requests) == 3
+
+
+@pytest.mark.parametrize("status, headers", [(500, None), (429, {"Retry-After": "0"})])
+def test_gives_up_after_max_retries(stub_server, status, headers):
+    base_url = stub_server(sequence((status, headers, {})))
+    with TMDbFetcher("token", base_url=base_url, requests_per_second=0, max_retries=2, backoff_base=0.01) as fetcher:
+        with pytest.raises(requests.HTTPError):
+            fetcher.find_by_imdb_id("tt0133093")
+    assert len(stub_server.requests) == 3
+
+
+def test_requests_per_second_budget(stub_server):
+    base_url = stub_server(sequence((200, None, FOUND)))
+    imdb_ids = [f"tt{i:07d}" for i in range(24)]
+    start = time.monotonic()
+    with TMDbFetcher("token", base_url=base_url, max_workers=4, requests_per_second=20, progress_every=100) as fetcher:
+        results = list(fetcher.fetch_many(imdb_ids))
+    elapsed = time.monotonic() - start
+    assert sorted(imdb_id for imdb_id, _, _ in results) == imdb_ids
+    assert all(error is None and found == FOUND["movie_results"] for _, found, error in results)
+    # A burst of max_workers tokens, then 20 per second
+    assert elapsed >= (len(imdb_ids) - 4) / 20 * 0.9
+    times = sorted(t for t, _, _ in stub_server.requests)
+    assert len(times) == len(imdb_ids)
+    assert times[-1] - times[4] >= (len(imdb_ids) - 5) / 20 * 0.9
@@ -0,0 +1,124 @@
+# blob_cache.py
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+
+
+class BlobCache:
+    # Local copy of downloaded blobs, revalidated with a conditional GET on the blob's ETag.
+    # Unchanged blobs are served from disk; the least recently used files are evicted above max_bytes.
+    def __init__(self, cache_dir: str, max_bytes: int = 5 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+
+    def _save_index(self):
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _file_path(self, key: str):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest())
+
+    def fetch(self, container_client, blob_name: str):
+        # Returns the local path of an up-to-date copy of the blob
+        from azure.core import MatchConditions
+        from azure.core.exceptions import ResourceNotModifiedError
+
+        key = f"{container_client.container_name}/{blob_name}"
+        path = self._file_path(key)
+        with self.lock:
+            entry = self.index.get(key)
+        if entry is not None and not os.path.exists(path):
+            entry = None
+
+        try:
+            if entry is not None:
+                downloader = container_client.download_blob(blob_name, etag=entry["etag"],
+                                                            match_condition=MatchConditions.IfModified)
+            else:
+                downloader = container_client.download_blob(blob_name)
+        except ResourceNotModifiedError:
+            print(f"♻️ {blob_name} unchanged (ETag {entry['etag']}), served from local cache")
+            with self.lock:
+                entry["accessed_at"] = time.time()
+                self._save_index()
+            return path
+
+        print(f"⬇️ Caching {blob_name} locally")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        size = 0
+        with open(tmp_path, "wb") as f:
+            for chunk in downloader.chunks():
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(tmp_path, path)
+
+        properties = downloader.properties
+        last_modified = getattr(properties, "last_modified", None)
+        with self.lock:
+            self.index[key] = {
+                "etag": properties.etag,
+                "last_modified": last_modified.isoformat() if last_modified else None,
+                "size": size,
+                "accessed_at": time.time(),
+            }
+            self._evict(keep=key)
+            self._save_index()
+        return path
+
+    def open_mmap(self, container_client, blob_name: str):
+        # Memory-mapped, read-only view of the cached blob
+        path = self.fetch(container_client, blob_name)
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _evict(self, keep: str = None):
+        total = sum(entry["size"] for entry in self.index.values())
+        for key, entry in sorted(self.index.items(), key=lambda item: item[1]["accessed_at"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            path = self._file_path(key)
+            if os.path.exists(path):
+                os.remove(path)
+            total -= entry["size"]
+            del self.index[key]
+            print(f"🧹 Evicted {key} from local blob cache")
+
+    def invalidate(self, container_name: str, blob_name: str):
+        key = f"{container_name}/{blob_name}"
+        with self.lock:
+            if self.index.pop(key, None) is not None:
+                path = self._file_path(key)
+                if os.path.exists(path):
+                    os.remove(path)
+                self._save_index()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_blob_cache(cache_dir: str, max_bytes: int = 5 * 1024 ** 3):
+    # One BlobCache per directory, shared by every AzureDB instance in the process
+    cache_dir = os.path.abspath(cache_dir)
+    with _caches_lock:
+        cache = _caches.get(cache_dir)
+        if cache is None:
+            cache = _caches[cache_dir] = BlobCache(cache_dir, max_bytes)
+        cache.max_bytes = max_bytes
+        return cache
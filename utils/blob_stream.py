@@ -0,0 +1,184 @@
+# blob_stream.py
+# Streaming writes to block blobs. Bytes are cut into fixed-size blocks that are staged (stage_block) on a small
+# thread pool while the producer keeps going, and the block list is committed once at the end, so memory stays
+# at a few blocks whatever the blob's size. Until the commit the previous version of the blob stays readable;
+# a writer that fails or is aborted never commits, and its staged blocks are discarded by the service.
+# RecordBlobWriter encodes dict records on top of it as gzip/plain CSV or as Parquet row groups.
+import csv
+import gzip
+import io
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.instrumentation import span
+
+
+class BlockBlobWriter(io.RawIOBase):
+    def __init__(self, blob_client, block_size: int = 8 * 1024 * 1024, max_concurrency: int = 4, metadata: dict = None):
+        self.blob_client = blob_client
+        self.block_size = block_size
+        self.max_concurrency = max(1, max_concurrency)
+        self.metadata = metadata
+        self.bytes_written = 0
+        # Block ids must all have the same length within a blob
+        self._prefix = uuid.uuid4().hex[:16]
+        self._block_ids = []
+        self._buffer = bytearray()
+        self._inflight = []
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        self._committed = False
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("write to a closed BlockBlobWriter")
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.block_size:
+            block = bytes(self._buffer[:self.block_size])
+            del self._buffer[:self.block_size]
+            self._stage(block)
+        return len(data)
+
+    def _stage(self, block: bytes):
+        # At most max_concurrency blocks in flight: wait for the oldest before staging another
+        if len(self._inflight) >= self.max_concurrency:
+            self._inflight.pop(0).result()
+        block_id = f"{self._prefix}-{len(self._block_ids):08d}"
+        self._block_ids.append(block_id)
+        self._inflight.append(self._executor.submit(self.blob_client.stage_block, block_id, block))
+
+    def _drain(self):
+        while self._inflight:
+            self._inflight.pop(0).result()
+
+    def commit(self):
+        # Stage what is left and make the blob its new content
+        if self._buffer or not self._block_ids:
+            self._stage(bytes(self._buffer))
+            self._buffer.clear()
+        self._drain()
+        self.blob_client.commit_block_list(self._block_ids, metadata=self.metadata)
+        self._committed = True
+
+    def abort(self):
+        for future in self._inflight:
+            future.cancel()
+        self._inflight = []
+        self._buffer.clear()
+        self._committed = True
+        self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if not self._committed:
+                self.commit()
+        finally:
+            self._executor.shutdown(wait=True)
+            super().close()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+def blob_format(blob_name: str):
+    # Encoding from the blob name: .parquet, .csv.gz or .csv
+    if blob_name.endswith(".parquet"):
+        return "parquet"
+    if blob_name.endswith(".gz"):
+        return "csv.gz"
+    return "csv"
+
+
+class RecordBlobWriter:
+    # Writes dict records to a block blob as they arrive. The columns are fixed by the first batch of records:
+    # keys first seen later are left out and missing keys are written empty.
+    # CSV values are written as pandas' to_csv writes them (lists as "[1, 2]", None as an empty field).
+    def __init__(self, blob_client, blob_name: str, batch_size: int = 5_000, row_group_size: int = 50_000,
+                 block_size: int = 8 * 1024 * 1024, max_concurrency: int = 4, metadata: dict = None):
+        self.blob_name = blob_name
+        self.format = blob_format(blob_name)
+        # Records are encoded batch by batch; Parquet row groups hold row_group_size records
+        self.batch_size = row_group_size if self.format == "parquet" else batch_size
+        self.writer = BlockBlobWriter(blob_client, block_size=block_size, max_concurrency=max_concurrency,
+                                      metadata=metadata)
+        self.sink = gzip.GzipFile(fileobj=self.writer, mode="wb") if self.format == "csv.gz" else self.writer
+        self.columns = None
+        self.rows = 0
+        self._batch = []
+        self._parquet = None
+        self._schema = None
+
+    def write(self, record: dict):
+        self._batch.append(record)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        if not self._batch:
+            return
+        if self.columns is None:
+            self.columns = list(dict.fromkeys(key for record in self._batch for key in record))
+        if self.format == "parquet":
+            self._write_parquet(self._batch)
+        else:
+            self._write_csv(self._batch)
+        self.rows += len(self._batch)
+        self._batch = []
+
+    def _write_csv(self, records: list):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=self.columns, extrasaction="ignore", lineterminator="\n")
+        if self.rows == 0:
+            writer.writeheader()
+        writer.writerows(records)
+        self.sink.write(buffer.getvalue().encode("utf-8"))
+
+    def _write_parquet(self, records: list):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._parquet is None:
+            inferred = pa.Table.from_pylist(records).schema
+            # All-null columns are typed as strings, as their type is unknown
+            self._schema = pa.schema([pa.field(column, pa.string() if pa.types.is_null(inferred.field(column).type)
+                                      else inferred.field(column).type) for column in self.columns])
+            self._parquet = pq.ParquetWriter(self.sink, self._schema, compression="zstd")
+        rows = [{column: record.get(column) for column in self.columns} for record in records]
+        self._parquet.write_table(pa.Table.from_pylist(rows, schema=self._schema))
+
+    def close(self):
+        # Commits the blob; returns the number of records written
+        with span(f"ingest.blob[{self.blob_name}]", format=self.format) as stage:
+            self.flush()
+            if self._parquet is not None:
+                self._parquet.close()
+            if self.sink is not self.writer:
+                self.sink.close()
+            self.writer.close()
+            stage.rows_out = self.rows
+            stage.bytes_out = self.writer.bytes_written
+        return self.rows
+
+    def abort(self):
+        self.writer.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
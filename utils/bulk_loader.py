@@ -0,0 +1,80 @@
+# bulk_loader.py
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.instrumentation import frame_bytes, span
+
+
+class BulkLoader:
+    # Batched executemany loader for DataFrames.
+    # Works with any SQLAlchemy engine: on mssql+pyodbc the engine's fast_executemany flag turns each
+    # batch into one array-bound round trip; a sqlite engine gives a local stand-in for benchmarking.
+    def __init__(self, engine, batch_size: int = 50_000, workers: int = 1, progress: bool = True):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
+        self.progress = progress
+
+    def _insert_sql(self, table_name: str, columns: list):
+        quote = self.engine.dialect.identifier_preparer.quote
+        paramstyle = self.engine.dialect.paramstyle
+        if paramstyle == "qmark":
+            placeholders = ", ".join("?" for _ in columns)
+        elif paramstyle in ("format", "pyformat"):
+            placeholders = ", ".join("%s" for _ in columns)
+        elif paramstyle == "numeric":
+            placeholders = ", ".join(f":{i + 1}" for i in range(len(columns)))
+        else:
+            raise ValueError(f"Unsupported DBAPI paramstyle '{paramstyle}'")
+        column_list = ", ".join(quote(column) for column in columns)
+        return f"INSERT INTO {quote(table_name)} ({column_list}) VALUES ({placeholders})"
+
+    @staticmethod
+    def _rows(batch: pd.DataFrame):
+        # Plain Python values with NaN/NaT as None, which every driver accepts
+        columns = [batch[column].astype(object).where(batch[column].notna(), None).tolist() for column in batch.columns]
+        return list(zip(*columns))
+
+    def _write_batch(self, sql: str, batch: pd.DataFrame):
+        rows = self._rows(batch)
+        with self.engine.begin() as con:
+            con.exec_driver_sql(sql, rows)
+        return len(rows)
+
+    def load(self, table_name: str, df: pd.DataFrame, if_exists: str = "replace"):
+        # Create (or replace) the table from the frame's schema, then insert it in batches
+        with span(f"load.bulk[{table_name}]", rows_in=len(df), bytes_in=frame_bytes(df), if_exists=if_exists) as stage:
+            loaded = self._load(table_name, df, if_exists)
+            stage.rows_out = loaded
+        return loaded
+
+    def _load(self, table_name: str, df: pd.DataFrame, if_exists: str):
+        start = time.monotonic()
+        df.head(0).to_sql(table_name, self.engine, if_exists=if_exists, index=False)
+        if df.empty:
+            return 0
+
+        sql = self._insert_sql(table_name, list(df.columns))
+        batches = (df.iloc[i:i + self.batch_size] for i in range(0, len(df), self.batch_size))
+        total = len(df)
+        loaded = 0
+
+        def report(rows: int):
+            nonlocal loaded
+            loaded += rows
+            if self.progress:
+                elapsed = time.monotonic() - start
+                rate = loaded / elapsed if elapsed > 0 else 0.0
+                print(f"📤 {table_name}: {loaded}/{total} rows ({rate:,.0f} rows/s)")
+
+        if self.workers == 1:
+            for batch in batches:
+                report(self._write_batch(sql, batch))
+        else:
+            # Parallel chunk writers, each on its own pooled connection and transaction
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for rows in executor.map(lambda batch: self._write_batch(sql, batch), batches):
+                    report(rows)
+        return loaded
@@ -0,0 +1,149 @@
+# checkpoints.py
+# Checkpoints for resumable ETL runs. Every transformed table is written to Parquet next to a manifest that
+# records the run's input hash (source blob ETags and sizes plus the transform options), each table's row
+# count and its load status in the target database, and the steps after the loads (keys, load log).
+# A run with the same inputs picks up the manifest: finished tables are read back instead of rebuilt, loaded
+# tables are not loaded again, and a run whose load completed has nothing left to do.
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+import pandas as pd
+
+from utils.fact_partitions import ParquetPartitionSink, read_fact_partitions
+
+MANIFEST_NAME = "manifest.json"
+
+
+def input_hash(inputs: dict, options: dict):
+    payload = json.dumps({"inputs": inputs, "options": options}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+
+
+class RunManifest:
+    # inputs: source blob -> fingerprint, options: everything else that changes the transformed tables.
+    # resume=False always starts over.
+    def __init__(self, directory: str, inputs: dict, options: dict, resume: bool = True):
+        self.directory = directory
+        self.path = os.path.join(directory, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        digest = input_hash(inputs, options)
+        manifest = None
+        if resume and os.path.exists(self.path):
+            with open(self.path) as f:
+                manifest = json.load(f)
+        self.resumed = manifest is not None and manifest.get("input_hash") == digest
+        if not self.resumed:
+            if manifest is not None:
+                print(f"ℹ️ Inputs changed since the last checkpointed run, starting over")
+            self._clear()
+            manifest = {"input_hash": digest, "inputs": inputs, "options": options, "created_at": _now(),
+                        "tables": {}, "steps": {}}
+            self._write(manifest)
+        self.manifest = manifest
+
+    def _clear(self):
+        # Checkpoints of other inputs are never read again
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name != MANIFEST_NAME:
+                shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+
+    def _write(self, manifest: dict):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2, default=str)
+        os.replace(tmp_path, self.path)
+
+    def _update(self, update):
+        with self._lock:
+            update(self.manifest)
+            self._write(self.manifest)
+
+    @property
+    def complete(self):
+        return "load" in self.manifest["steps"]
+
+    def table(self, table_name: str):
+        return self.manifest["tables"].get(table_name)
+
+    def has_tables(self, table_names: list):
+        return all((self.table(name) or {}).get("path") for name in table_names)
+
+    def table_path(self, table_name: str):
+        return os.path.join(self.directory, f"{table_name}.parquet")
+
+    def save_table(self, table_name: str, df: pd.DataFrame, **info):
+        # info: anything needed to rebuild the table's object, e.g. a dimension's columns
+        path = self.table_path(table_name)
+        df.to_parquet(path + ".tmp", index=True)
+        os.replace(path + ".tmp", path)
+        self._record_table(table_name, os.path.basename(path), len(df), info)
+
+    def partition_sink(self, table_name: str, sink):
+        # Tees partitioned fact generation into a directory of Parquet partitions
+        return CheckpointPartitionSink(self, table_name, sink)
+
+    def _record_table(self, table_name: str, file_name: str, rows: int, info: dict):
+        def update(manifest):
+            # Rebuilt from the same inputs (e.g. to regenerate a partitioned fact table), so an earlier load still holds
+            entry = manifest["tables"].setdefault(table_name, {"load_status": "pending"})
+            entry.update(path=file_name, rows=int(rows), info=info, transformed_at=_now())
+        self._update(update)
+
+    def read_table(self, table_name: str):
+        entry = self.table(table_name)
+        path = os.path.join(self.directory, entry["path"])
+        df = read_fact_partitions(path) if os.path.isdir(path) else pd.read_parquet(path)
+        if len(df) != entry["rows"]:
+            raise ValueError(f"Checkpoint of {table_name} has {len(df)} rows, the manifest says {entry['rows']}")
+        return df
+
+    def is_loaded(self, table_name: str):
+        entry = self.table(table_name)
+        return entry is not None and entry["load_status"] == "loaded"
+
+    def mark_loaded(self, table_name: str, load_mode: str):
+        def update(manifest):
+            entry = manifest["tables"].setdefault(table_name, {})
+            entry.update(load_status="loaded", load_mode=load_mode, loaded_at=_now())
+        self._update(update)
+
+    def step_done(self, step: str):
+        return step in self.manifest["steps"]
+
+    def mark_step(self, step: str, **info):
+        def update(manifest):
+            manifest["steps"][step] = {"completed_at": _now(), **info}
+        self._update(update)
+
+
+class CheckpointPartitionSink:
+    # Writes every partition to the checkpoint directory before passing it on; the table is only
+    # recorded in the manifest once all partitions are in
+    def __init__(self, manifest: RunManifest, table_name: str, sink):
+        self.manifest = manifest
+        self.table_name = table_name
+        self.sink = sink
+        self.parquet = ParquetPartitionSink(os.path.join(manifest.directory, table_name))
+        self.rows = 0
+        # Partitions have to reach this process to be passed on
+        self.in_workers = False
+
+    def write(self, partition: int, fact_table: pd.DataFrame):
+        self.parquet.write(partition, fact_table)
+        self.rows += len(fact_table)
+        self.sink.write(partition, fact_table)
+
+    def close(self):
+        self.sink.close()
+        self.manifest._record_table(self.table_name, self.table_name, self.rows, {})
@@ -0,0 +1,114 @@
+# dag_scheduler.py
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils.instrumentation import get_tracer, span
+
+
+class DAGNode:
+    def __init__(self, name: str, func, deps: list):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.start = None
+        self.end = None
+
+    @property
+    def duration(self):
+        if self.start is None or self.end is None:
+            return 0.0
+        return self.end - self.start
+
+
+class DAGScheduler:
+    # Runs callables as soon as their dependencies have finished, on a bounded thread pool.
+    # Each node's function is called with its dependencies' results as positional arguments, in the order given.
+    def __init__(self, name: str = "pipeline", max_workers: int = 4):
+        self.name = name
+        self.max_workers = max_workers
+        self.nodes = {}
+        self.results = {}
+        self.started_at = None
+        self.finished_at = None
+
+    def add(self, name: str, func, deps: list = ()):
+        if name in self.nodes:
+            raise ValueError(f"Node '{name}' is already in the graph")
+        for dep in deps:
+            if dep not in self.nodes:
+                raise ValueError(f"Node '{name}' depends on unknown node '{dep}'")
+        self.nodes[name] = DAGNode(name, func, deps)
+        return name
+
+    def _run_node(self, node: DAGNode, parent=None):
+        # Pool threads don't share the caller's span stack, so the enclosing span is passed in.
+        # Node spans are named "<graph>.node[<node>]" so they never share a name with a stage span they wrap
+        # (e.g. the load graph's build_keys node around StarSchema's "load.build_keys")
+        node.start = time.perf_counter()
+        try:
+            with span(f"{self.name}.node[{node.name}]", parent=parent):
+                return node.func(*[self.results[dep] for dep in node.deps])
+        finally:
+            node.end = time.perf_counter()
+
+    def run(self):
+        # Nodes are added in dependency order, so the graph is acyclic by construction
+        self.started_at = time.perf_counter()
+        parent = get_tracer().current()
+        remaining = dict(self.nodes)
+        running = {}
+        error = None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while remaining or running:
+                if error is None:
+                    for name, node in list(remaining.items()):
+                        if all(dep in self.results for dep in node.deps):
+                            running[executor.submit(self._run_node, node, parent)] = name
+                            del remaining[name]
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except Exception as ex:
+                        print(f"❌ {self.name}: node '{name}' failed: {ex}")
+                        if error is None:
+                            error = ex
+
+        self.finished_at = time.perf_counter()
+        if error is not None:
+            skipped = [name for name in remaining]
+            if skipped:
+                print(f"⏭️ {self.name}: skipped {', '.join(skipped)}")
+            raise error
+        self.report()
+        return self.results
+
+    def critical_path(self):
+        # Walk back from the last node to finish through the dependency that finished last
+        finished = [node for node in self.nodes.values() if node.end is not None]
+        if not finished:
+            return []
+        node = max(finished, key=lambda n: n.end)
+        path = [node]
+        while node.deps:
+            node = max((self.nodes[dep] for dep in node.deps), key=lambda n: n.end or 0)
+            path.append(node)
+        return list(reversed(path))
+
+    def timings(self):
+        return {
+            name: {"start": node.start - self.started_at, "end": node.end - self.started_at, "duration": node.duration}
+            for name, node in self.nodes.items() if node.start is not None and node.end is not None
+        }
+
+    def report(self):
+        total = self.finished_at - self.started_at
+        print(f"⏱️ {self.name}: {len(self.nodes)} nodes in {total:.2f}s")
+        for name, timing in sorted(self.timings().items(), key=lambda item: item[1]["start"]):
+            print(f"   {name:<28} {timing['start']:>8.2f}s -> {timing['end']:>8.2f}s  ({timing['duration']:.2f}s)")
+        path = self.critical_path()
+        print(f"🧭 Critical path ({sum(node.duration for node in path):.2f}s): " + " -> ".join(node.name for node in path))
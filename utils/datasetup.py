@@ -1,11 +1,21 @@
-import os, pyodbc
-from azure.identity import DefaultAzureCredential
-from azure.storage.blob import BlobServiceClient
+import os
 import io
+import gzip
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 import pandas as pd
 import json
+import shutil
+import uuid
+from utils.blob_cache import get_blob_cache
+from utils.blob_stream import RecordBlobWriter
+from utils.bulk_loader import BulkLoader
+from utils.incremental_loader import HASH_COLUMN, IncrementalLoader, add_row_hash
+from utils.instrumentation import frame_bytes, span
+from utils.sql_stream import encode_batches, iter_sql_batches, write_chunks
+from utils.star_schema import StarSchema
+from utils.runtime import get_runtime
+from utils.sampling import sample_label, sample_mask
 
 load_dotenv()
 
@@ -19,19 +29,131 @@ account_storage = os.environ.get('ACCOUNT_STORAGE')
 connect_str = os.getenv('AZURE_STORAGE_CONNECTION_STRING')
 tmdb_api_token = os.getenv('TMDB_API_READ_ACCESS_TOKEN')
 
+# One row per completed ETL load
+LOAD_LOG_TABLE = "EtlLoadLog"
+
 # Using pyodbc
-engine = create_engine(f'mssql+pyodbc://{username}:{password}@{server}/{database}?driver=ODBC+Driver+18+for+SQL+Server')
+# The SQL engine and the blob service client are created lazily and pooled by utils.runtime;
+# get_runtime().engine replaces the old module-level engine
+
+class BlobChunkStream(io.RawIOBase):
+    # Read-only file object over an iterator of byte chunks (e.g. StorageStreamDownloader.chunks()),
+    # so pandas can parse a blob while it downloads without holding the whole payload in memory
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not len(self._buffer):
+            try:
+                self._buffer = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+class BlobRangeFile(io.RawIOBase):
+    # Seekable read-only file object that fetches byte ranges of a blob on demand,
+    # so Parquet readers only download the footer and the column chunks they need
+    def __init__(self, blob_client):
+        self._blob_client = blob_client
+        self._size = blob_client.get_blob_properties().size
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = self._size + offset
+        return self._pos
+
+    def readinto(self, b):
+        length = min(len(b), self._size - self._pos)
+        if length <= 0:
+            return 0
+        data = self._blob_client.download_blob(offset=self._pos, length=length).readall()
+        b[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
 
 class AzureDB():
-    def __init__(self, local_path = "./data", account_storage = account_storage):
+    def __init__(self, local_path = "./data", account_storage = account_storage, blob_service_client = None,
+                 blob_cache_bytes = 5 * 1024 ** 3, bulk_batch_size = 50_000, bulk_workers = 1, runtime = None,
+                 sql_engine = None):
         self.local_path = local_path
         self.account_url = f"https://{account_storage}.blob.core.windows.net"
-        self.default_credential = DefaultAzureCredential()
-        self.blob_service_client = BlobServiceClient.from_connection_string(connect_str)
+        # Clients come from the shared runtime and are only created when first used
+        self.runtime = runtime or get_runtime()
+        # Pass a utils.local_blob.LocalBlobServiceClient to run against the local filesystem instead of Azure
+        self._blob_service_client = blob_service_client
+        # Pass a sqlite engine to load into a local database instead of Azure SQL
+        self._sql_engine = sql_engine
         # self.blob_service_client = BlobServiceClient(self.account_url, credential=self.default_credential)
-        
+        # ETag-validated local copies of downloaded blobs (set blob_cache_bytes=0 to disable)
+        self.blob_cache = get_blob_cache(os.path.join(local_path, "blob_cache"), blob_cache_bytes) if blob_cache_bytes else None
+        self.bulk_batch_size = bulk_batch_size
+        self.bulk_workers = bulk_workers
+        self._bulk_loader = None
+        self._incremental_loader = None
+        self._star_schema = None
+
+    @property
+    def default_credential(self):
+        return self.runtime.credential
+
+    @property
+    def blob_service_client(self):
+        return self._blob_service_client or self.runtime.blob_service_client
+
+    @property
+    def engine(self):
+        return self._sql_engine or self.runtime.engine
+
+    @property
+    def bulk_loader(self):
+        # Batched executemany loader used for every DataFrame upload
+        if self._bulk_loader is None:
+            self._bulk_loader = BulkLoader(self.engine, batch_size=self.bulk_batch_size, workers=self.bulk_workers)
+        return self._bulk_loader
+
+    @property
+    def incremental_loader(self):
+        if self._incremental_loader is None:
+            self._incremental_loader = IncrementalLoader(self.engine, self.bulk_loader)
+        return self._incremental_loader
+
+    @property
+    def star_schema(self):
+        # Typed DDL and keys for the dimension and fact tables (utils.star_schema)
+        if self._star_schema is None:
+            self._star_schema = StarSchema(self.engine)
+        return self._star_schema
+
     def access_container(self, container_name): 
         # Use this function to create/access a new container
+        if self._blob_service_client is None and self.runtime.container_client(container_name) is not None:
+            # Already created or opened earlier in this process
+            self.container_client = self.runtime.container_client(container_name)
+            self.container_name = container_name
+            return
         try:
             # Creating container if not exist
             self.container_client = self.blob_service_client.create_container(container_name)
@@ -43,6 +165,8 @@ class AzureDB():
             # Access the container
             self.container_client = self.blob_service_client.get_container_client(container=container_name)
             self.container_name = container_name
+        if self._blob_service_client is None:
+            self.runtime.register_container(container_name, self.container_client)
             
     def delete_container(self):
         # Delete a container
@@ -58,12 +182,19 @@ class AzureDB():
         print("\nUploading to Azure Storage as blob:\n\t" + local_file_name)
 
         if blob_data is not None:
-            blob_client.create_blob_from_text(container_name=self.container_name, blob_name=blob_name, text=blob_data)
+            # str, bytes or a readable file object
+            blob_client.upload_blob(blob_data, overwrite=True)
         else:
             # Upload the created file
             with open(file=upload_file_path, mode="rb") as data:
                 blob_client.upload_blob(data, overwrite=True)
                 
+    def open_blob_writer(self, blob_name, block_size=8 * 1024 * 1024, max_concurrency=4, **kwargs):
+        # Streaming writer for dict records: CSV, gzip CSV (.csv.gz) or Parquet (.parquet) by the blob's name,
+        # staged block by block in parallel and committed on close (utils.blob_stream)
+        blob_client = self.blob_service_client.get_blob_client(container=self.container_name, blob=blob_name)
+        return RecordBlobWriter(blob_client, blob_name, block_size=block_size, max_concurrency=max_concurrency, **kwargs)
+
     def list_blobs(self):
         print("\nListing blobs...")
         # List the blobs in the container
@@ -75,6 +206,9 @@ class AzureDB():
         # Download the blob to local storage
         download_file_path = os.path.join(self.local_path, blob_name)
         print("\nDownloading blob to \n\t" + download_file_path)
+        if self.blob_cache is not None:
+            shutil.copyfile(self.blob_cache.fetch(self.container_client, blob_name), download_file_path)
+            return
         with open(file=download_file_path, mode="wb") as download_file:
                 download_file.write(self.container_client.download_blob(blob_name).readall())
                 
@@ -84,68 +218,278 @@ class AzureDB():
         blob_client = self.blob_service_client.get_blob_client(container=container_name, blob=blob_name)
         blob_client.delete_blob()
         
-    def access_blob_csv(self, blob_name):
+    def access_blob_csv(self, blob_name, usecols=None, dtype=None, chunksize=None, stream=True):
         # Read the csv blob from Azure
+        # usecols/dtype are passed to pandas; with chunksize an iterator of DataFrames is returned
+        # Blobs named *.gz (e.g. written by open_blob_writer) are gzip-compressed
+        compression = "gzip" if blob_name.endswith(".gz") else None
         try:
-            print(f"Acessing blob {blob_name}")
-            
-            # df = pd.read_csv(io.StringIO(self.container_client.download_blob(blob_name).readall().decode('utf-8', errors='replace'))) #swap out chars that can't be decoded with a replacement char
-            df = pd.read_csv(io.StringIO(self.container_client.download_blob(blob_name).readall().decode('utf-8', errors='ignore')))  #ignore chars that can't be decoded
-            return df      
+            with span(f"extract.csv[{blob_name}]", stream=stream, chunked=chunksize is not None) as stage:
+                if not stream:
+                    # df = pd.read_csv(io.StringIO(self.container_client.download_blob(blob_name).readall().decode('utf-8', errors='replace'))) #swap out chars that can't be decoded with a replacement char
+                    data = self.container_client.download_blob(blob_name).readall()
+                    stage.bytes_in = len(data)
+                    if compression == "gzip":
+                        data = gzip.decompress(data)
+                    df = pd.read_csv(io.StringIO(data.decode('utf-8', errors='ignore')),  #ignore chars that can't be decoded
+                                     usecols=usecols, dtype=dtype, chunksize=chunksize)
+                elif self.blob_cache is not None:
+                    # Parse the ETag-validated local copy through a memory map
+                    cached_file = self.blob_cache.fetch(self.container_client, blob_name)
+                    stage.bytes_in = os.path.getsize(cached_file)
+                    df = pd.read_csv(cached_file, memory_map=compression is None, compression=compression, encoding='utf-8', encoding_errors='ignore',  #ignore chars that can't be decoded
+                                     usecols=usecols, dtype=dtype, chunksize=chunksize)
+                else:
+                    # Stream the blob's chunks straight into the parser instead of buffering the whole file
+                    downloader = self.container_client.download_blob(blob_name)
+                    stage.bytes_in = getattr(downloader, "size", None)
+                    blob_stream = io.BufferedReader(BlobChunkStream(downloader.chunks()))
+                    df = pd.read_csv(blob_stream, compression=compression, encoding='utf-8', encoding_errors='ignore',  #ignore chars that can't be decoded
+                                     usecols=usecols, dtype=dtype, chunksize=chunksize)
+                # With chunksize the rows are only read when the caller iterates
+                if isinstance(df, pd.DataFrame):
+                    stage.rows_out = len(df)
+                    stage.bytes_out = frame_bytes(df)
+            return df
         except Exception as ex:
             print('Exception:')
             print(ex)
     
 
-    def upload_dataframe_sqldatabase(self, blob_name, blob_data, primary_key_name=None):
-        print("\nUploading to Azure SQL server as table:\n\t" + blob_name)
-        blob_data.to_sql(blob_name, engine, if_exists='replace', index=False)
+    def staged_parquet_name(self, blob_name):
+        # imdb_dataset.csv -> staging/imdb_dataset.parquet
+        return f"staging/{os.path.splitext(blob_name)[0]}.parquet"
 
-        # Check if the primary key column exists in the dataframe
-        if primary_key_name and primary_key_name not in blob_data.columns:
-            raise ValueError(f"Primary key column '{primary_key_name}' not found in '{blob_name}'")
+    def stage_blob_parquet(self, blob_name, storage="local", compression="zstd", row_group_size=250_000):
+        # Convert a csv blob once into typed, compressed Parquet, stored locally under
+        # local_path/staging or next to the csv in the container.
+        # The csv's ETag is recorded so a changed csv is re-staged.
+        import pyarrow as pa
+        import pyarrow.parquet as pq
 
-        with engine.connect() as con:
-            trans = con.begin()
-            
+        with span(f"extract.stage_parquet[{blob_name}]", storage=storage) as stage:
+            etag = str(self.container_client.get_blob_client(blob_name).get_blob_properties().etag)
+            df = self.access_blob_csv(blob_name)
+            if df is None:
+                raise ValueError(f"Could not read blob '{blob_name}' for staging")
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"source_etag": etag.encode()})
+            del df
+            stage.rows_in = table.num_rows
 
-            # Check for country_dim table to apply varchar
-            if blob_name.lower() == "country_dim" or blob_name.lower() == "movie_dim":
-                # Apply varchar data type for primary key in country_dim
-                con.execute(text(f'ALTER TABLE [dbo].[{blob_name}] ALTER COLUMN {primary_key_name} varchar(20) NOT NULL'))
-                # Add the primary key constraint
-                con.execute(text(f'ALTER TABLE [dbo].[{blob_name}] ADD CONSTRAINT [PK_{blob_name}] PRIMARY KEY CLUSTERED ([{primary_key_name}] ASC);'))
-            elif blob_name == "MovieGenreFact_dim":
-                # Make sure the composite key columns are NOT NULL first
-                con.execute(text('ALTER TABLE [dbo].[MovieGenreFact_dim] ALTER COLUMN MovieID VARCHAR(20) NOT NULL'))
-                con.execute(text('ALTER TABLE [dbo].[MovieGenreFact_dim] ALTER COLUMN GenreID INT NOT NULL'))
-                con.execute(
-                    text(f'ALTER TABLE [dbo].[{blob_name}]'
-                        f'ADD CONSTRAINT PK_MovieGenreFact PRIMARY KEY (MovieID, GenreID);')
-                )
+            parquet_name = self.staged_parquet_name(blob_name)
+            if storage == "local":
+                local_file = os.path.join(self.local_path, parquet_name)
+                os.makedirs(os.path.dirname(local_file), exist_ok=True)
+                pq.write_table(table, local_file, compression=compression, row_group_size=row_group_size)
+                stage.bytes_out = os.path.getsize(local_file)
+            elif storage == "blob":
+                sink = pa.BufferOutputStream()
+                pq.write_table(table, sink, compression=compression, row_group_size=row_group_size)
+                data = sink.getvalue().to_pybytes()
+                stage.bytes_out = len(data)
+                self.container_client.get_blob_client(parquet_name).upload_blob(
+                    data, overwrite=True, metadata={"source_etag": etag.strip('"')})
             else:
-                # Apply int/bigint data type for primary key in other dimension tables
-                con.execute(text(f'ALTER TABLE [dbo].[{blob_name}] ALTER COLUMN {primary_key_name} INT NOT NULL'))
-                 # Add the primary key constraint
-                con.execute(text(f'ALTER TABLE [dbo].[{blob_name}] ADD CONSTRAINT [PK_{blob_name}] PRIMARY KEY CLUSTERED ([{primary_key_name}] ASC);'))
+                raise ValueError(f"Unknown staging storage '{storage}', expected 'local' or 'blob'")
+            stage.rows_out = table.num_rows
+        print(f"📦 Staged {blob_name} as {parquet_name} ({table.num_rows} rows, {storage})")
 
-            trans.commit()
+    def _staged_parquet_is_current(self, blob_name, storage, etag):
+        import pyarrow.parquet as pq
 
+        parquet_name = self.staged_parquet_name(blob_name)
+        if storage == "local":
+            local_file = os.path.join(self.local_path, parquet_name)
+            if not os.path.exists(local_file):
+                return False
+            return (pq.read_schema(local_file).metadata or {}).get(b"source_etag") == etag.encode()
+        blob_client = self.container_client.get_blob_client(parquet_name)
+        if not blob_client.exists():
+            return False
+        return blob_client.get_blob_properties().metadata.get("source_etag") == etag.strip('"')
+
+    def ensure_staged_parquet(self, blob_name, storage="local"):
+        # Stage the csv blob as Parquet if it has no staging copy yet or has changed since; returns the staged name
+        etag = str(self.container_client.get_blob_client(blob_name).get_blob_properties().etag)
+        if not self._staged_parquet_is_current(blob_name, storage, etag):
+            self.stage_blob_parquet(blob_name, storage=storage)
+        return self.staged_parquet_name(blob_name)
+
+    def blob_fingerprint(self, blob_name):
+        # Identifies one version of a blob without downloading it (the ETag changes on every write)
+        properties = self.container_client.get_blob_client(blob_name).get_blob_properties()
+        return {"etag": str(properties.etag).strip('"'), "size": properties.size}
+
+    def local_source_path(self, blob_name, source_format="csv", storage="local"):
+        # Local file an external engine (e.g. DuckDB) can scan directly: the csv blob,
+        # or with source_format="parquet" its Parquet staging copy
+        if source_format == "parquet":
+            blob_name = self.ensure_staged_parquet(blob_name, storage)
+            if storage == "local":
+                return os.path.join(self.local_path, blob_name)
+        if self.blob_cache is not None:
+            return self.blob_cache.fetch(self.container_client, blob_name)
+        download_file_path = os.path.join(self.local_path, blob_name)
+        os.makedirs(os.path.dirname(download_file_path), exist_ok=True)
+        self.download_blob(blob_name)
+        return download_file_path
+
+    def access_blob_parquet(self, blob_name, columns=None, storage="local", to_pandas=True):
+        # Read a csv blob through its Parquet staging copy, staging it first if needed
+        # or if the csv has changed since it was staged. Only the projected columns are read.
+        import pyarrow.parquet as pq
+
+        parquet_name = self.ensure_staged_parquet(blob_name, storage)
+        with span(f"extract.parquet[{blob_name}]", storage=storage) as stage:
+            if storage == "local":
+                local_file = os.path.join(self.local_path, parquet_name)
+                stage.bytes_in = os.path.getsize(local_file)
+                table = pq.read_table(local_file, columns=columns)
+            else:
+                # Ranged reads: only the footer and the projected column chunks are downloaded
+                blob_file = io.BufferedReader(BlobRangeFile(self.container_client.get_blob_client(parquet_name)),
+                                              buffer_size=256 * 1024)
+                table = pq.read_table(blob_file, columns=columns)
+            stage.rows_out = table.num_rows
+            stage.bytes_out = table.nbytes
+            return table.to_pandas() if to_pandas else table
+
+    def access_blob_sample(self, blob_name, key_column, fraction, columns=None, source_format="csv", storage="local"):
+        # Rows of a source blob whose key_column (an IMDb tconst) is in the deterministic sample (utils.sampling).
+        # The sample is cached as Parquet under local_path/samples/<fraction> for each version (ETag) of the
+        # blob, so after the first run a dev run only reads the sampled rows.
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        etag = self.blob_fingerprint(blob_name)["etag"]
+        sample_file = os.path.join(self.local_path, "samples", sample_label(fraction),
+                                   f"{os.path.splitext(blob_name)[0]}.parquet")
+        with span(f"extract.sample[{blob_name}]", fraction=fraction) as stage:
+            if not (os.path.exists(sample_file)
+                    and (pq.read_schema(sample_file).metadata or {}).get(b"source_etag") == etag.encode()):
+                if source_format == "parquet":
+                    df = self.access_blob_parquet(blob_name, storage=storage)
+                else:
+                    df = self.access_blob_csv(blob_name)
+                if df is None:
+                    raise ValueError(f"Could not read blob '{blob_name}' for sampling")
+                table = pa.Table.from_pandas(df[sample_mask(df[key_column], fraction)], preserve_index=False)
+                table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"source_etag": etag.encode()})
+                stage.rows_in = len(df)
+                del df
+                os.makedirs(os.path.dirname(sample_file), exist_ok=True)
+                pq.write_table(table, sample_file + ".tmp", compression="zstd")
+                os.replace(sample_file + ".tmp", sample_file)
+                print(f"🎲 Sampled {table.num_rows} of {stage.rows_in} rows of {blob_name} ({sample_label(fraction)})")
+            table = pq.read_table(sample_file, columns=columns)
+            stage.rows_out = table.num_rows
+            stage.bytes_out = table.nbytes
+            return table.to_pandas()
+
+    def upload_dataframe_sqldatabase(self, blob_name, blob_data, primary_key_name=None, build_keys=True):
+        # Star schema tables are created with their final column types and filled as heaps; build_keys=False
+        # leaves the keys to one StarSchema.build_keys() pass once every table is loaded
+        print("\nUploading to Azure SQL server as table:\n\t" + blob_name)
+        # Check if the primary key column exists in the dataframe
+        if primary_key_name and primary_key_name not in blob_data.columns:
+            raise ValueError(f"Primary key column '{primary_key_name}' not found in '{blob_name}'")
+        if blob_name in self.star_schema:
+            # Row hashes are filled on every full load, so the next incremental load can diff against them
+            if HASH_COLUMN not in blob_data.columns:
+                blob_data = add_row_hash(blob_data)
+            self.star_schema.recreate(blob_name)
+            self.bulk_loader.load(blob_name, self.star_schema.conform(blob_name, blob_data), if_exists='append')
+        else:
+            self.bulk_loader.load(blob_name, blob_data, if_exists='replace')
+        if build_keys:
+            self.add_table_keys(blob_name, primary_key_name)
+
+    def add_table_keys(self, blob_name, primary_key_name=None):
+        # Primary key applied once the table holds all of its rows
+        if blob_name in self.star_schema:
+            self.star_schema.build_keys([blob_name])
+            return
+        if not primary_key_name:
+            return
+        with span(f"load.keys[{blob_name}]"), self.engine.begin() as con:
+            con.execute(text(f'ALTER TABLE [dbo].[{blob_name}] ALTER COLUMN {primary_key_name} INT NOT NULL'))
+            con.execute(text(f'ALTER TABLE [dbo].[{blob_name}] ADD CONSTRAINT [PK_{blob_name}] PRIMARY KEY CLUSTERED ([{primary_key_name}] ASC);'))
+
+    def upsert_dataframe_sqldatabase(self, blob_name, blob_data, key_columns, primary_key_name=None, delete_missing=True):
+        # Incremental load: merge only new/changed rows and delete missing keys, keeping constraints in place.
+        # Falls back to a full upload (with a RowHash column for next time) if the table can't be merged into yet.
+        # Returns True when the table was (re)created.
+        if not self.incremental_loader.can_upsert(blob_name):
+            print(f"ℹ️ {blob_name} has no row hashes yet, doing a full load")
+            self.upload_dataframe_sqldatabase(blob_name, add_row_hash(blob_data), primary_key_name)
+            return True
+        print("\nMerging into Azure SQL server table:\n\t" + blob_name)
+        self.incremental_loader.upsert(blob_name, blob_data, key_columns, delete_missing=delete_missing)
+        return False
 
-                
     def append_dataframe_sqldatabase(self, blob_name, blob_data):
         print("\nAppending to table:\n\t" + blob_name)
-        blob_data.to_sql(blob_name, engine, if_exists='append', index=False)
+        self.bulk_loader.load(blob_name, blob_data, if_exists='append')
     
     def delete_sqldatabase(self, table_name):
-        with engine.connect() as con:
+        with self.engine.connect() as con:
             trans = con.begin()
             con.execute(text(f"DROP TABLE [dbo].[{table_name}]"))
             trans.commit()
             
+    def record_load_completed(self, load_mode="replace"):
+        # Appends a row to EtlLoadLog once every table of a load is in; readers such as the ranking service
+        # poll latest_load() to know when to rebuild their in-memory copies
+        load_id = uuid.uuid4().hex
+        pd.DataFrame({"LoadID": [load_id], "LoadMode": [load_mode],
+                      "CompletedAt": [pd.Timestamp.now(tz="UTC").tz_localize(None)]}).to_sql(
+            LOAD_LOG_TABLE, self.engine, if_exists="append", index=False)
+        return load_id
+
+    def latest_load(self):
+        # LoadID of the most recent completed load, or None before the first one
+        from sqlalchemy import column, inspect, select, table
+
+        if not inspect(self.engine).has_table(LOAD_LOG_TABLE):
+            return None
+        query = (select(column("LoadID")).select_from(table(LOAD_LOG_TABLE))
+                 .order_by(column("CompletedAt").desc()).limit(1))
+        with self.engine.connect() as con:
+            return con.execute(query).scalar()
+
     def get_sql_table(self, query):        
         # Create connection and fetch data using Pandas        
-        df = pd.read_sql_query(query, engine)
+        df = pd.read_sql_query(query, self.engine)
         # Convert DataFrame to the specified JSON format
         result = df.to_dict(orient='records')
         return result
+
+    def stream_sql_table(self, query, params=None, fetch_size=10_000, batches=False):
+        # Lazy variant of get_sql_table: one dict per row, or with batches=True one DataFrame per fetch_size rows.
+        # Rows arrive while the query is still running and only one batch is held in memory at a time.
+        for columns, rows in iter_sql_batches(self.engine, query, params, fetch_size):
+            if batches:
+                yield pd.DataFrame.from_records(rows, columns=columns)
+            else:
+                for row in rows:
+                    yield dict(zip(columns, row))
+
+    def export_sql_table(self, query, destination, format="ndjson", params=None, fetch_size=10_000):
+        # Writes the result incrementally to a path or binary file as NDJSON, CSV or an Arrow IPC stream;
+        # encode_batches(iter_sql_batches(...)) gives the same chunks for an HTTP StreamingResponse
+        with span("export.sql", format=format) as stage:
+            rows_out = 0
+
+            def counted(batches):
+                nonlocal rows_out
+                for columns, rows in batches:
+                    rows_out += len(rows)
+                    yield columns, rows
+
+            chunks = encode_batches(counted(iter_sql_batches(self.engine, query, params, fetch_size)), format)
+            written = write_chunks(chunks, destination)
+            stage.rows_out = rows_out
+            stage.bytes_out = written
+        return rows_out
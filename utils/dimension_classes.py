@@ -1,12 +1,31 @@
 from utils.datasetup import *
 import pandas as pd
+import numpy as np
 import ast
+from utils.instrumentation import frame_bytes, span
 
 # blob_name="imdb_dataset.csv"
 # database=AzureDB()
 # database.access_container("csv-files")
 # df = database.access_blob_csv(blob_name=blob_name)
 
+# Columns each source blob actually needs for the dimensions and the fact table,
+# used to project the CSV reads in MainETL.extract_and_transform
+IMDB_COLUMNS = ['tconst', 'primaryTitle', 'originalTitle', 'averageRating', 'region', 'numVotes', 'startYear', 'titleType']
+TMDB_COLUMNS = ['imdb_id', 'genre_ids', 'popularity', 'poster_path', 'original_language']
+COUNTRY_COLUMNS = ['code', 'name', 'continent', 'languages']
+GENRE_COLUMNS = ['id', 'name']
+# Flattened /movie/{id} columns of an enriched TMDb dataset (APICSVUploader enrich=True) -> Movie dimension columns
+MOVIE_DETAIL_COLUMNS = {
+    'runtime': 'Runtime',
+    'budget': 'Budget',
+    'revenue': 'Revenue',
+    'status': 'ReleaseStatus',
+    'regional_release_date': 'RegionalReleaseDate',
+    'certification': 'Certification',
+    'wikidata_id': 'WikidataID',
+}
+
 class ModelAbstract():
     def __init__(self,df_dataset):
         self.columns = None
@@ -14,9 +33,11 @@ class ModelAbstract():
         self.df = df_dataset
 
     def dimension_generator_upgraded(self, df, dimension_name: str, column_mapping: dict, use_existing_pk: bool = False, pk_name: str = None):
-        # Select and rename
-        dim = df[list(column_mapping.keys())].rename(columns=column_mapping)
-        dim = dim.drop_duplicates()
+        with span(f"transform.dedup[{dimension_name}]", rows_in=len(df)) as stage:
+            # Select and rename
+            dim = df[list(column_mapping.keys())].rename(columns=column_mapping)
+            dim = dim.drop_duplicates()
+            stage.rows_out = len(dim)
 
         # Rename or generate PK
         if use_existing_pk:
@@ -36,11 +57,14 @@ class ModelAbstract():
         self.primary_key = pk_name
 
         
-    def load(self):
+    def load(self, incremental: bool = False, build_keys: bool = True):
         if self.dimension_table is not None:
             # Upload dimension table to data warehouse
             database=AzureDB()
-            database.upload_dataframe_sqldatabase(f'{self.name}_dim', self.dimension_table, f'{self.name}ID')
+            if incremental:
+                database.upsert_dataframe_sqldatabase(f'{self.name}_dim', self.dimension_table, [f'{self.name}ID'], f'{self.name}ID')
+            else:
+                database.upload_dataframe_sqldatabase(f'{self.name}_dim', self.dimension_table, f'{self.name}ID', build_keys=build_keys)
         
             # Saving dimension table as separate file
             # self.dimension_table.to_csv(f'./data/{self.name}_dim.csv')
@@ -57,12 +81,15 @@ class MovieTypeDimension:
         self.columns = ['MovieTypeName']
         self.name = "MovieType"
 
-    def load(self):
+    def load(self, incremental: bool = False, build_keys: bool = True):
         if self.dimension_table is not None:
             # Upload dimension table to data warehouse
             blob_name="imdb_dataset.csv"
             database=AzureDB()
-            database.upload_dataframe_sqldatabase(f'MovieType_dim', self.dimension_table, 'MovieTypeID')
+            if incremental:
+                database.upsert_dataframe_sqldatabase(f'MovieType_dim', self.dimension_table, ['MovieTypeID'], 'MovieTypeID')
+            else:
+                database.upload_dataframe_sqldatabase(f'MovieType_dim', self.dimension_table, 'MovieTypeID', build_keys=build_keys)
         
             # Saving dimension table as separate file
             # self.dimension_table.to_csv(f'./data/MovieType_dim.csv')
@@ -134,76 +161,327 @@ def clean_genres(val):
         return [val]
     return []
 
+# A well-formed genre_ids string: a bracketed, comma-separated list of plain int literals (or an empty list).
+# Anything else goes through clean_genres so malformed values behave exactly as before.
+GENRE_LIST_PATTERN = r'\[\s*\]|\[\s*-?(?:0|[1-9]\d{0,17})(?:\s*,\s*-?(?:0|[1-9]\d{0,17}))*\s*\]'
+
+def parse_genre_ids(genre_ids: pd.Series):
+    # Vectorized equivalent of genre_ids.apply(clean_genres).explode():
+    # returns (row positions, genre values) with one entry per genre and a NaN entry for rows without genres.
+    # Well-formed strings are parsed in bulk with Arrow compute kernels (regex match, split, cast).
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    n = len(genre_ids)
+    if genre_ids.dtype == object:
+        is_str = genre_ids.map(type).to_numpy() == str
+    elif pd.api.types.is_string_dtype(genre_ids.dtype):
+        is_str = genre_ids.notna().to_numpy()
+    else:
+        is_str = np.zeros(n, dtype=bool)
+    strings = pa.array(np.where(is_str, genre_ids.to_numpy(dtype=object), None), type=pa.string())
+    well_formed = pc.fill_null(pc.match_substring_regex(strings, f"^(?:{GENRE_LIST_PATTERN})$"), False)
+    well_formed = well_formed.to_numpy(zero_copy_only=False)
+
+    # Fast path: split the bracketed bodies on commas and cast all the pieces to int64 at once
+    bodies = pc.utf8_trim_whitespace(pc.utf8_slice_codeunits(strings.filter(pa.array(well_formed)), 1, -1))
+    non_empty = pc.not_equal(bodies, "").to_numpy(zero_copy_only=False)
+    pieces = pc.split_pattern(bodies.filter(pa.array(non_empty)), ",")
+    counts = np.zeros(n, dtype=np.int64)
+    counts[np.flatnonzero(well_formed)[non_empty]] = pc.list_value_length(pieces).to_numpy(zero_copy_only=False)
+    fast_values = pc.cast(pc.utf8_trim_whitespace(pieces.flatten()), pa.int64()).to_numpy(zero_copy_only=False)
+
+    # Slow path: everything else (NaN, ints, lists, malformed strings) through clean_genres
+    slow_positions = np.flatnonzero(~well_formed)
+    slow_lists = [clean_genres(val) for val in genre_ids.iloc[slow_positions]] if len(slow_positions) else []
+    for position, parsed in zip(slow_positions, slow_lists):
+        counts[position] = len(parsed)
+
+    # explode() keeps one NaN row for every empty list
+    empty = counts == 0
+    sizes = np.where(empty, 1, counts)
+    positions = np.repeat(np.arange(n), sizes)
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+    slow_values = [v for parsed in slow_lists for v in parsed]
+    # Literals outside int64 (e.g. "[99999999999999999999]") stay Python ints in an object array, as explode leaves them
+    all_int = all(isinstance(v, (int, np.integer)) and not isinstance(v, bool) and -2 ** 63 <= v < 2 ** 63
+                  for v in slow_values)
+    if not all_int:
+        values = np.empty(len(positions), dtype=object)
+    elif empty.any():
+        values = np.empty(len(positions), dtype=np.float64)
+    else:
+        values = np.empty(len(positions), dtype=np.int64)
+    if empty.any():
+        values[offsets[empty]] = np.nan
+
+    fast_rows = well_formed & ~empty
+    if fast_rows.any():
+        fast_index = np.repeat(offsets[fast_rows], counts[fast_rows]) + _ranges(counts[fast_rows])
+        values[fast_index] = fast_values
+    slow_rows = ~well_formed & ~empty
+    if slow_rows.any():
+        slow_index = np.repeat(offsets[slow_rows], counts[slow_rows]) + _ranges(counts[slow_rows])
+        slow_array = np.empty(len(slow_values), dtype=values.dtype)
+        slow_array[:] = slow_values
+        values[slow_index] = slow_array
+    return positions, values
+
+def _ranges(counts):
+    # [0..c0), [0..c1), ... concatenated, without Python loops
+    ends = np.cumsum(counts)
+    return np.arange(ends[-1]) - np.repeat(ends - counts, counts)
+
+def explode_genres(df: pd.DataFrame, column: str = "genre_ids"):
+    # One row per (row, genre) with a fresh RangeIndex, same as apply(clean_genres) + explode + reset_index
+    positions, values = parse_genre_ids(df[column])
+    exploded = df.iloc[positions].reset_index(drop=True)
+    exploded[column] = values
+    return exploded
+
+def _take(values, indexer):
+    # Gather values by position with -1 meaning "no match", upcasting like a left merge does
+    return pd.api.extensions.take(pd.array(values) if isinstance(values, pd.Series) else values, indexer, allow_fill=True)
+
+def _lookup(keys, dimension_keys: pd.Index, dimension_values):
+    # Left-join lookup against a dimension with unique keys: the matching dimension value or NaN
+    return _take(dimension_values, dimension_keys.get_indexer(keys))
+
+def _unique_key_indexer(keys: pd.Series, dimension_keys: pd.Series):
+    # Position of each key in dimension_keys (-1 if absent), or None if dimension_keys has duplicates.
+    # String keys are hashed by Arrow instead of being boxed into Python objects.
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    try:
+        key_array = pa.chunked_array([pa.array(keys.to_numpy(dtype=object) if keys.dtype == object else keys.array)])
+        dimension_array = pa.array(dimension_keys.to_numpy(dtype=object) if dimension_keys.dtype == object else dimension_keys.array)
+        if isinstance(dimension_array, pa.ChunkedArray):
+            dimension_array = dimension_array.combine_chunks()
+        if pc.count_distinct(dimension_array, mode='all').as_py() != len(dimension_array):
+            return None
+        key_array = key_array.cast(dimension_array.type)
+        return pc.fill_null(pc.index_in(key_array, value_set=dimension_array), -1).to_numpy().astype(np.int64)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, TypeError):
+        dimension_index = pd.Index(dimension_keys)
+        return dimension_index.get_indexer(keys) if dimension_index.is_unique else None
+
+def _gathered(values, rows, had_gaps: bool):
+    # Take values at rows; integer sources are widened to float64 if the unfiltered join had missing values
+    if isinstance(values, pd.Series):
+        values = values.array
+    if isinstance(values, pd.arrays.NumpyExtensionArray):
+        values = values.to_numpy()
+    taken = values.take(rows)
+    if had_gaps and isinstance(taken.dtype, np.dtype) and taken.dtype.kind in 'iub':
+        taken = taken.astype(np.float64) if taken.dtype.kind != 'b' else taken.astype(object)
+    return taken
+
+def _encode(values: pd.Series, rows):
+    # Dictionary-encode a low-cardinality column and gather its codes for `rows` (-1 = no row).
+    # Missing values and missing rows share a trailing NaN category, as they do in a merge.
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    categories = np.empty(len(uniques) + 1, dtype=object)
+    categories[:-1] = np.asarray(uniques, dtype=object)
+    categories[-1] = np.nan
+    codes = np.where(codes < 0, len(uniques), codes)
+    row_codes = np.where(rows < 0, len(uniques), codes[np.where(rows < 0, 0, rows)] if len(codes) else len(uniques))
+    return row_codes, categories
+
+def _downcast_integers(fact_table: pd.DataFrame):
+    # Lossless: only columns whose values are all whole numbers are narrowed
+    for column in fact_table.columns:
+        values = fact_table[column]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            if pd.api.types.is_integer_dtype(values) or (values.notna().all() and (values % 1 == 0).all()):
+                fact_table[column] = pd.to_numeric(values, downcast='integer')
+    return fact_table
+
 class FactTableGenerator:
-    def __init__(self, df_imdb_movies, df_tmdb_movies, df_genres, df_genre_list, df_movie_types, df_countries):
+    def __init__(self, df_imdb_movies, df_tmdb_movies, df_genres, df_genre_list, df_movie_types, df_countries,
+                 join_strategy: str = "lean", downcast: bool = False):
         self.df_imdb_movies = df_imdb_movies
         self.df_tmdb_movies = df_tmdb_movies
         self.df_genres = df_genres
         self.df_genre_list= df_genre_list
         self.df_movie_types = df_movie_types
         self.df_countries = df_countries
+        # "lean" resolves the joins through key lookups on projected columns; "merge" is the original pd.merge chain
+        self.join_strategy = join_strategy
+        # Narrow whole-number columns (MovieTypeID, NumRatings, ReleaseYear, ...) in the output
+        self.downcast = downcast
 
     def generate_fact_table(self):
-        print("🔄 Starting fact table generation...")
+        with span("transform.fact", rows_in=len(self.df_tmdb_movies), join_strategy=self.join_strategy) as stage:
+            if self.join_strategy == "lean" and self._dimension_keys_unique():
+                fact_table = self.generate_fact_table_lean()
+            else:
+                fact_table = self.generate_fact_table_merge()
+            fact_table = _downcast_integers(fact_table) if self.downcast else fact_table
+            stage.rows_out = len(fact_table)
+            stage.bytes_out = frame_bytes(fact_table)
+        return fact_table
+
+    def generate_fact_table_partitioned(self, sink, partitions: int = 8, workers: int = None):
+        # Hash-partitioned generation on a process pool; partitions go to sink.write() as they finish
+        # and are never concatenated. Returns the number of rows written.
+        from utils.fact_partitions import generate_partitioned
+
+        if self.join_strategy != "lean" or not self._dimension_keys_unique():
+            print("ℹ️ Partitioned generation needs unique dimension keys, building the fact table in one piece")
+            fact_table = self.generate_fact_table()
+            sink.write(0, fact_table)
+            sink.close()
+            return len(fact_table)
+        return generate_partitioned(self, sink, partitions=partitions, workers=workers)
+
+    def _dimension_keys_unique(self):
+        # Lookups only reproduce pd.merge when every dimension key matches at most one row
+        return (self.df_genre_list['GenreID'].is_unique
+                and self.df_countries['CountryID'].str.lower().is_unique
+                and self.df_movie_types['MovieTypeName'].is_unique)
 
+    def generate_fact_table_lean(self, gaps: dict = None):
+        # gaps forces the left-join dtype widening ({"imdb", "genre", "movie_type"}) when this frame is one
+        # partition of a larger input, so every partition gets the dtypes of the whole table
+        gaps = gaps or {}
+
+        # Only the columns the fact table needs are ever touched; nothing wider than a key is copied
+        tmdb_ids = self.df_tmdb_movies['imdb_id']
+        imdb = self.df_imdb_movies
+
+        with span("transform.fact.join_imdb", rows_in=len(tmdb_ids)) as stage:
+            # IMDb join as (tmdb row, imdb row) position pairs; -1 where a TMDb row has no IMDb match
+            right = _unique_key_indexer(tmdb_ids, imdb['tconst'])
+            if right is not None:
+                left = np.arange(len(tmdb_ids))
+            else:
+                pairs = pd.merge(
+                    pd.DataFrame({'key': tmdb_ids.to_numpy(), 'left': np.arange(len(tmdb_ids))}),
+                    pd.DataFrame({'key': imdb['tconst'].to_numpy(), 'right': np.arange(len(imdb))}),
+                    on='key', how='left'
+                )
+                left = pairs['left'].to_numpy()
+                right = pairs['right'].fillna(-1).to_numpy(dtype=np.int64)
+            stage.rows_out = len(left)
+
+        with span("transform.fact.explode_genres", rows_in=len(left)) as stage:
+            # Explode genres per pair without materialising the joined frame
+            genre_rows, genre_values = parse_genre_ids(self.df_tmdb_movies['genre_ids'])
+            sizes = np.bincount(genre_rows, minlength=len(tmdb_ids))
+            offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+            pair_sizes = sizes[left]
+            gather = np.repeat(offsets[left], pair_sizes) + (_ranges(pair_sizes) if len(pair_sizes) else 0)
+            pair = np.repeat(np.arange(len(left), dtype=np.int64), pair_sizes)
+            tmdb_row, imdb_row = left[pair], right[pair]
+            del pair, left, right
+            stage.rows_out = len(tmdb_row)
+
+        with span("transform.fact.lookup_dimensions", rows_in=len(tmdb_row)) as stage:
+            # Small dimensions are resolved on the distinct key values only (dictionary encoding),
+            # then gathered to the exploded rows by integer code
+            genre_codes, genre_uniques = pd.factorize(genre_values, use_na_sentinel=False)
+            genre_code = genre_codes[gather]
+            del gather, genre_codes
+            genres = _lookup(genre_uniques, pd.Index(self.df_genre_list['GenreID']), self.df_genre_list['GenreID'])
+
+            # Normalize region and code for matching; missing country codes are filled with 'us'
+            self.df_countries["CountryID"] = self.df_countries["CountryID"].str.lower()
+            region_code, regions = _encode(imdb['region'], imdb_row)
+            countries = _lookup(pd.Series(regions).str.lower(), pd.Index(self.df_countries['CountryID']), self.df_countries['CountryID'])
+            countries = pd.Series(countries).fillna("us").array
+
+            title_type_code, title_types = _encode(imdb['titleType'], imdb_row)
+            movie_types = _lookup(title_types, pd.Index(self.df_movie_types['MovieTypeName']), self.df_movie_types['MovieTypeID'])
+            stage.attrs["distinct_keys"] = {"genre": len(genre_uniques), "region": len(regions), "title_type": len(title_types)}
+
+        with span("transform.fact.dropna", rows_in=len(tmdb_row)) as stage:
+            # Rows the final dropna would remove are found from the codes and dropped before any column is gathered
+            has_imdb = imdb_row >= 0
+            safe_imdb_row = np.where(has_imdb, imdb_row, 0)
+            keep = has_imdb & pd.notna(genres)[genre_code] & pd.notna(movie_types)[title_type_code] & pd.notna(countries)[region_code]
+            for column in ['tconst', 'averageRating', 'numVotes', 'startYear']:
+                keep &= imdb[column].notna().to_numpy()[safe_imdb_row] if len(imdb) else False
+            keep &= self.df_tmdb_movies['popularity'].notna().to_numpy()[tmdb_row]
+            kept = np.flatnonzero(keep)
+            stage.rows_out = len(kept)
+
+        with span("transform.fact.assemble", rows_in=len(kept)) as stage:
+            # Integer columns become float64 when the left join left any gaps, exactly as pd.merge does
+            imdb_gaps = not has_imdb.all() or gaps.get("imdb", False)
+            genre_gaps = pd.isna(genres)[genre_code].any() or gaps.get("genre", False)
+            movie_type_gaps = pd.isna(movie_types)[title_type_code].any() or gaps.get("movie_type", False)
+            fact_table = pd.DataFrame({
+                'MovieID': _gathered(imdb['tconst'], imdb_row[kept], imdb_gaps),
+                'GenreID': _gathered(genres, genre_code[kept], genre_gaps),
+                'MovieTypeID': _gathered(movie_types, title_type_code[kept], movie_type_gaps),
+                'CountryID': _gathered(countries, region_code[kept], False),
+                'Rating': _gathered(imdb['averageRating'], imdb_row[kept], imdb_gaps),
+                'NumRatings': _gathered(imdb['numVotes'], imdb_row[kept], imdb_gaps),
+                'ReleaseYear': _gathered(imdb['startYear'], imdb_row[kept], imdb_gaps),
+                'Popularity': _gathered(self.df_tmdb_movies['popularity'], tmdb_row[kept], False),
+            }, index=pd.Index(kept))
+            stage.rows_out = len(fact_table)
+            stage.bytes_out = frame_bytes(fact_table)
+
+        return fact_table
+
+    def generate_fact_table_merge(self):
         # Start with a tmdb movies data
         fact_table = self.df_tmdb_movies.copy()
-        print(f"✅ Copied TMDb movie data: {len(fact_table)} rows")
 
         # Merge IMDb fields (rating and titleType)
-        fact_table = pd.merge(
-            fact_table,
-            self.df_imdb_movies[['tconst', 'averageRating', 'region', 'numVotes', 'startYear','titleType']],
-            left_on="imdb_id",
-            right_on="tconst",
-            how="left"
-        )
-        print("✅ Merged IMDb data")
+        with span("transform.fact.merge_imdb", rows_in=len(fact_table)) as stage:
+            fact_table = pd.merge(
+                fact_table,
+                self.df_imdb_movies[['tconst', 'averageRating', 'region', 'numVotes', 'startYear','titleType']],
+                left_on="imdb_id",
+                right_on="tconst",
+                how="left"
+            )
+            stage.rows_out = len(fact_table)
 
         # Clean and explode genres
-        fact_table["genre_ids"] = fact_table["genre_ids"].apply(clean_genres)
-        fact_table = fact_table.explode("genre_ids").reset_index(drop=True)
-        print(f"✅ Exploded genres: {len(fact_table)} rows after exploding")
-        # print(fact_table[["imdb_id", "genre_ids"]].head(10))  # change to relevant ID column if needed
-        print(fact_table.head())  # Show the first few rows
-
-        # Merge with Genre dimension (corrected: match on GenreID not GenreName)
-        fact_table = pd.merge(
-            fact_table, 
-            self.df_genre_list[['GenreID', 'GenreName']],
-            left_on="genre_ids", 
-            right_on="GenreID", 
-            how="left"
-        )
-        print("✅ Merged with Genre dimension")
-
-        # Normalize region and code for matching
-        fact_table["region"] = fact_table["region"].str.lower()
-        self.df_countries["CountryID"] = self.df_countries["CountryID"].str.lower()
-
-        # Merge with Country dimension
-        fact_table = pd.merge(
-            fact_table,
-            self.df_countries[['CountryID']],
-            left_on="region",
-            right_on="CountryID",
-            how="left"
-        )
-        print("✅ Merged with Country dimension")
-
-        # Fill missing country codes
-        fact_table["CountryID"] = fact_table["CountryID"].fillna("us")
-        print("ℹ️ Filled missing country codes with 'us'")
-
-        # Merge with MovieType dimension
-        fact_table = pd.merge(
-            fact_table,
-            self.df_movie_types[['MovieTypeName', 'MovieTypeID']],
-            left_on="titleType",
-            right_on="MovieTypeName",
-            how="left"
-        )
-        print("✅ Merged with MovieType dimension")
+        with span("transform.fact.explode_genres", rows_in=len(fact_table)) as stage:
+            fact_table = explode_genres(fact_table, "genre_ids")
+            stage.rows_out = len(fact_table)
+
+        with span("transform.fact.merge_dimensions", rows_in=len(fact_table)) as stage:
+            # Merge with Genre dimension (corrected: match on GenreID not GenreName)
+            fact_table = pd.merge(
+                fact_table, 
+                self.df_genre_list[['GenreID', 'GenreName']],
+                left_on="genre_ids", 
+                right_on="GenreID", 
+                how="left"
+            )
+
+            # Normalize region and code for matching
+            fact_table["region"] = fact_table["region"].str.lower()
+            self.df_countries["CountryID"] = self.df_countries["CountryID"].str.lower()
+
+            # Merge with Country dimension
+            fact_table = pd.merge(
+                fact_table,
+                self.df_countries[['CountryID']],
+                left_on="region",
+                right_on="CountryID",
+                how="left"
+            )
+
+            # Fill missing country codes
+            fact_table["CountryID"] = fact_table["CountryID"].fillna("us")
+
+            # Merge with MovieType dimension
+            fact_table = pd.merge(
+                fact_table,
+                self.df_movie_types[['MovieTypeName', 'MovieTypeID']],
+                left_on="titleType",
+                right_on="MovieTypeName",
+                how="left"
+            )
+            stage.rows_out = len(fact_table)
 
         # Select relevant columns
         fact_table = fact_table[['tconst', 'GenreID', 'MovieTypeID', 'CountryID',
@@ -218,16 +496,10 @@ class FactTableGenerator:
             'popularity': 'Popularity',
         }, inplace=True)
 
-        print("✅ Renamed columns")
-
         # Drop rows with missing values
-        before_drop = len(fact_table)
-        fact_table = fact_table.dropna()
-        after_drop = len(fact_table)
-        print(f"🧹 Dropped rows with missing values: {before_drop - after_drop} rows removed")
-
-        print(f"🎉 Fact table generation complete: {len(fact_table)} final rows")
-        print(fact_table.head())  # Show the first few rows
+        with span("transform.fact.dropna", rows_in=len(fact_table)) as stage:
+            fact_table = fact_table.dropna()
+            stage.rows_out = len(fact_table)
 
         return fact_table
 
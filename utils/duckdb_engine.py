@@ -0,0 +1,237 @@
+# duckdb_engine.py
+# Star-schema transform on embedded DuckDB: the Country/Movie/Genre dimensions and the MovieGenreFact table
+# are built with SQL over the staged csv/Parquet files instead of eager pandas operations, so the scans are
+# projected, the joins run multi-threaded and large inputs can spill to disk (memory_limit / temp_directory).
+# The SQL mirrors the pandas build step by step (first-occurrence dedupe, left joins, 'us' country default,
+# dropna) and orders rows the way the pandas build produces them; compare_star_schemas checks the two agree.
+import pandas as pd
+
+from utils.dimension_classes import (COUNTRY_COLUMNS, GENRE_COLUMNS, GENRE_LIST_PATTERN, IMDB_COLUMNS, TMDB_COLUMNS,
+                                     ModelAbstract, MovieTypeDimension, clean_genres)
+from utils.instrumentation import frame_bytes, span
+
+# Strings pandas.read_csv reads as NaN by default, so csv sources get the same nulls in both engines
+CSV_NULL_STRINGS = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+                    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+SOURCE_COLUMNS = {
+    "countries": COUNTRY_COLUMNS,
+    "imdb": IMDB_COLUMNS,
+    "tmdb": TMDB_COLUMNS,
+    "genres": GENRE_COLUMNS,
+}
+
+# Dimensions keep the row of each distinct value's first occurrence (DataFrame.drop_duplicates).
+# Country IDs are lowercased because the pandas fact build lowercases the Country dimension in place.
+COUNTRY_DIM_SQL = """
+CREATE OR REPLACE TABLE country_dim AS
+SELECT lower(code) AS CountryID, name AS CountryName, continent AS Continent, languages AS LanguagesSpoken,
+       contains(languages, 'English') AS IsEnglishSpeaking
+FROM (SELECT code, name, continent, languages, min(rowid) AS first_row FROM countries GROUP BY ALL)
+ORDER BY first_row
+"""
+
+GENRE_DIM_SQL = """
+CREATE OR REPLACE TABLE genre_dim AS
+SELECT GenreID, GenreName
+FROM (SELECT id AS GenreID, name AS GenreName, min(rowid) AS first_row FROM genres GROUP BY ALL)
+ORDER BY first_row
+"""
+
+# PosterString/OriginalLanguage come from the first TMDb row with the title's imdb_id, as the pandas lookup does
+MOVIE_DIM_SQL = """
+SELECT d.MovieID, d.MovieTitle, d.OriginalTitle, t.poster_path AS PosterString, t.original_language AS OriginalLanguage
+FROM (SELECT tconst AS MovieID, primaryTitle AS MovieTitle, originalTitle AS OriginalTitle, min(rowid) AS first_row
+      FROM imdb GROUP BY ALL) d
+LEFT JOIN (SELECT imdb_id, poster_path, original_language FROM tmdb WHERE imdb_id IS NOT NULL
+           QUALIFY row_number() OVER (PARTITION BY imdb_id ORDER BY rowid) = 1) t ON t.imdb_id = d.MovieID
+ORDER BY d.first_row
+"""
+
+# Rows come out in the pandas order: TMDb row, IMDb match, genre position, then dimension row.
+# Rows the pandas dropna removes (no IMDb match, unknown genre or type, missing values) are never produced.
+FACT_SQL = """
+WITH tmdb_genres AS (
+    SELECT rowid AS tmdb_row, imdb_id, popularity, {genre_list} AS genre_list FROM tmdb
+), exploded AS (
+    SELECT tmdb_row, imdb_id, popularity,
+           unnest(genre_list) AS genre_id, unnest(range(len(genre_list))) AS genre_position
+    FROM tmdb_genres
+)
+SELECT i.tconst AS MovieID, g.GenreID, m.MovieTypeID, COALESCE(c.CountryID, 'us') AS CountryID,
+       i.averageRating AS Rating, i.numVotes AS NumRatings, i.startYear AS ReleaseYear, e.popularity AS Popularity
+FROM exploded e
+JOIN imdb i ON i.tconst = e.imdb_id
+JOIN genre_dim g ON g.GenreID = e.genre_id
+LEFT JOIN country_dim c ON c.CountryID = lower(i.region)
+JOIN movie_types m ON m.MovieTypeName = i.titleType
+WHERE {not_null}
+ORDER BY e.tmdb_row, i.rowid, e.genre_position, g.rowid, c.rowid, m.rowid
+"""
+
+FACT_NOT_NULL_COLUMNS = {
+    "i.tconst": ("imdb", "tconst"),
+    "i.averageRating": ("imdb", "averageRating"),
+    "i.numVotes": ("imdb", "numVotes"),
+    "i.startYear": ("imdb", "startYear"),
+    "e.popularity": ("tmdb", "popularity"),
+}
+
+
+def _genre_list_udf(value):
+    # clean_genres for the strings the SQL fast path can't parse; values that can't match an
+    # integer GenreID become NULL entries, which the fact join drops just as the pandas merge + dropna does
+    genres = []
+    for genre in clean_genres(value):
+        if isinstance(genre, (int, float)) and not isinstance(genre, bool) and float(genre).is_integer() \
+                and -2 ** 63 <= genre < 2 ** 63:
+            genres.append(int(genre))
+        else:
+            genres.append(None)
+    return genres
+
+
+def _quote_literal(value: str):
+    return "'" + value.replace("'", "''") + "'"
+
+
+class EngineDimension(ModelAbstract):
+    # A dimension table built outside pandas, loaded exactly like the pandas-built ones
+    def __init__(self, dimension_table: pd.DataFrame, dimension_name: str, columns: list, pk_name: str):
+        super().__init__(None)
+        self.dimension_table = dimension_table
+        self.name = dimension_name
+        self.columns = columns
+        self.primary_key = pk_name
+
+
+class DuckDBTransformEngine:
+    # database=":memory:" keeps the working tables in memory (spilling to temp_directory above memory_limit);
+    # a file path keeps them on disk for inputs larger than RAM
+    def __init__(self, database: str = ":memory:", threads: int = None, memory_limit: str = None,
+                 temp_directory: str = None):
+        self.database = database
+        self.threads = threads
+        self.memory_limit = memory_limit
+        self.temp_directory = temp_directory
+        self._con = None
+
+    @property
+    def con(self):
+        if self._con is None:
+            import duckdb
+
+            self._con = duckdb.connect(self.database)
+            # rowid order must follow the source row order, which the pandas build relies on
+            self._con.execute("SET preserve_insertion_order = true")
+            if self.threads:
+                self._con.execute(f"SET threads = {int(self.threads)}")
+            if self.memory_limit:
+                self._con.execute(f"SET memory_limit = {_quote_literal(self.memory_limit)}")
+            if self.temp_directory:
+                self._con.execute(f"SET temp_directory = {_quote_literal(self.temp_directory)}")
+            self._con.create_function("clean_genre_list", _genre_list_udf, ["VARCHAR"], "BIGINT[]")
+        return self._con
+
+    def close(self):
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+
+    def _register(self, name: str, df: pd.DataFrame):
+        import pyarrow as pa
+
+        self.con.register(name, pa.Table.from_pandas(df, preserve_index=False))
+        return name
+
+    def _scan(self, name: str, source, source_format: str):
+        # File sources are scanned in place; DataFrames go through Arrow
+        if isinstance(source, pd.DataFrame):
+            return self._register(f"{name}_frame", source)
+        path = _quote_literal(str(source))
+        if source_format == "parquet":
+            return f"read_parquet({path})"
+        null_strings = ", ".join(_quote_literal(value) for value in CSV_NULL_STRINGS)
+        return f"read_csv({path}, header = true, nullstr = [{null_strings}])"
+
+    def load_sources(self, sources: dict, source_format: str = "csv"):
+        # sources: countries / imdb / tmdb / genres -> csv or Parquet file path (per source_format) or DataFrame.
+        # Only the projected columns are copied into DuckDB tables, in source row order.
+        for name, columns in SOURCE_COLUMNS.items():
+            column_list = ", ".join(f'"{column}"' for column in columns)
+            scan = self._scan(name, sources[name], source_format)
+            self.con.execute(f"CREATE OR REPLACE TABLE {name} AS SELECT {column_list} FROM {scan}")
+        self._register("movie_types_frame", MovieTypeDimension().dimension_table)
+        self.con.execute("CREATE OR REPLACE TABLE movie_types AS SELECT * FROM movie_types_frame")
+        # The fact join reads these two, so they are kept as tables
+        self.con.execute(COUNTRY_DIM_SQL)
+        self.con.execute(GENRE_DIM_SQL)
+
+    def _column_type(self, table: str, column: str):
+        return self.con.execute(
+            "SELECT data_type FROM information_schema.columns WHERE table_name = ? AND column_name = ?",
+            [table, column]).fetchone()[0]
+
+    def _genre_list_sql(self):
+        # genre_ids parsed like parse_genre_ids: well-formed "[28, 12]" strings in SQL, the rest through clean_genres
+        genre_type = self._column_type("tmdb", "genre_ids")
+        if genre_type == "VARCHAR":
+            return (f"CASE WHEN genre_ids IS NULL THEN []::BIGINT[] "
+                    f"WHEN regexp_full_match(genre_ids, {_quote_literal(GENRE_LIST_PATTERN)}) THEN "
+                    f"CAST(genre_ids AS BIGINT[]) "
+                    f"ELSE clean_genre_list(genre_ids) END")
+        if genre_type in ("TINYINT", "SMALLINT", "INTEGER", "BIGINT"):
+            return "CASE WHEN genre_ids IS NULL THEN []::BIGINT[] ELSE [CAST(genre_ids AS BIGINT)] END"
+        return "[]::BIGINT[]"
+
+    def _not_null_sql(self):
+        # dropna: NULL everywhere, and NaN in floating point columns
+        conditions = []
+        for expression, (table, column) in FACT_NOT_NULL_COLUMNS.items():
+            conditions.append(f"{expression} IS NOT NULL")
+            if self._column_type(table, column) in ("DOUBLE", "FLOAT"):
+                conditions.append(f"NOT isnan({expression})")
+        return " AND ".join(conditions)
+
+    def _fetch(self, sql: str):
+        return self.con.execute(sql).to_arrow_table().to_pandas()
+
+    def fact_table_sql(self):
+        return FACT_SQL.format(genre_list=self._genre_list_sql(), not_null=self._not_null_sql())
+
+    def copy_fact_table(self, path: str, compression: str = "zstd"):
+        # Writes the fact table straight to Parquet without materialising it in Python (after load_sources)
+        self.con.execute(f"COPY ({self.fact_table_sql()}) TO {_quote_literal(path)} "
+                         f"(FORMAT parquet, COMPRESSION {compression})")
+
+    def build(self, sources: dict, source_format: str = "csv"):
+        # Returns the same tables MainETL's pandas build produces, keyed like its DAG nodes
+        with span("transform.duckdb.load_sources", source_format=source_format):
+            self.load_sources(sources, source_format)
+
+        tables = {}
+        for name, sql in [("country_dim", "SELECT * FROM country_dim"), ("movie_dim", MOVIE_DIM_SQL),
+                          ("genre_dim", "SELECT * FROM genre_dim"), ("fact_table", self.fact_table_sql())]:
+            with span(f"transform.duckdb.{name}") as stage:
+                tables[name] = self._fetch(sql)
+                stage.rows_out = len(tables[name])
+                stage.bytes_out = frame_bytes(tables[name])
+        country, movie, genre, fact_table = (tables[name] for name in ["country_dim", "movie_dim", "genre_dim", "fact_table"])
+
+        return {
+            "movie_types": MovieTypeDimension(),
+            "country_dim": EngineDimension(country, "Country", ['CountryID', 'CountryName', 'Continent', 'LanguagesSpoken'], 'CountryID'),
+            "movie_dim": EngineDimension(movie, "Movie", ['MovieID', 'MovieTitle', 'OriginalTitle'], 'MovieID'),
+            "genre_dim": EngineDimension(genre, "Genre", ['GenreID', 'GenreName'], 'GenreID'),
+            "fact_table": fact_table,
+        }
+
+
+def compare_star_schemas(expected: dict, actual: dict):
+    # expected/actual: table name -> DataFrame. Tables must have the same rows in the same order with equal
+    # values; index labels and dtype widths (int64 vs float64 after a left join, str vs object) may differ.
+    for name, expected_table in expected.items():
+        actual_table = actual[name]
+        pd.testing.assert_frame_equal(expected_table.reset_index(drop=True), actual_table.reset_index(drop=True),
+                                      check_dtype=False, obj=name)
+        print(f"✅ {name}: {len(expected_table)} rows match")
@@ -0,0 +1,202 @@
+# fact_partitions.py
+# Partitioned fact table generation. TMDb and IMDb rows are split by a hash of the IMDb id, so every IMDb
+# join stays inside one partition; the small Genre/Country/MovieType dimensions are sent once to each worker
+# process, and each finished partition goes straight to a sink instead of being concatenated in memory.
+# Every partition keeps the row labels and dtypes the single-process lean path would give those rows, so
+# sorting the written partitions by index reproduces FactTableGenerator.generate_fact_table() exactly.
+# (downcast is not applied here: narrowing per partition would give partitions different dtypes.)
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from utils.dimension_classes import FactTableGenerator, parse_genre_ids
+from utils.incremental_loader import add_row_hash
+from utils.instrumentation import Tracer, set_tracer, span
+
+# The only source columns the fact table reads; nothing else is shipped to the workers
+TMDB_FACT_COLUMNS = ['imdb_id', 'genre_ids', 'popularity']
+IMDB_FACT_COLUMNS = ['tconst', 'averageRating', 'region', 'numVotes', 'startYear', 'titleType']
+
+# Dimensions broadcast to each worker process by _init_worker
+_dimensions = None
+
+
+def _init_worker(df_genre_list, df_movie_types, df_countries):
+    global _dimensions
+    _dimensions = (df_genre_list, df_movie_types, df_countries)
+    # Spans recorded in a worker would never reach the parent's tracer; the parent times the partitions
+    set_tracer(Tracer(enabled=False))
+
+
+def _generate_partition(partition, df_tmdb, df_imdb, row_starts, row_sizes, gaps, sink=None):
+    df_genre_list, df_movie_types, df_countries = _dimensions
+    generator = FactTableGenerator(df_imdb, df_tmdb, None, df_genre_list, df_movie_types, df_countries)
+    fact_table = generator.generate_fact_table_lean(gaps=gaps)
+
+    # Exploded-row positions inside the partition -> positions in the whole table
+    local = fact_table.index.to_numpy()
+    local_starts = np.concatenate(([0], np.cumsum(row_sizes)[:-1]))
+    row = np.searchsorted(local_starts, local, side="right") - 1
+    fact_table.index = pd.Index(local - local_starts[row] + row_starts[row])
+
+    if sink is None:
+        return fact_table
+    # Sinks that can write from any process keep the partition out of the parent altogether
+    if len(fact_table):
+        sink.write(partition, fact_table)
+    return len(fact_table)
+
+
+def _plan(generator: FactTableGenerator, tmdb: pd.DataFrame, imdb: pd.DataFrame, partitions: int):
+    # TMDb and IMDb ids are hashed together (factorized), so equal ids get the same code on both sides.
+    # The code picks the partition, dealing distinct ids round-robin, and counts each TMDb row's IMDb matches.
+    codes, _ = pd.factorize(pd.concat([imdb['tconst'], tmdb['imdb_id']], ignore_index=True), use_na_sentinel=False)
+    imdb_codes, tmdb_codes = codes[:len(imdb)], codes[len(imdb):]
+    code_count = int(codes.max()) + 1 if len(codes) else 0
+    matches = np.bincount(imdb_codes, minlength=code_count)[tmdb_codes]
+    has_imdb = matches > 0
+
+    # Per TMDb row: where its exploded rows start in the single-process table, and how many there are
+    # (IMDb matches x genres, at least one each, as the left join and explode produce)
+    genre_rows, genre_values = parse_genre_ids(tmdb['genre_ids'])
+    sizes = np.maximum(matches, 1) * np.bincount(genre_rows, minlength=len(tmdb))
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+    # Whether any row of the whole table misses a dimension, which decides the left-join dtypes
+    imdb_gaps = not has_imdb.all()
+    genre_gaps = not pd.Series(genre_values).isin(generator.df_genre_list['GenreID']).all()
+    movie_type_gaps = imdb_gaps
+    if not movie_type_gaps:
+        matched = np.bincount(tmdb_codes, minlength=code_count)[imdb_codes] > 0
+        movie_type_gaps = not imdb.loc[matched, 'titleType'].isin(generator.df_movie_types['MovieTypeName']).all()
+    gaps = {"imdb": bool(imdb_gaps), "genre": bool(genre_gaps), "movie_type": bool(movie_type_gaps)}
+
+    return _split(tmdb_codes % partitions, partitions), _split(imdb_codes % partitions, partitions), starts, sizes, gaps
+
+
+def _split(part: np.ndarray, partitions: int):
+    # Row positions of each partition, in their original order
+    order = np.argsort(part, kind="stable")
+    return np.split(order, np.cumsum(np.bincount(part, minlength=partitions))[:-1])
+
+
+def generate_partitioned(generator: FactTableGenerator, sink, partitions: int = 8, workers: int = None):
+    workers = workers or os.cpu_count() or 1
+
+    # Same in-place normalization as the single-process path
+    generator.df_countries["CountryID"] = generator.df_countries["CountryID"].str.lower()
+
+    tmdb = generator.df_tmdb_movies[TMDB_FACT_COLUMNS]
+    imdb = generator.df_imdb_movies[IMDB_FACT_COLUMNS]
+    with span("transform.fact.partitioned", rows_in=len(tmdb), partitions=partitions, workers=workers) as stage:
+        with span("transform.fact.plan", rows_in=len(tmdb)) as plan:
+            tmdb_parts, imdb_parts, starts, sizes, gaps = _plan(generator, tmdb, imdb, partitions)
+            plan.rows_out = int(sizes.sum())
+
+        # Any object with write(partition, df) and close() works; in_workers=True sinks must be picklable
+        in_workers = getattr(sink, "in_workers", False)
+        dimensions = (generator.df_genre_list, generator.df_movie_types, generator.df_countries)
+        written = 0
+        partition_rows = {}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=dimensions) as executor:
+            pending = {}
+            queue = iter(range(partitions))
+            while True:
+                # At most two partitions in flight per worker, so input slices are only copied shortly before they run
+                for partition in queue:
+                    rows = tmdb_parts[partition]
+                    future = executor.submit(
+                        _generate_partition, partition,
+                        tmdb.iloc[rows],
+                        imdb.iloc[imdb_parts[partition]],
+                        starts[rows], sizes[rows], gaps,
+                        sink if in_workers else None,
+                    )
+                    pending[future] = partition
+                    if len(pending) >= 2 * workers:
+                        break
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    partition = pending.pop(future)
+                    result = future.result()
+                    if in_workers:
+                        rows = result
+                    else:
+                        rows = len(result)
+                        if rows:
+                            with span("transform.fact.partition_write", rows_in=rows, partition=partition):
+                                sink.write(partition, result)
+                    del result
+                    written += rows
+                    partition_rows[partition] = rows
+
+        sink.close()
+        stage.rows_out = written
+        stage.attrs["partition_rows"] = [partition_rows.get(partition, 0) for partition in range(partitions)]
+    return written
+
+
+class ParquetPartitionSink:
+    # One Parquet file per partition, with the row labels kept so read_fact_partitions restores the order.
+    # Files are written by the worker processes themselves.
+    in_workers = True
+
+    def __init__(self, directory: str, compression: str = "zstd"):
+        self.directory = directory
+        self.compression = compression
+        os.makedirs(directory, exist_ok=True)
+        # Files left by an earlier run with more partitions would otherwise be read back with this one
+        for file_name in os.listdir(directory):
+            if file_name.startswith("part-") and file_name.endswith(".parquet"):
+                os.remove(os.path.join(directory, file_name))
+
+    def path(self, partition: int):
+        return os.path.join(self.directory, f"part-{partition:05d}.parquet")
+
+    def write(self, partition: int, fact_table: pd.DataFrame):
+        fact_table.to_parquet(self.path(partition), compression=self.compression, index=True)
+
+    def close(self):
+        pass
+
+
+def read_fact_partitions(directory: str):
+    files = sorted(f for f in os.listdir(directory) if f.startswith("part-") and f.endswith(".parquet"))
+    return pd.concat([pd.read_parquet(os.path.join(directory, f)) for f in files]).sort_index()
+
+
+class LoaderPartitionSink:
+    # Bulk-loads each partition into one SQL table: the first partition (re)creates it, the rest append,
+    # and the keys are applied once every partition is in (build_keys=False leaves them to the caller).
+    # Star schema tables are created up front with their final column types.
+    in_workers = False
+
+    def __init__(self, database, table_name: str, primary_key_name: str = None, build_keys: bool = True):
+        self.database = database
+        self.table_name = table_name
+        self.primary_key_name = primary_key_name
+        self.build_keys = build_keys
+        self.created = False
+
+    def write(self, partition: int, fact_table: pd.DataFrame):
+        star_schema = self.database.star_schema
+        if self.table_name in star_schema:
+            if not self.created:
+                star_schema.recreate(self.table_name)
+            # Hashed like the whole table would be, so a later incremental load can diff against the rows
+            fact_table = add_row_hash(fact_table)
+            self.database.bulk_loader.load(self.table_name, star_schema.conform(self.table_name, fact_table), if_exists="append")
+        else:
+            self.database.bulk_loader.load(self.table_name, fact_table, if_exists="append" if self.created else "replace")
+        self.created = True
+
+    def close(self):
+        if not self.created:
+            print(f"⚠️ No rows were written to {self.table_name}")
+            return
+        if self.build_keys:
+            self.database.add_table_keys(self.table_name, self.primary_key_name)
@@ -0,0 +1,114 @@
+# incremental_loader.py
+import pandas as pd
+from sqlalchemy import inspect
+
+from utils.instrumentation import frame_bytes, span
+
+HASH_COLUMN = "RowHash"
+
+
+def add_row_hash(df: pd.DataFrame, hash_column: str = HASH_COLUMN):
+    # Content hash of every column of the row, stored as a signed BIGINT-compatible value
+    # (assign keeps the frame's data shared under copy-on-write; the fact table isn't copied to add one column)
+    content = df.drop(columns=[hash_column], errors="ignore")
+    return df.assign(**{hash_column: pd.util.hash_pandas_object(content, index=False).to_numpy().view("int64")})
+
+
+class IncrementalLoader:
+    # Upserts a DataFrame into an existing table: only new and changed rows (by content hash) are
+    # bulk-loaded into a staging table and merged, and keys missing from the frame are deleted explicitly.
+    # Uses MERGE on SQL Server and a portable delete + insert elsewhere (e.g. a sqlite stand-in).
+    def __init__(self, engine, bulk_loader, schema: str = "dbo"):
+        self.engine = engine
+        self.bulk_loader = bulk_loader
+        self.schema = schema if engine.dialect.name == "mssql" else None
+
+    def _table(self, table_name: str):
+        quote = self.engine.dialect.identifier_preparer.quote
+        return f"{quote(self.schema)}.{quote(table_name)}" if self.schema else quote(table_name)
+
+    def can_upsert(self, table_name: str):
+        inspector = inspect(self.engine)
+        if not inspector.has_table(table_name, schema=self.schema):
+            return False
+        return HASH_COLUMN in [column["name"] for column in inspector.get_columns(table_name, schema=self.schema)]
+
+    def diff(self, table_name: str, df: pd.DataFrame, key_columns: list):
+        # Returns (rows to upsert, keys to delete) against the hashes already in the table
+        quote = self.engine.dialect.identifier_preparer.quote
+        select_list = ", ".join(quote(column) for column in key_columns + [HASH_COLUMN])
+        with self.engine.connect() as con:
+            rows = con.exec_driver_sql(f"SELECT {select_list} FROM {self._table(table_name)}").fetchall()
+        # Built column by column so hashes stay exact: read_sql would turn a hash column with NULLs into float64
+        existing = pd.DataFrame({column: [row[i] for row in rows] for i, column in enumerate(key_columns)})
+        existing[HASH_COLUMN] = pd.array([row[-1] for row in rows], dtype="Int64")
+
+        # Compare on key columns only and pick rows back out of df by position so its dtypes survive
+        left = df[key_columns].copy()
+        left["_position"] = range(len(df))
+        left[HASH_COLUMN] = df[HASH_COLUMN].astype("Int64")
+        merged = left.merge(existing, on=key_columns, how="outer", suffixes=("", "_existing"), indicator=True)
+        new_rows = merged["_merge"] == "left_only"
+        # A missing stored hash compares as <NA>: such rows are merged as changed, never taken as unchanged
+        changed_rows = (merged["_merge"] == "both") & \
+            (merged[HASH_COLUMN] != merged[f"{HASH_COLUMN}_existing"]).fillna(True).astype(bool)
+        deleted_keys = merged.loc[merged["_merge"] == "right_only", key_columns].reset_index(drop=True)
+
+        upserts = df.iloc[merged.loc[new_rows | changed_rows, "_position"].astype("int64").to_numpy()]
+        print(f"🔁 {table_name}: {int(new_rows.sum())} new, {int(changed_rows.sum())} changed, "
+              f"{len(deleted_keys)} deleted, {int((merged['_merge'] == 'both').sum()) - int(changed_rows.sum())} unchanged")
+        return upserts, deleted_keys
+
+    def _merge_sql(self, table_name: str, staging_name: str, columns: list, key_columns: list):
+        quote = self.engine.dialect.identifier_preparer.quote
+        on = " AND ".join(f"t.{quote(k)} = s.{quote(k)}" for k in key_columns)
+        column_list = ", ".join(quote(c) for c in columns)
+        if self.engine.dialect.name == "mssql":
+            updates = ", ".join(f"t.{quote(c)} = s.{quote(c)}" for c in columns if c not in key_columns)
+            values = ", ".join(f"s.{quote(c)}" for c in columns)
+            return [
+                f"MERGE {self._table(table_name)} AS t USING {self._table(staging_name)} AS s ON {on} "
+                f"WHEN MATCHED THEN UPDATE SET {updates} "
+                f"WHEN NOT MATCHED BY TARGET THEN INSERT ({column_list}) VALUES ({values});"
+            ]
+        return [
+            f"DELETE FROM {self._table(table_name)} WHERE EXISTS "
+            f"(SELECT 1 FROM {self._table(staging_name)} s WHERE "
+            + " AND ".join(f"{self._table(table_name)}.{quote(k)} = s.{quote(k)}" for k in key_columns) + ")",
+            f"INSERT INTO {self._table(table_name)} ({column_list}) SELECT {column_list} FROM {self._table(staging_name)}",
+        ]
+
+    def _delete_sql(self, table_name: str, staging_name: str, key_columns: list):
+        quote = self.engine.dialect.identifier_preparer.quote
+        return (f"DELETE FROM {self._table(table_name)} WHERE EXISTS "
+                f"(SELECT 1 FROM {self._table(staging_name)} d WHERE "
+                + " AND ".join(f"{self._table(table_name)}.{quote(k)} = d.{quote(k)}" for k in key_columns) + ")")
+
+    def upsert(self, table_name: str, df: pd.DataFrame, key_columns: list, delete_missing: bool = True):
+        with span(f"load.upsert[{table_name}]", rows_in=len(df), bytes_in=frame_bytes(df)) as stage:
+            duplicates = df.duplicated(subset=key_columns, keep="last")
+            if duplicates.any():
+                print(f"ℹ️ {table_name}: dropping {int(duplicates.sum())} rows with duplicate keys before merge")
+                df = df[~duplicates]
+            df = add_row_hash(df)
+
+            upserts, deleted_keys = self.diff(table_name, df, key_columns)
+            staging_name = f"stg_{table_name}"
+            deletes_name = f"stg_{table_name}_deletes"
+
+            if len(upserts):
+                self.bulk_loader.load(staging_name, upserts, if_exists="replace")
+            if delete_missing and len(deleted_keys):
+                self.bulk_loader.load(deletes_name, deleted_keys, if_exists="replace")
+
+            with self.engine.begin() as con:
+                if len(upserts):
+                    for statement in self._merge_sql(table_name, staging_name, list(upserts.columns), key_columns):
+                        con.exec_driver_sql(statement)
+                    con.exec_driver_sql(f"DROP TABLE {self._table(staging_name)}")
+                if delete_missing and len(deleted_keys):
+                    con.exec_driver_sql(self._delete_sql(table_name, deletes_name, key_columns))
+                    con.exec_driver_sql(f"DROP TABLE {self._table(deletes_name)}")
+            stage.rows_out = len(upserts)
+            stage.attrs["deleted"] = len(deleted_keys) if delete_missing else 0
+            return len(upserts), len(deleted_keys) if delete_missing else 0
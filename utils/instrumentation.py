@@ -0,0 +1,310 @@
+# instrumentation.py
+# Per-stage spans for the ETL: wall time, CPU time, peak RSS delta, input/output rows and bytes for every
+# extract, merge, explode, dedup and upload step. Spans nest (per thread, or through an explicit parent)
+# and can be exported as JSON lines or as a Prometheus textfile. Individual stages can opt into cProfile
+# or tracemalloc by name pattern.
+#
+#   tracer = set_tracer(Tracer(profile_stages=["transform.fact.*"], profile_dir="./data/profiles"))
+#   with span("transform.dedup[Movie]", rows_in=len(df)) as s:
+#       ...
+#       s.rows_out = len(dim)
+#   tracer.export_jsonl("./data/spans.jsonl"); tracer.export_prometheus("./data/cinerank.prom")
+import fnmatch
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+
+def rss_bytes():
+    # Current resident set size; /proc is exact on Linux, elsewhere fall back to the (peak) rusage figure
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class RSSSampler:
+    # Samples RSS on a background thread while a stage runs; numpy, pandas and Arrow allocations all count.
+    # RSS is process-wide, so stages running concurrently see each other's allocations.
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start_rss = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_rss = max(self.peak_rss, rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.start_rss = self.peak_rss = rss_bytes()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, rss_bytes())
+
+
+class Span:
+    def __init__(self, name: str, span_id: str, parent_id: str = None, rows_in: int = None, bytes_in: int = None,
+                 **attrs):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.bytes_in = bytes_in
+        self.bytes_out = None
+        self.attrs = attrs
+        self.started_at = None
+        self.wall_s = None
+        self.cpu_s = None
+        self.peak_rss_delta_mb = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "name": self.name, "span_id": self.span_id, "parent_id": self.parent_id, "started_at": self.started_at,
+            "wall_s": self.wall_s, "cpu_s": self.cpu_s, "peak_rss_delta_mb": self.peak_rss_delta_mb,
+            "rows_in": self.rows_in, "rows_out": self.rows_out, "bytes_in": self.bytes_in, "bytes_out": self.bytes_out,
+            "error": self.error, "attrs": self.attrs,
+        }
+
+
+class _SpanContext:
+    def __init__(self, tracer, span: Span):
+        self.tracer = tracer
+        self.span = span
+
+    def __enter__(self):
+        tracer, span = self.tracer, self.span
+        tracer._stack().append(span)
+        span.started_at = datetime.now(timezone.utc).isoformat()
+        self._profile = tracer._start_profile(span)
+        self._tracemalloc = tracer._start_tracemalloc(span)
+        self._sampler = RSSSampler(tracer.rss_interval).__enter__() if tracer.sample_rss else None
+        self._cpu_start = time.thread_time()
+        self._wall_start = time.perf_counter()
+        return span
+
+    def __exit__(self, exc_type, exc, tb):
+        tracer, span = self.tracer, self.span
+        span.wall_s = round(time.perf_counter() - self._wall_start, 6)
+        # CPU of the thread running the stage; work in pool threads or worker processes is not included
+        span.cpu_s = round(time.thread_time() - self._cpu_start, 6)
+        if self._sampler is not None:
+            self._sampler.__exit__()
+            span.peak_rss_delta_mb = round((self._sampler.peak_rss - self._sampler.start_rss) / 1024 ** 2, 1)
+        tracer._stop_tracemalloc(span, self._tracemalloc)
+        tracer._stop_profile(span, self._profile)
+        if exc is not None:
+            span.error = f"{exc_type.__name__}: {exc}"
+        tracer._stack().pop()
+        tracer._finish(span)
+        return False
+
+
+class _NullSpan:
+    # Accepts the same attribute writes as Span when tracing is disabled
+    def __init__(self):
+        self.attrs = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Tracer:
+    def __init__(self, enabled: bool = True, echo: bool = True, sample_rss: bool = True, rss_interval: float = 0.01,
+                 profile_stages: list = (), trace_memory_stages: list = (), profile_dir: str = "./data/profiles",
+                 run_id: str = None):
+        self.enabled = enabled
+        # One summary line per finished span on stdout
+        self.echo = echo
+        self.sample_rss = sample_rss
+        self.rss_interval = rss_interval
+        # fnmatch patterns of span names to run under cProfile / tracemalloc
+        self.profile_stages = list(profile_stages)
+        self.trace_memory_stages = list(trace_memory_stages)
+        self.profile_dir = profile_dir
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def current(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def span(self, name: str, parent: Span = None, rows_in: int = None, bytes_in: int = None, **attrs):
+        # parent defaults to the innermost open span of this thread; pass it explicitly across threads
+        if not self.enabled:
+            return _NullSpan()
+        parent = parent or self.current()
+        return _SpanContext(self, Span(name, uuid.uuid4().hex[:16], parent.span_id if parent else None,
+                                       rows_in=rows_in, bytes_in=bytes_in, **attrs))
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+        if self.echo:
+            parts = [f"{span.wall_s:.2f}s wall", f"{span.cpu_s:.2f}s cpu"]
+            if span.peak_rss_delta_mb is not None:
+                parts.append(f"+{span.peak_rss_delta_mb:.1f} MB peak")
+            if span.rows_in is not None or span.rows_out is not None:
+                parts.append(f"rows {span.rows_in if span.rows_in is not None else '-'} -> "
+                             f"{span.rows_out if span.rows_out is not None else '-'}")
+            if span.bytes_in or span.bytes_out:
+                parts.append(f"bytes {span.bytes_in or 0} -> {span.bytes_out or 0}")
+            status = "❌" if span.error else "⏱️"
+            print(f"{status} {span.name}: " + ", ".join(parts) + (f" ({span.error})" if span.error else ""))
+
+    def _matches(self, name: str, patterns: list):
+        return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+    def _start_profile(self, span: Span):
+        if not self._matches(span.name, self.profile_stages):
+            return None
+        import cProfile
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active on this thread (e.g. an enclosing profiled span)
+            return None
+        return profile
+
+    def _stop_profile(self, span: Span, profile):
+        if profile is None:
+            return
+        profile.disable()
+        os.makedirs(self.profile_dir, exist_ok=True)
+        safe_name = "".join(c if c.isalnum() or c in "._-" else "_" for c in span.name)
+        path = os.path.join(self.profile_dir, f"{self.run_id}-{safe_name}.prof")
+        profile.dump_stats(path)
+        span.attrs["profile_path"] = path
+
+    def _start_tracemalloc(self, span: Span):
+        if not self._matches(span.name, self.trace_memory_stages):
+            return None
+        import tracemalloc
+
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(10)
+        tracemalloc.reset_peak()
+        return started_here, tracemalloc.get_traced_memory()[0]
+
+    def _stop_tracemalloc(self, span: Span, state):
+        if state is None:
+            return
+        import tracemalloc
+
+        started_here, start_bytes = state
+        current, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+        span.attrs["tracemalloc_peak_delta_mb"] = round((peak - start_bytes) / 1024 ** 2, 2)
+        span.attrs["tracemalloc_retained_mb"] = round((current - start_bytes) / 1024 ** 2, 2)
+        span.attrs["tracemalloc_top"] = [f"{stat.traceback[0].filename}:{stat.traceback[0].lineno} "
+                                         f"{stat.size / 1024 ** 2:.2f} MB" for stat in top]
+        if started_here:
+            tracemalloc.stop()
+
+    def export_jsonl(self, path: str, append: bool = True):
+        # One JSON object per span, tagged with the run id
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._lock:
+            spans = list(self.spans)
+        with open(path, "a" if append else "w") as f:
+            for span in spans:
+                f.write(json.dumps({"run_id": self.run_id, **span.to_dict()}, default=str) + "\n")
+        return path
+
+    def export_prometheus(self, path: str, prefix: str = "cinerank_stage"):
+        # Textfile-collector format, one series per span name (runs of the same name are summed, peaks maxed).
+        # Written to a temporary file and renamed so the collector never reads a partial file.
+        with self._lock:
+            spans = list(self.spans)
+        totals = {}
+        for span in spans:
+            total = totals.setdefault(span.name, {"runs": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                                                  "peak_rss_delta_bytes": 0.0, "rows_in": 0, "rows_out": 0,
+                                                  "bytes_in": 0, "bytes_out": 0, "errors": 0})
+            total["runs"] += 1
+            total["wall_seconds"] += span.wall_s or 0.0
+            total["cpu_seconds"] += span.cpu_s or 0.0
+            total["peak_rss_delta_bytes"] = max(total["peak_rss_delta_bytes"], (span.peak_rss_delta_mb or 0.0) * 1024 ** 2)
+            for field in ("rows_in", "rows_out", "bytes_in", "bytes_out"):
+                total[field] += getattr(span, field) or 0
+            total["errors"] += 1 if span.error else 0
+
+        help_text = {
+            "runs": "Number of times the stage ran", "wall_seconds": "Wall-clock time spent in the stage",
+            "cpu_seconds": "CPU time of the thread running the stage",
+            "peak_rss_delta_bytes": "Peak resident memory growth during the stage",
+            "rows_in": "Rows read by the stage", "rows_out": "Rows produced by the stage",
+            "bytes_in": "Bytes read or downloaded by the stage", "bytes_out": "Bytes written or uploaded by the stage",
+            "errors": "Runs of the stage that raised",
+        }
+        lines = []
+        for metric, text in help_text.items():
+            lines.append(f"# HELP {prefix}_{metric} {text}")
+            lines.append(f"# TYPE {prefix}_{metric} gauge")
+            for name, total in totals.items():
+                label = name.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                lines.append(f'{prefix}_{metric}{{stage="{label}"}} {total[metric]}')
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+        return path
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+        return _tracer
+
+
+def set_tracer(tracer: Tracer):
+    global _tracer
+    with _tracer_lock:
+        _tracer = tracer
+    return tracer
+
+
+def span(name: str, parent: Span = None, rows_in: int = None, bytes_in: int = None, **attrs):
+    return get_tracer().span(name, parent=parent, rows_in=rows_in, bytes_in=bytes_in, **attrs)
+
+
+def frame_bytes(df):
+    # In-memory size of a DataFrame without the (slow) deep inspection of object columns
+    return int(df.memory_usage(index=False, deep=False).sum())
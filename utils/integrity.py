@@ -0,0 +1,170 @@
+# integrity.py
+# Client-side referential integrity for the star schema, checked on the DataFrames before anything is loaded.
+# Every dimension's primary key must be unique and non-null, and every fact foreign key must exist in its
+# dimension's key set. Each key set is one hash index, and each fact key column is probed against it once, so the
+# whole check costs a few vectorized lookups instead of a server-side scan of the fact table per constraint.
+# String keys compare case-insensitively, like SQL Server's default collation.
+#   mode "report": print orphan rows and load everything; duplicate or NULL primary keys still raise ValueError, as
+#                  the keys could not be built on them
+#   mode "quarantine": load only valid rows; orphan and duplicate fact rows go to QUARANTINE_TABLE with a Reason
+#   mode "strict": raise ValueError before the first invalid row is loaded
+import numpy as np
+import pandas as pd
+
+from utils.instrumentation import span
+from utils.star_schema import STAR_SCHEMA
+
+MODES = ("report", "quarantine", "strict")
+FACT_TABLE = "MovieGenreFact_dim"
+QUARANTINE_TABLE = "MovieGenreFact_quarantine"
+
+
+def _normalized(values: pd.Series):
+    if pd.api.types.is_string_dtype(values) or values.dtype == object:
+        return values.astype("string").str.lower()
+    return values
+
+
+class IntegrityReport:
+    def __init__(self):
+        # table -> rows whose primary key repeats an earlier row / has a NULL key column
+        self.duplicate_keys = {}
+        self.null_keys = {}
+        # foreign key constraint -> fact rows whose key is missing from the dimension
+        self.orphans = {}
+        self.fact_rows = 0
+        self.quarantined = 0
+
+    @property
+    def keys_ok(self):
+        return not any(self.duplicate_keys.values()) and not any(self.null_keys.values())
+
+    @property
+    def ok(self):
+        return self.keys_ok and not any(self.orphans.values())
+
+    def add(self, counts: dict, key: str, count: int):
+        counts[key] = counts.get(key, 0) + int(count)
+
+    def lines(self):
+        lines = []
+        for table, count in self.duplicate_keys.items():
+            if count:
+                lines.append(f"{table}: {count} rows repeat a primary key")
+        for table, count in self.null_keys.items():
+            if count:
+                lines.append(f"{table}: {count} rows have a NULL primary key")
+        for constraint, count in self.orphans.items():
+            if count:
+                lines.append(f"{FACT_TABLE}: {count} of {self.fact_rows} rows violate {constraint}")
+        return lines
+
+
+class IntegrityChecker:
+    def __init__(self, dimensions: dict, mode: str = "report", specs: dict = None, fact_table_name: str = FACT_TABLE):
+        # dimensions: table name -> DataFrame, as loaded
+        if mode not in MODES:
+            raise ValueError(f"Unknown integrity mode '{mode}', expected one of {', '.join(MODES)}")
+        self.mode = mode
+        self.specs = specs or STAR_SCHEMA
+        self.fact_spec = self.specs[fact_table_name]
+        self.report = IntegrityReport()
+        self.quarantine = []
+        self.fact_columns = None
+
+        with span("validate.dimensions", tables=list(dimensions)):
+            for name, df in dimensions.items():
+                self._check_unique(name, df)
+            # One hash index of distinct keys per referenced dimension
+            self.key_sets = {}
+            for fk_name, columns, referenced, referenced_columns in self.fact_spec.foreign_keys:
+                if referenced in dimensions:
+                    keys = _normalized(dimensions[referenced][referenced_columns[0]]).dropna()
+                    self.key_sets[fk_name] = (columns[0], pd.Index(keys.unique()))
+
+    def _key_problems(self, name: str, df: pd.DataFrame):
+        key = self.specs[name].primary_key
+        normalized = pd.DataFrame({column: _normalized(df[column]) for column in key})
+        return normalized.isna().any(axis=1).to_numpy(), normalized.duplicated().to_numpy()
+
+    def _check_unique(self, name: str, df: pd.DataFrame):
+        nulls, duplicates = self._key_problems(name, df)
+        self.report.add(self.report.null_keys, name, nulls.sum())
+        self.report.add(self.report.duplicate_keys, name, (duplicates & ~nulls).sum())
+
+    def clean_dimension(self, name: str, df: pd.DataFrame):
+        # In quarantine mode the first row of each key is kept and rows with a NULL key are dropped
+        if self.mode != "quarantine":
+            return df
+        nulls, duplicates = self._key_problems(name, df)
+        bad = nulls | duplicates
+        return df[~bad] if bad.any() else df
+
+    def check_fact(self, fact_table: pd.DataFrame):
+        # Reason per row (None when valid): the first violated constraint, or the fact primary key
+        with span("validate.fact", rows_in=len(fact_table)) as stage:
+            reasons = np.full(len(fact_table), None, dtype=object)
+            for fk_name, (column, keys) in self.key_sets.items():
+                values = _normalized(fact_table[column])
+                missing = keys.get_indexer(values) < 0
+                self.report.add(self.report.orphans, fk_name, missing.sum())
+                reasons[missing & (reasons == None)] = fk_name  # noqa: E711 (elementwise)
+            nulls, duplicates = self._key_problems(self.fact_spec.name, fact_table)
+            self.report.add(self.report.null_keys, self.fact_spec.name, nulls.sum())
+            self.report.add(self.report.duplicate_keys, self.fact_spec.name, (duplicates & ~nulls).sum())
+            reasons[(nulls | duplicates) & (reasons == None)] = f"PK_{self.fact_spec.name}"  # noqa: E711
+            self.report.fact_rows += len(fact_table)
+            stage.rows_out = int((reasons == None).sum())  # noqa: E711
+        return reasons
+
+    def apply(self, fact_table: pd.DataFrame):
+        # The fact rows to load
+        reasons = self.check_fact(fact_table)
+        self.fact_columns = self.fact_columns or list(fact_table.columns)
+        bad = reasons != None  # noqa: E711
+        if not bad.any():
+            return fact_table
+        if self.mode != "quarantine":
+            self.raise_for_problems()
+            return fact_table
+        self.quarantine.append(fact_table[bad].assign(Reason=reasons[bad]))
+        self.report.quarantined += int(bad.sum())
+        return fact_table[~bad]
+
+    def quarantined_rows(self):
+        if not self.quarantine:
+            return pd.DataFrame(columns=(self.fact_columns or []) + ["Reason"])
+        return pd.concat(self.quarantine, ignore_index=True)
+
+    def raise_for_problems(self):
+        # strict: any problem; report: the ones a primary key can't be built on; quarantine: none
+        if (self.mode == "strict" and not self.report.ok) or (self.mode == "report" and not self.report.keys_ok):
+            raise ValueError("Referential integrity check failed:\n  " + "\n  ".join(self.report.lines()))
+
+    def finish(self):
+        self.raise_for_problems()
+        for line in self.report.lines():
+            print(f"⚠️ {line}")
+        if self.report.quarantined:
+            print(f"🚧 {self.report.quarantined} fact rows quarantined to {QUARANTINE_TABLE}")
+        elif self.report.ok:
+            print(f"✅ Referential integrity: {self.report.fact_rows} fact rows, every key resolves")
+        return self.report
+
+    def partition_sink(self, sink):
+        # Validates (and in quarantine mode filters) each partition of a partitioned fact table on its way to sink
+        return IntegrityPartitionSink(self, sink)
+
+
+class IntegrityPartitionSink:
+    def __init__(self, checker: IntegrityChecker, sink):
+        self.checker = checker
+        self.sink = sink
+        # Partitions have to reach this process to be checked
+        self.in_workers = False
+
+    def write(self, partition: int, fact_table: pd.DataFrame):
+        self.sink.write(partition, self.checker.apply(fact_table))
+
+    def close(self):
+        self.sink.close()
@@ -0,0 +1,183 @@
+# local_blob.py
+# Filesystem-backed stand-in for the parts of the Azure Blob SDK that AzureDB uses.
+# Containers are directories under `root`, blobs are files; ETags follow the file's mtime and size.
+# Usage: AzureDB(blob_service_client=LocalBlobServiceClient("./local_blobs")), or for the whole pipeline
+# set_runtime(PipelineRuntime(blob_service_client=LocalBlobServiceClient("./local_blobs")))
+import json
+import os
+import shutil
+import types
+from datetime import datetime, timezone
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceNotFoundError, ResourceNotModifiedError, ResourceModifiedError
+
+
+class LocalBlobDownloader:
+    def __init__(self, path: str, properties, offset: int = None, length: int = None, chunk_size: int = 4 * 1024 * 1024):
+        self.path = path
+        self.properties = properties
+        self.offset = offset or 0
+        self.length = properties.size - self.offset if length is None else min(length, properties.size - self.offset)
+        self.chunk_size = chunk_size
+        self.size = self.length
+
+    def chunks(self):
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            remaining = self.length
+            while remaining > 0:
+                data = f.read(min(self.chunk_size, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+
+    def readall(self):
+        return b"".join(self.chunks())
+
+    def readinto(self, stream):
+        written = 0
+        for chunk in self.chunks():
+            stream.write(chunk)
+            written += len(chunk)
+        return written
+
+
+class LocalBlobClient:
+    def __init__(self, container_path: str, container_name: str, blob_name: str):
+        self.container_name = container_name
+        self.blob_name = blob_name
+        self.path = os.path.join(container_path, *blob_name.split("/"))
+        self._metadata_path = self.path + ".metadata.json"
+        self._blocks_path = self.path + ".blocks"
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def get_blob_properties(self, **kwargs):
+        if not self.exists():
+            raise ResourceNotFoundError(f"Blob '{self.blob_name}' not found")
+        stat = os.stat(self.path)
+        metadata = {}
+        if os.path.exists(self._metadata_path):
+            with open(self._metadata_path) as f:
+                metadata = json.load(f)
+        return types.SimpleNamespace(
+            name=self.blob_name,
+            container=self.container_name,
+            size=stat.st_size,
+            etag=f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+            last_modified=datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+            metadata=metadata,
+        )
+
+    def download_blob(self, offset: int = None, length: int = None, etag: str = None,
+                      match_condition: MatchConditions = None, **kwargs):
+        properties = self.get_blob_properties()
+        if match_condition == MatchConditions.IfModified and etag == properties.etag:
+            raise ResourceNotModifiedError("The condition specified using HTTP conditional header(s) is not met.")
+        if match_condition == MatchConditions.IfNotModified and etag != properties.etag:
+            raise ResourceModifiedError("The condition specified using HTTP conditional header(s) is not met.")
+        return LocalBlobDownloader(self.path, properties, offset, length)
+
+    def upload_blob(self, data, overwrite: bool = False, metadata: dict = None, **kwargs):
+        if self.exists() and not overwrite:
+            raise ResourceExistsError(f"Blob '{self.blob_name}' already exists")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                f.write(data)
+            elif isinstance(data, str):
+                f.write(data.encode("utf-8"))
+            else:
+                for chunk in iter(lambda: data.read(4 * 1024 * 1024), b""):
+                    f.write(chunk)
+        os.replace(tmp_path, self.path)
+        with open(self._metadata_path, "w") as f:
+            json.dump(metadata or {}, f)
+        return {"etag": self.get_blob_properties().etag}
+
+    def stage_block(self, block_id: str, data, **kwargs):
+        # Uncommitted blocks are kept next to the blob until commit_block_list
+        os.makedirs(self._blocks_path, exist_ok=True)
+        with open(os.path.join(self._blocks_path, block_id), "wb") as f:
+            f.write(data)
+
+    def commit_block_list(self, block_list: list, metadata: dict = None, **kwargs):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for block in block_list:
+                with open(os.path.join(self._blocks_path, getattr(block, "id", block)), "rb") as block_file:
+                    shutil.copyfileobj(block_file, f)
+        os.replace(tmp_path, self.path)
+        shutil.rmtree(self._blocks_path, ignore_errors=True)
+        with open(self._metadata_path, "w") as f:
+            json.dump(metadata or {}, f)
+        return {"etag": self.get_blob_properties().etag}
+
+    def delete_blob(self, **kwargs):
+        if not self.exists():
+            raise ResourceNotFoundError(f"Blob '{self.blob_name}' not found")
+        os.remove(self.path)
+        if os.path.exists(self._metadata_path):
+            os.remove(self._metadata_path)
+
+
+class LocalContainerClient:
+    def __init__(self, root: str, container_name: str):
+        self.container_name = container_name
+        self.path = os.path.join(root, container_name)
+
+    def exists(self):
+        return os.path.isdir(self.path)
+
+    def get_blob_client(self, blob: str):
+        return LocalBlobClient(self.path, self.container_name, blob)
+
+    def download_blob(self, blob: str, **kwargs):
+        return self.get_blob_client(blob).download_blob(**kwargs)
+
+    def upload_blob(self, name: str, data, **kwargs):
+        blob_client = self.get_blob_client(name)
+        blob_client.upload_blob(data, **kwargs)
+        return blob_client
+
+    def list_blobs(self, name_starts_with: str = None):
+        for directory, _, files in os.walk(self.path):
+            if directory.endswith(".blocks"):
+                # Staged, uncommitted blocks
+                continue
+            for file_name in sorted(files):
+                if file_name.endswith((".metadata.json", ".tmp")):
+                    continue
+                name = os.path.relpath(os.path.join(directory, file_name), self.path).replace(os.sep, "/")
+                if name_starts_with is None or name.startswith(name_starts_with):
+                    yield self.get_blob_client(name).get_blob_properties()
+
+    def delete_container(self):
+        for directory, _, files in os.walk(self.path, topdown=False):
+            for file_name in files:
+                os.remove(os.path.join(directory, file_name))
+            os.rmdir(directory)
+
+
+class LocalBlobServiceClient:
+    def __init__(self, root: str = "./local_blobs"):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def create_container(self, container_name: str):
+        container_client = LocalContainerClient(self.root, container_name)
+        if container_client.exists():
+            raise ResourceExistsError(f"Container '{container_name}' already exists")
+        os.makedirs(container_client.path)
+        return container_client
+
+    def get_container_client(self, container: str):
+        return LocalContainerClient(self.root, container)
+
+    def get_blob_client(self, container: str, blob: str):
+        return self.get_container_client(container).get_blob_client(blob)
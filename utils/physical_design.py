@@ -0,0 +1,107 @@
+# physical_design.py
+# Physical design of the fact table, applied by StarSchema.build_keys once the bulk fill is done:
+#   storage="rowstore"     clustered (MovieID, GenreID) primary key, as before
+#   storage="columnstore"  clustered columnstore index; the primary key becomes a nonclustered index
+#   fk_indexes             the spec's nonclustered GenreID / MovieTypeID / CountryID indexes
+#   year_index             ReleaseYear index covering GenreID, Rating and NumRatings, for year-filtered rankings
+#   partition_years        RANGE RIGHT partition boundaries on ReleaseYear (e.g. decade_boundaries())
+#   statistics             statistics refresh after every load: "sample", "fullscan" or None
+# Columnstore and partitioning only exist on SQL Server; on other engines (the sqlite stand-in) the design
+# comes down to its indexes and ANALYZE.
+
+FACT_TABLE = "MovieGenreFact_dim"
+STORAGES = ("rowstore", "columnstore")
+STATISTICS = (None, "sample", "fullscan")
+# Columns the ReleaseYear index carries, so year-filtered rankings and genre x year rollups never touch the table
+YEAR_INDEX_COVERS = ["GenreID", "Rating", "NumRatings"]
+
+
+def decade_boundaries(first: int = 1900, last: int = 2030, step: int = 10):
+    return list(range(first, last + 1, step))
+
+
+class PhysicalDesign:
+    def __init__(self, storage: str = "rowstore", fk_indexes: bool = True, year_index: bool = True,
+                 partition_years: list = None, statistics: str = "sample", table_name: str = FACT_TABLE,
+                 partition_column: str = "ReleaseYear"):
+        if storage not in STORAGES:
+            raise ValueError(f"Unknown storage '{storage}', expected one of {', '.join(STORAGES)}")
+        if statistics not in STATISTICS:
+            raise ValueError(f"Unknown statistics option '{statistics}', expected 'sample', 'fullscan' or None")
+        self.storage = storage
+        self.fk_indexes = fk_indexes
+        self.year_index = year_index
+        self.partition_years = sorted(partition_years) if partition_years else None
+        self.statistics = statistics
+        self.table_name = table_name
+        self.partition_column = partition_column
+
+    @property
+    def clustered_primary_key(self):
+        # A columnstore or a partitioned clustered index takes the clustered slot
+        return self.storage == "rowstore" and not self.partition_years
+
+    @property
+    def primary_key_filegroup(self):
+        # The unique primary key can't be aligned with a ReleaseYear partition scheme, so it stays on PRIMARY
+        return "[PRIMARY]" if self.partition_years else None
+
+    @property
+    def partition_function(self):
+        return f"PF_{self.partition_column}"
+
+    @property
+    def partition_scheme(self):
+        return f"PS_{self.partition_column}"
+
+    def storage_sql(self, star_schema):
+        # Partition function/scheme and the clustered index, ahead of every other index on the table
+        if not star_schema.mssql:
+            return []
+        quote = star_schema.quote
+        table = star_schema._table(self.table_name)
+        statements = []
+        on = ""
+        if self.partition_years:
+            # Recreated with the current boundaries; a full load has dropped the table that used them
+            statements += [
+                f"IF EXISTS (SELECT 1 FROM sys.partition_schemes WHERE name = N'{self.partition_scheme}') "
+                f"DROP PARTITION SCHEME {quote(self.partition_scheme)}",
+                f"IF EXISTS (SELECT 1 FROM sys.partition_functions WHERE name = N'{self.partition_function}') "
+                f"DROP PARTITION FUNCTION {quote(self.partition_function)}",
+                f"CREATE PARTITION FUNCTION {quote(self.partition_function)} (smallint) AS RANGE RIGHT "
+                f"FOR VALUES ({', '.join(str(int(year)) for year in self.partition_years)})",
+                f"CREATE PARTITION SCHEME {quote(self.partition_scheme)} AS PARTITION {quote(self.partition_function)} "
+                f"ALL TO ([PRIMARY])",
+            ]
+            on = f" ON {quote(self.partition_scheme)}({quote(self.partition_column)})"
+        if self.storage == "columnstore":
+            statements.append(f"CREATE CLUSTERED COLUMNSTORE INDEX {quote('CCI_' + self.table_name)} ON {table}{on}")
+        elif self.partition_years:
+            statements.append(f"CREATE CLUSTERED INDEX {quote('CIX_' + self.table_name + '_' + self.partition_column)} "
+                              f"ON {table} ({quote(self.partition_column)}){on}")
+        return statements
+
+    def index_sql(self, star_schema):
+        # A rowstore partitioned on ReleaseYear is already clustered on it
+        if not self.year_index or (self.storage == "rowstore" and self.partition_years and star_schema.mssql):
+            return []
+        quote = star_schema.quote
+        table = star_schema._table(self.table_name)
+        name = quote(f"IX_MovieGenreFact_{self.partition_column}")
+        covered = ", ".join(quote(column) for column in YEAR_INDEX_COVERS)
+        if star_schema.mssql:
+            return [f"CREATE NONCLUSTERED INDEX {name} ON {table} ({quote(self.partition_column)}) INCLUDE ({covered})"]
+        # No INCLUDE outside SQL Server: the covered columns become trailing key columns
+        return [f"CREATE INDEX {name} ON {table} ({quote(self.partition_column)}, {covered})"]
+
+    def statistics_sql(self, star_schema, table_names: list):
+        if self.statistics is None:
+            return []
+        dialect = star_schema.engine.dialect.name
+        if star_schema.mssql:
+            option = " WITH FULLSCAN" if self.statistics == "fullscan" else ""
+            return [f"UPDATE STATISTICS {star_schema._table(name)}{option}" for name in table_names]
+        if dialect == "sqlite":
+            return [f"ANALYZE {star_schema._table(name)}" for name in table_names]
+        return []
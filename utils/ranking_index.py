@@ -0,0 +1,200 @@
+# ranking_index.py
+# Columnar in-memory index over MovieGenreFact_dim and its dimensions for CineRank's top-N queries.
+# Every fact column is held as one compact numpy array, group keys (genre, year, country, movie type) as
+# integer codes, and for each group the fact rows are pre-sorted by rating (then vote count, then MovieID),
+# so a query reads one pre-ordered slice and stops as soon as it has `limit` distinct movies.
+import numpy as np
+import pandas as pd
+
+FACT_COLUMNS = ['MovieID', 'GenreID', 'MovieTypeID', 'CountryID', 'Rating', 'NumRatings', 'ReleaseYear', 'Popularity']
+MOVIE_COLUMNS = ['MovieID', 'MovieTitle', 'OriginalTitle', 'PosterString', 'OriginalLanguage']
+
+
+def _codes(values):
+    # Dense int32 codes plus the sorted distinct values they index (hash-based, much faster than np.unique on strings)
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes.astype(np.int32), np.asarray(uniques)
+
+
+def _narrow(values: np.ndarray):
+    # Smallest integer type that holds every value
+    if len(values) == 0:
+        return values.astype(np.int32)
+    for dtype in (np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= values.min() and values.max() <= info.max:
+            return values.astype(dtype)
+    return values.astype(np.int64)
+
+
+class GroupOrdering:
+    # Fact rows sorted by (group code, rating desc, votes desc, MovieID); rows of code c are order[starts[c]:starts[c + 1]]
+    def __init__(self, codes: np.ndarray, uniques: np.ndarray, global_order: np.ndarray):
+        self.codes = codes
+        self.positions = {value: code for code, value in enumerate(uniques.tolist())}
+        # A stable sort by group code of the globally ranked rows keeps the rank order inside each group
+        self.order = global_order[np.argsort(codes[global_order], kind="stable")]
+        self.starts = np.searchsorted(codes[self.order], np.arange(len(uniques) + 1)).astype(np.int64)
+
+    def rows(self, value):
+        code = self.positions.get(value)
+        if code is None:
+            return self.order[:0]
+        return self.order[self.starts[code]:self.starts[code + 1]]
+
+
+class RankingIndex:
+    def __init__(self, fact_table: pd.DataFrame, movies: pd.DataFrame, genres: pd.DataFrame,
+                 movie_types: pd.DataFrame, countries: pd.DataFrame = None, version: str = None):
+        self.version = version
+        fact_table = fact_table[FACT_COLUMNS].dropna()
+
+        # Movies: only the titles that appear in the fact table, addressed by a dense movie code
+        self.movie_code, movie_ids = _codes(fact_table['MovieID'].astype(str).to_numpy())
+        movies = movies.drop_duplicates('MovieID').set_index('MovieID').reindex(movie_ids)
+        self.movie_ids = movie_ids
+        self.movie_details = {column: movies[column].astype(object).where(movies[column].notna(), None).to_numpy()
+                              for column in MOVIE_COLUMNS[1:] if column in movies.columns}
+
+        # Fact measures, narrowed to the smallest dtype that holds them
+        self.rating = fact_table['Rating'].to_numpy(dtype=np.float64)
+        self.num_ratings = fact_table['NumRatings'].to_numpy(dtype=np.int64)
+        self.popularity = fact_table['Popularity'].to_numpy(dtype=np.float64)
+        self.release_year = _narrow(fact_table['ReleaseYear'].to_numpy(dtype=np.int64))
+        self.genre_id = _narrow(fact_table['GenreID'].to_numpy(dtype=np.int64))
+        self.movie_type_id = _narrow(fact_table['MovieTypeID'].to_numpy(dtype=np.int64))
+        self.country_code, self.country_ids = _codes(fact_table['CountryID'].astype(str).str.lower().to_numpy())
+
+        # Lookups from request values to group keys
+        self.genre_names = dict(zip(genres['GenreID'].astype(np.int64).tolist(), genres['GenreName'].tolist()))
+        self.genre_by_name = {str(name).lower(): genre_id for genre_id, name in self.genre_names.items()}
+        self.movie_type_names = dict(zip(movie_types['MovieTypeID'].astype(np.int64).tolist(),
+                                         movie_types['MovieTypeName'].tolist()))
+        self.movie_type_by_name = {str(name).lower(): type_id for type_id, name in self.movie_type_names.items()}
+        self.country_names = {}
+        if countries is not None:
+            self.country_names = dict(zip(countries['CountryID'].astype(str).str.lower(), countries['CountryName']))
+
+        # One global ranking, then per-group orderings derived from it
+        self.global_order = np.lexsort((self.movie_code, -self.num_ratings, -self.rating)).astype(np.int32)
+        self.groups = {
+            "genre": GroupOrdering(*_codes(self.genre_id), self.global_order),
+            "year": GroupOrdering(*_codes(self.release_year), self.global_order),
+            "country": GroupOrdering(self.country_code, self.country_ids, self.global_order),
+            "movie_type": GroupOrdering(*_codes(self.movie_type_id), self.global_order),
+        }
+
+        # Genres of each movie (CSR by movie code), for the response
+        by_movie = np.argsort(self.movie_code, kind="stable")
+        self.movie_genre_starts = np.searchsorted(self.movie_code[by_movie], np.arange(len(movie_ids) + 1))
+        self.movie_genres = self.genre_id[by_movie]
+
+    def __len__(self):
+        return len(self.rating)
+
+    @property
+    def nbytes(self):
+        arrays = [self.movie_code, self.rating, self.num_ratings, self.popularity, self.release_year, self.genre_id,
+                  self.movie_type_id, self.country_code, self.global_order, self.movie_genres]
+        arrays += [group.order for group in self.groups.values()]
+        return int(sum(array.nbytes for array in arrays))
+
+    @classmethod
+    def from_star_schema(cls, tables: dict, version: str = None):
+        # tables as returned by MainETL.star_schema()
+        return cls(tables["MovieGenreFact_dim"], tables["Movie_dim"], tables["Genre_dim"], tables["MovieType_dim"],
+                   tables.get("Country_dim"), version=version)
+
+    @classmethod
+    def from_database(cls, database, version: str = None):
+        # One projected read per table instead of a query per request
+        engine = database.engine
+        quote = engine.dialect.identifier_preparer.quote
+
+        def read(table_name, columns):
+            return pd.read_sql_query(f"SELECT {', '.join(quote(c) for c in columns)} FROM {quote(table_name)}", engine)
+
+        return cls(read("MovieGenreFact_dim", FACT_COLUMNS),
+                   read("Movie_dim", MOVIE_COLUMNS),
+                   read("Genre_dim", ['GenreID', 'GenreName']),
+                   read("MovieType_dim", ['MovieTypeID', 'MovieTypeName']),
+                   read("Country_dim", ['CountryID', 'CountryName']),
+                   version=version)
+
+    def resolve(self, genre=None, year=None, country=None, movie_type=None):
+        # Request values -> group keys; genre and movie type accept an id or a name (case-insensitive).
+        # Returns None when a value can't match anything.
+        keys = {}
+        if genre is not None:
+            keys["genre"] = self._resolve_named(genre, self.genre_names, self.genre_by_name)
+        if year is not None:
+            keys["year"] = int(year)
+        if country is not None:
+            keys["country"] = str(country).lower()
+        if movie_type is not None:
+            keys["movie_type"] = self._resolve_named(movie_type, self.movie_type_names, self.movie_type_by_name)
+        if any(value is None for value in keys.values()):
+            return None
+        return keys
+
+    @staticmethod
+    def _resolve_named(value, by_id: dict, by_name: dict):
+        text = str(value).strip()
+        if text.lstrip("-").isdigit():
+            return int(text) if int(text) in by_id else None
+        return by_name.get(text.lower())
+
+    def top(self, genre=None, year=None, country=None, movie_type=None, min_votes: int = 0, limit: int = 10):
+        # Highest-rated distinct movies matching every given filter, with at least min_votes ratings
+        keys = self.resolve(genre, year, country, movie_type)
+        if keys is None or limit <= 0:
+            return []
+
+        # Scan the smallest matching group slice; the other filters are checked on the rows scanned
+        if keys:
+            slices = {group: self.groups[group].rows(value) for group, value in keys.items()}
+            scan_group = min(slices, key=lambda group: len(slices[group]))
+            rows = slices[scan_group]
+            filters = {group: value for group, value in keys.items() if group != scan_group}
+        else:
+            rows, filters = self.global_order, {}
+
+        picked = []
+        seen = set()
+        start, chunk = 0, max(limit * 8, 4096)
+        while start < len(rows) and len(picked) < limit:
+            candidates = rows[start:start + chunk]
+            start, chunk = start + chunk, chunk * 2
+            mask = self.num_ratings[candidates] >= min_votes
+            for group, value in filters.items():
+                mask &= self.groups[group].codes[candidates] == self.groups[group].positions.get(value, -1)
+            candidates = candidates[mask]
+            # First row of each movie in rank order; a movie has one row per genre
+            _, first = np.unique(self.movie_code[candidates], return_index=True)
+            for row in candidates[np.sort(first)]:
+                movie = int(self.movie_code[row])
+                if movie not in seen:
+                    seen.add(movie)
+                    picked.append(row)
+                    if len(picked) == limit:
+                        break
+        return [self._movie(row) for row in picked]
+
+    def _movie(self, row: int):
+        movie = int(self.movie_code[row])
+        genres = self.movie_genres[self.movie_genre_starts[movie]:self.movie_genre_starts[movie + 1]]
+        country_id = str(self.country_ids[self.country_code[row]])
+        result = {
+            "MovieID": str(self.movie_ids[movie]),
+            "Rating": float(self.rating[row]),
+            "NumRatings": int(self.num_ratings[row]),
+            "ReleaseYear": int(self.release_year[row]),
+            "Popularity": float(self.popularity[row]),
+            "MovieType": self.movie_type_names.get(int(self.movie_type_id[row])),
+            "CountryID": country_id,
+            "CountryName": self.country_names.get(country_id),
+            "Genres": [self.genre_names.get(int(genre_id), str(genre_id)) for genre_id in sorted(set(genres.tolist()))],
+        }
+        for column, values in self.movie_details.items():
+            result[column] = values[movie]
+        return result
@@ -0,0 +1,205 @@
+# ranking_service.py
+# Read API for CineRank rankings. The star schema is loaded once into a RankingIndex and queries are
+# answered from memory through a bounded LRU result cache. A background poller watches EtlLoadLog and
+# swaps in a fresh index (and drops the cache) when a new ETL load has completed.
+#
+#   uvicorn --factory utils.ranking_service:create_app --port 8000
+#   GET /movies/top?genre=Drama&year=1999&country=us&movie_type=movie&min_votes=1000&limit=10
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query
+from pydantic import BaseModel
+
+from utils.datasetup import AzureDB
+from utils.ranking_index import RankingIndex
+
+
+class LRUCache:
+    # Thread-safe bounded mapping; the least recently used entry is evicted first
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RankedMovie(BaseModel):
+    MovieID: str
+    MovieTitle: Optional[str] = None
+    OriginalTitle: Optional[str] = None
+    PosterString: Optional[str] = None
+    OriginalLanguage: Optional[str] = None
+    Rating: float
+    NumRatings: int
+    ReleaseYear: int
+    Popularity: float
+    MovieType: Optional[str] = None
+    CountryID: str
+    CountryName: Optional[str] = None
+    Genres: List[str]
+
+
+class TopMoviesResponse(BaseModel):
+    version: Optional[str]
+    cached: bool
+    movies: List[RankedMovie]
+
+
+class RankingService:
+    # Holds the current index and its result cache. loader() returns a fresh RankingIndex and
+    # version() the id of the latest completed load; the index is rebuilt when that id changes.
+    def __init__(self, loader, version=None, cache_size: int = 4096):
+        self.loader = loader
+        self.version = version or (lambda: None)
+        self.cache = LRUCache(cache_size)
+        self.index = None
+        self.loaded_at = None
+        self._reload_lock = threading.Lock()
+
+    @classmethod
+    def from_database(cls, database=None, cache_size: int = 4096):
+        database = database or AzureDB()
+        return cls(lambda version: RankingIndex.from_database(database, version=version),
+                   version=database.latest_load, cache_size=cache_size)
+
+    def refresh(self, force: bool = False):
+        # Rebuild outside the request path, then swap index and cache together; returns True when reloaded
+        with self._reload_lock:
+            version = self.version()
+            if not force and self.index is not None and version == self.index.version:
+                return False
+            index = self.loader(version)
+            self.index = index
+            self.cache.clear()
+            self.loaded_at = time.time()
+            return True
+
+    def top(self, genre=None, year=None, country=None, movie_type=None, min_votes: int = 0, limit: int = 10):
+        index = self.index
+        if index is None:
+            raise RuntimeError("The ranking index has not been loaded yet")
+        # The index version is part of the key, so a lookup racing a reload never returns stale rows
+        key = (index.version, str(genre).lower() if genre is not None else None, year,
+               str(country).lower() if country is not None else None,
+               str(movie_type).lower() if movie_type is not None else None, min_votes, limit)
+        movies = self.cache.get(key)
+        if movies is not None:
+            return movies, True, index.version
+        movies = index.top(genre=genre, year=year, country=country, movie_type=movie_type,
+                           min_votes=min_votes, limit=limit)
+        self.cache.put(key, movies)
+        return movies, False, index.version
+
+    def stats(self):
+        index = self.index
+        return {
+            "version": index.version if index is not None else None,
+            "rows": len(index) if index is not None else 0,
+            "index_bytes": index.nbytes if index is not None else 0,
+            "loaded_at": self.loaded_at,
+            "cache_entries": len(self.cache),
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+        }
+
+
+def _poll(service: RankingService, interval: float, stop: threading.Event):
+    while not stop.wait(interval):
+        try:
+            if service.refresh():
+                print(f"🔄 Ranking index reloaded for load {service.index.version}")
+        except Exception as ex:
+            # Keep serving the current index; the next poll retries
+            print(f"⚠️ Ranking index reload failed: {ex}")
+
+
+def admin_guard(admin_token: str = None):
+    # Dependency for admin endpoints: a matching "Authorization: Bearer <admin_token>" header is required, and
+    # without a configured token the endpoints are off (reloads are left to the EtlLoadLog poller)
+    def guard(authorization: Optional[str] = Header(None)):
+        if not admin_token:
+            raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+        scheme, _, token = (authorization or "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), admin_token.encode()):
+            raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+    return guard
+
+
+def create_app(service: RankingService = None, poll_interval: float = 30.0, max_limit: int = 100,
+               admin_token: str = None):
+    service = service or RankingService.from_database()
+    admin_token = admin_token or os.getenv("RANKING_ADMIN_TOKEN")
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        service.refresh(force=service.index is None)
+        stop = threading.Event()
+        poller = None
+        if poll_interval:
+            poller = threading.Thread(target=_poll, args=(service, poll_interval, stop), daemon=True)
+            poller.start()
+        yield
+        stop.set()
+        if poller is not None:
+            poller.join()
+
+    app = FastAPI(title="CineRank", lifespan=lifespan)
+    app.state.ranking_service = service
+
+    # Plain def endpoints run in the threadpool, so index scans never block the event loop
+    @app.get("/movies/top", response_model=TopMoviesResponse)
+    def top_movies(genre: Optional[str] = Query(None, description="GenreID or genre name"),
+                   year: Optional[int] = None,
+                   country: Optional[str] = Query(None, description="Country code, e.g. us"),
+                   movie_type: Optional[str] = Query(None, description="MovieTypeID or name, e.g. movie"),
+                   min_votes: int = Query(0, ge=0),
+                   limit: int = Query(10, ge=1, le=max_limit)):
+        try:
+            movies, cached, version = service.top(genre=genre, year=year, country=country, movie_type=movie_type,
+                                                  min_votes=min_votes, limit=limit)
+        except RuntimeError as ex:
+            raise HTTPException(status_code=503, detail=str(ex))
+        return {"version": version, "cached": cached, "movies": movies}
+
+    @app.get("/health")
+    def health():
+        return service.stats()
+
+    @app.post("/admin/reload", dependencies=[Depends(admin_guard(admin_token))])
+    def reload():
+        # Push-style invalidation, e.g. from the ETL host right after a load; every call rereads the whole
+        # star schema, so it needs the admin token
+        service.refresh(force=True)
+        return service.stats()
+
+    return app
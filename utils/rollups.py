@@ -0,0 +1,135 @@
+# rollups.py
+# Pre-aggregated rollups of MovieGenreFact_dim for dashboards: one small table per group-by (genre x year,
+# genre x country, movie type x year, ...) with counts, sums, averages, the vote-weighted rating and a
+# Bayesian-adjusted rating. Only additive sums are accumulated, so the rollups can be built from the whole
+# fact table or partition by partition, and re-loading them only touches the groups whose numbers changed.
+import numpy as np
+import pandas as pd
+
+from utils.incremental_loader import add_row_hash
+from utils.instrumentation import span
+
+# Rollup table -> group-by columns
+ROLLUPS = {
+    "GenreYear_rollup": ['GenreID', 'ReleaseYear'],
+    "GenreCountry_rollup": ['GenreID', 'CountryID'],
+    "MovieTypeYear_rollup": ['MovieTypeID', 'ReleaseYear'],
+    "CountryYear_rollup": ['CountryID', 'ReleaseYear'],
+    "Genre_rollup": ['GenreID'],
+    "Country_rollup": ['CountryID'],
+    "MovieType_rollup": ['MovieTypeID'],
+}
+
+# SQL Server types of the key columns, for the primary keys
+KEY_TYPES = {'GenreID': 'INT', 'ReleaseYear': 'INT', 'MovieTypeID': 'INT', 'CountryID': 'VARCHAR(20)'}
+
+
+class RollupBuilder:
+    # add() the fact table, whole or in partitions that keep each movie's rows together
+    # (fact_partitions hashes on MovieID), then tables() returns every rollup.
+    # Movies are counted once per group: a movie has one fact row per genre, so rollups without GenreID
+    # would otherwise count it once per genre.
+    def __init__(self, rollups: dict = None, prior_votes: int = 25_000):
+        self.rollups = rollups or ROLLUPS
+        # Bayesian prior: every group is shrunk towards the overall rating as if it had prior_votes more votes
+        self.prior_votes = prior_votes
+        self._partials = {name: [] for name in self.rollups}
+        self._totals = []
+
+    def add(self, fact_table: pd.DataFrame):
+        with span("transform.rollups.add", rows_in=len(fact_table)):
+            fact = fact_table[['MovieID', 'GenreID', 'MovieTypeID', 'CountryID', 'Rating', 'NumRatings',
+                               'ReleaseYear', 'Popularity']]
+            fact = fact.assign(WeightedRating=fact['Rating'] * fact['NumRatings'])
+            # Year, country and movie type are per-movie attributes, so these two cover every rollup
+            movie_genres = fact.drop_duplicates(['MovieID', 'GenreID'])
+            movies = movie_genres.drop_duplicates('MovieID')
+            self._totals.append((movies['WeightedRating'].sum(), movies['NumRatings'].sum()))
+            for name, keys in self.rollups.items():
+                rows = movie_genres if 'GenreID' in keys else movies
+                self._partials[name].append(rows.groupby(keys, sort=False).agg(
+                    MovieCount=('MovieID', 'size'),
+                    RatingSum=('Rating', 'sum'),
+                    NumRatingsSum=('NumRatings', 'sum'),
+                    WeightedRatingSum=('WeightedRating', 'sum'),
+                    PopularitySum=('Popularity', 'sum'),
+                ))
+        return self
+
+    def prior_rating(self):
+        # Vote-weighted rating of all movies, rounded so small fact changes don't move every group's Bayesian rating
+        weighted, votes = np.sum(self._totals, axis=0) if self._totals else (0.0, 0.0)
+        return round(float(weighted / votes), 2) if votes else 0.0
+
+    def tables(self):
+        prior = self.prior_rating()
+        tables = {}
+        with span("transform.rollups", rows_in=sum(len(p) for partials in self._partials.values() for p in partials)) as stage:
+            for name, keys in self.rollups.items():
+                partials = self._partials[name]
+                if not partials:
+                    continue
+                rollup = pd.concat(partials).groupby(level=keys, sort=True).sum().reset_index()
+                rollup['MovieCount'] = rollup['MovieCount'].astype('int64')
+                rollup['NumRatingsSum'] = rollup['NumRatingsSum'].round().astype('int64')
+                votes = rollup['NumRatingsSum'].to_numpy(dtype=np.float64)
+                rollup['AvgRating'] = rollup['RatingSum'] / rollup['MovieCount']
+                rollup['VoteWeightedRating'] = rollup['WeightedRatingSum'] / np.where(votes > 0, votes, np.nan)
+                rollup['BayesianRating'] = (rollup['WeightedRatingSum'] + prior * self.prior_votes) / (votes + self.prior_votes)
+                rollup['AvgPopularity'] = rollup['PopularitySum'] / rollup['MovieCount']
+                # Derived columns rounded so recomputing identical sums gives identical row hashes
+                derived = ['AvgRating', 'VoteWeightedRating', 'BayesianRating', 'AvgPopularity']
+                rollup[derived] = rollup[derived].round(4)
+                rollup[['RatingSum', 'WeightedRatingSum', 'PopularitySum']] = \
+                    rollup[['RatingSum', 'WeightedRatingSum', 'PopularitySum']].round(4)
+                for key in keys:
+                    if pd.api.types.is_float_dtype(rollup[key]):
+                        rollup[key] = rollup[key].astype('int64')
+                tables[name] = rollup
+            stage.rows_out = sum(len(table) for table in tables.values())
+            stage.attrs["prior_rating"] = prior
+        return tables
+
+
+def compute_rollups(fact_table: pd.DataFrame, rollups: dict = None, prior_votes: int = 25_000):
+    return RollupBuilder(rollups, prior_votes).add(fact_table).tables()
+
+
+class RollupPartitionSink:
+    # Wraps a partition sink so partitioned fact generation feeds the rollups on the way through
+    def __init__(self, sink, builder: RollupBuilder):
+        self.sink = sink
+        self.builder = builder
+        # Partitions have to reach this process to be aggregated
+        self.in_workers = False
+
+    def write(self, partition: int, fact_table: pd.DataFrame):
+        self.builder.add(fact_table)
+        self.sink.write(partition, fact_table)
+
+    def close(self):
+        self.sink.close()
+
+
+def add_rollup_keys(database, table_name: str, keys: list):
+    # Composite primary key on the group columns (SQL Server only; a sqlite stand-in keeps the plain table)
+    if database.engine.dialect.name != "mssql":
+        return
+    with database.engine.begin() as con:
+        for key in keys:
+            con.exec_driver_sql(f"ALTER TABLE [dbo].[{table_name}] ALTER COLUMN [{key}] {KEY_TYPES[key]} NOT NULL")
+        key_list = ", ".join(f"[{key}]" for key in keys)
+        con.exec_driver_sql(f"ALTER TABLE [dbo].[{table_name}] ADD CONSTRAINT [PK_{table_name}] PRIMARY KEY CLUSTERED ({key_list})")
+
+
+def load_rollups(database, tables: dict, incremental: bool = False, rollups: dict = None):
+    # Full loads replace each rollup table; incremental loads merge only the groups whose row hash changed
+    # and delete groups that disappeared. Row hashes are always stored so either mode can follow the other.
+    rollups = rollups or ROLLUPS
+    for name, table in tables.items():
+        keys = rollups[name]
+        if incremental and database.incremental_loader.can_upsert(name):
+            database.incremental_loader.upsert(name, table, keys)
+        else:
+            database.bulk_loader.load(name, add_row_hash(table), if_exists="replace")
+            add_rollup_keys(database, name, keys)
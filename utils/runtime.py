@@ -0,0 +1,110 @@
+# runtime.py
+# Process-wide pipeline context: owns the blob service client and the SQL engine, creates them on
+# first use and shares them between every AzureDB instance. Azure SDK, pyodbc and engine startup
+# costs are only paid by commands that actually touch blob storage or SQL.
+import os
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def sql_url():
+    username = os.environ.get('USERNAME_AZURE')
+    password = os.environ.get('PASSWORD')
+    server = os.environ.get('SERVER')
+    database = os.environ.get('DATABASE')
+    return f'mssql+pyodbc://{username}:{password}@{server}/{database}?driver=ODBC+Driver+18+for+SQL+Server'
+
+
+class PipelineRuntime:
+    def __init__(self, sql_url: str = None, pool_size: int = 5, max_overflow: int = 10, pool_recycle: int = 1800,
+                 blob_pool_size: int = 16, blob_service_client=None, engine=None):
+        self.sql_url = sql_url
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_recycle = pool_recycle  # Azure SQL drops idle connections after ~30 minutes
+        self.blob_pool_size = blob_pool_size
+        self._blob_service_client = blob_service_client
+        self._engine = engine
+        self._credential = None
+        self._container_clients = {}
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        with self._lock:
+            if self._engine is None:
+                from sqlalchemy import create_engine
+
+                url = self.sql_url or sql_url()
+                kwargs = {"pool_pre_ping": True}
+                if not url.startswith("sqlite"):
+                    kwargs.update(pool_size=self.pool_size, max_overflow=self.max_overflow, pool_recycle=self.pool_recycle)
+                if url.startswith("mssql+pyodbc"):
+                    # fast_executemany sends each executemany batch as one array-bound round trip
+                    kwargs["fast_executemany"] = True
+                self._engine = create_engine(url, **kwargs)
+            return self._engine
+
+    @property
+    def credential(self):
+        with self._lock:
+            if self._credential is None:
+                from azure.identity import DefaultAzureCredential
+
+                self._credential = DefaultAzureCredential()
+            return self._credential
+
+    @property
+    def blob_service_client(self):
+        with self._lock:
+            if self._blob_service_client is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from azure.core.pipeline.transport import RequestsTransport
+                from azure.storage.blob import BlobServiceClient
+
+                # Keep-alive connection pool large enough for parallel downloads and block uploads
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.blob_pool_size, pool_maxsize=self.blob_pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                transport = RequestsTransport(session=session, session_owner=False)
+                self._blob_service_client = BlobServiceClient.from_connection_string(
+                    os.getenv('AZURE_STORAGE_CONNECTION_STRING'), transport=transport)
+            return self._blob_service_client
+
+    def container_client(self, container_name: str):
+        # Container clients that AzureDB.access_container has already created or opened
+        return self._container_clients.get(container_name)
+
+    def register_container(self, container_name: str, container_client):
+        self._container_clients[container_name] = container_client
+
+    def close(self):
+        with self._lock:
+            if self._engine is not None:
+                self._engine.dispose()
+                self._engine = None
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime():
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = PipelineRuntime()
+        return _runtime
+
+
+def set_runtime(runtime: PipelineRuntime):
+    # Swap in a differently configured runtime (e.g. a sqlite engine and a local blob stand-in)
+    global _runtime
+    with _runtime_lock:
+        _runtime = runtime
+    return runtime
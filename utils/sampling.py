@@ -0,0 +1,36 @@
+# sampling.py
+# Deterministic title samples for dev runs. A title is in the sample when the Fibonacci hash of the numeric part
+# of its tconst ("tt0111161" -> 111161) falls below fraction * 2**32, so every run picks the same titles and a
+# larger fraction contains every title of a smaller one. IMDb rows (tconst) and TMDb rows (imdb_id) are sampled
+# on the same key, so each sampled TMDb row still finds its title and each fact row its movie; the small lookup
+# sources (countries, genres) are kept whole so every foreign key still resolves.
+import numpy as np
+import pandas as pd
+
+HASH_MULTIPLIER = 2654435769  # 2**32 / golden ratio
+HASH_BUCKETS = 2 ** 32
+
+
+def sample_label(fraction: float):
+    # e.g. 0.01 -> "0.01", used in sample cache and checkpoint paths
+    return f"{fraction:g}"
+
+
+def validate_fraction(fraction: float):
+    if not 0 < fraction <= 1:
+        raise ValueError(f"Sample fraction must be in (0, 1], got {fraction}")
+    return fraction
+
+
+def tconst_hash(values: pd.Series):
+    # uint64 hash per value; values that aren't "tt<digits>" get no hash (masked out by sample_mask)
+    numbers = pd.to_numeric(values.astype("string").str.extract(r"^tt(\d+)$", expand=False), errors="coerce")
+    valid = numbers.notna().to_numpy()
+    # uint64 products wrap modulo 2**64, which leaves the value modulo 2**32 intact
+    hashed = (numbers.fillna(0).to_numpy(dtype=np.uint64) * np.uint64(HASH_MULTIPLIER)) % np.uint64(HASH_BUCKETS)
+    return hashed, valid
+
+
+def sample_mask(values: pd.Series, fraction: float):
+    hashed, valid = tconst_hash(values)
+    return valid & (hashed < np.uint64(int(validate_fraction(fraction) * HASH_BUCKETS)))
@@ -0,0 +1,132 @@
+# sql_stream.py
+# Streaming query results: rows are fetched fetch_size at a time (yield_per, a server-side cursor where the
+# driver has one) and handed on batch by batch, so the first rows are available before the query has finished
+# and memory stays flat however large the result is. Batches can be encoded incrementally as NDJSON, CSV or
+# Arrow IPC stream chunks, e.g. for a file or an HTTP StreamingResponse.
+import csv
+import datetime
+import decimal
+import io
+import json
+import uuid
+
+from sqlalchemy import text
+
+FORMATS = ("ndjson", "csv", "arrow")
+
+
+def iter_sql_batches(engine, query, params: dict = None, fetch_size: int = 10_000):
+    # Yields (column names, list of row tuples) per batch of at most fetch_size rows
+    statement = text(query) if isinstance(query, str) else query
+    with engine.connect() as con:
+        result = con.execution_options(yield_per=fetch_size).execute(statement, params or {})
+        columns = list(result.keys())
+        empty = True
+        for partition in result.partitions(fetch_size):
+            empty = False
+            yield columns, [tuple(row) for row in partition]
+        if empty:
+            # Still gives writers the column names (CSV header, Arrow schema)
+            yield columns, []
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return str(value)
+
+
+def _encode_ndjson(batches):
+    for columns, rows in batches:
+        yield "".join(json.dumps(dict(zip(columns, row)), default=_json_default) + "\n" for row in rows).encode("utf-8")
+
+
+def _encode_csv(batches):
+    header = True
+    for columns, rows in batches:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        if header:
+            writer.writerow(columns)
+            header = False
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _arrow_schema(columns: list, rows: list):
+    # Types inferred from the first batch; all-NULL columns fall back to string, as their type is unknown
+    import pyarrow as pa
+
+    inferred = pa.Table.from_pylist([dict(zip(columns, row)) for row in rows]).schema if rows else None
+    fields = []
+    for column in columns:
+        field_type = inferred.field(column).type if inferred is not None else pa.null()
+        fields.append(pa.field(column, pa.string() if pa.types.is_null(field_type) else field_type))
+    return pa.schema(fields)
+
+
+def _arrow_batch(schema, columns: list, rows: list):
+    import pyarrow as pa
+
+    arrays = []
+    for position, field in enumerate(schema):
+        values = [row[position] for row in rows]
+        if pa.types.is_string(field.type):
+            values = [None if value is None else value if isinstance(value, str) else str(value) for value in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _encode_arrow(batches):
+    # Arrow IPC stream format: the schema message, then one record batch message per fetched batch
+    import pyarrow as pa
+
+    buffer = io.BytesIO()
+    writer = schema = None
+    for columns, rows in batches:
+        if writer is None:
+            schema = _arrow_schema(columns, rows)
+            writer = pa.ipc.new_stream(buffer, schema)
+        if rows:
+            writer.write_batch(_arrow_batch(schema, columns, rows))
+        yield _drain(buffer)
+    if writer is not None:
+        writer.close()
+        yield _drain(buffer)
+
+
+def _drain(buffer: io.BytesIO):
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def encode_batches(batches, format: str = "ndjson"):
+    # Bytes chunks, one per fetched batch
+    if format == "ndjson":
+        return _encode_ndjson(batches)
+    if format == "csv":
+        return _encode_csv(batches)
+    if format == "arrow":
+        return _encode_arrow(batches)
+    raise ValueError(f"Unknown export format '{format}', expected one of {', '.join(FORMATS)}")
+
+
+def write_chunks(chunks, destination):
+    # destination: a path or a binary file object; returns the bytes written
+    if isinstance(destination, (str, bytes)) or hasattr(destination, "__fspath__"):
+        with open(destination, "wb") as f:
+            return write_chunks(chunks, f)
+    written = 0
+    for chunk in chunks:
+        if chunk:
+            destination.write(chunk)
+            written += len(chunk)
+    return written
@@ -0,0 +1,228 @@
+# star_schema.py
+# Declarative DDL for the CineRank star schema. Each table is created once with right-sized final column
+# types (no NVARCHAR(max)/FLOAT defaults from to_sql, no ALTER COLUMN rewrites afterwards), bulk-filled as a
+# heap, and then every primary key, foreign key and index is built in one pass once the data is in.
+# SQL Server gets real constraints; on other engines (the sqlite stand-in) primary keys become unique
+# indexes and foreign keys are skipped, since they can't be added to an existing table there.
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy.schema import CreateTable
+
+from utils.incremental_loader import HASH_COLUMN
+from utils.instrumentation import span
+from utils.physical_design import PhysicalDesign
+
+
+class TableSpec:
+    def __init__(self, name: str, columns: list, primary_key: list, foreign_keys: list = (), indexes: list = ()):
+        self.name = name
+        # (column name, SQLAlchemy type, nullable)
+        self.columns = list(columns) + [(HASH_COLUMN, sa.BigInteger(), True)]
+        self.primary_key = primary_key
+        # (constraint name, columns, referenced table, referenced columns)
+        self.foreign_keys = list(foreign_keys)
+        # (index name, columns)
+        self.indexes = list(indexes)
+
+    @property
+    def column_names(self):
+        return [name for name, _, _ in self.columns]
+
+
+STAR_SCHEMA = {
+    "Movie_dim": TableSpec("Movie_dim", [
+        ('MovieID', sa.String(20), False),
+        ('MovieTitle', sa.Unicode(1000), True),
+        ('OriginalTitle', sa.Unicode(1000), True),
+        ('PosterString', sa.String(100), True),
+        ('OriginalLanguage', sa.String(10), True),
+        # Filled from an enriched TMDb dataset only (MainETL(movie_details=True))
+        ('Runtime', sa.SmallInteger(), True),
+        ('Budget', sa.BigInteger(), True),
+        ('Revenue', sa.BigInteger(), True),
+        ('ReleaseStatus', sa.String(20), True),
+        ('RegionalReleaseDate', sa.Date(), True),
+        ('Certification', sa.String(20), True),
+        ('WikidataID', sa.String(20), True),
+    ], ['MovieID']),
+    "Genre_dim": TableSpec("Genre_dim", [
+        ('GenreID', sa.Integer(), False),
+        ('GenreName', sa.Unicode(50), True),
+    ], ['GenreID']),
+    "Country_dim": TableSpec("Country_dim", [
+        ('CountryID', sa.String(20), False),
+        ('CountryName', sa.Unicode(100), True),
+        ('Continent', sa.String(20), True),
+        ('LanguagesSpoken', sa.Unicode(400), True),
+        ('IsEnglishSpeaking', sa.Boolean(), True),
+    ], ['CountryID']),
+    "MovieType_dim": TableSpec("MovieType_dim", [
+        ('MovieTypeName', sa.String(30), False),
+        ('MovieTypeID', sa.SmallInteger(), False),
+        ('TypeDescription', sa.Unicode(100), True),
+    ], ['MovieTypeID']),
+    "MovieGenreFact_dim": TableSpec("MovieGenreFact_dim", [
+        ('MovieID', sa.String(20), False),
+        ('GenreID', sa.Integer(), False),
+        ('MovieTypeID', sa.SmallInteger(), False),
+        ('CountryID', sa.String(20), False),
+        ('Rating', sa.Numeric(3, 1, asdecimal=False), False),
+        ('NumRatings', sa.Integer(), False),
+        ('ReleaseYear', sa.SmallInteger(), False),
+        ('Popularity', sa.Float(), False),
+    ], ['MovieID', 'GenreID'], foreign_keys=[
+        ('FK_MovieType_dim', ['MovieTypeID'], 'MovieType_dim', ['MovieTypeID']),
+        ('FK_Movie_dim', ['MovieID'], 'Movie_dim', ['MovieID']),
+        ('FK_Genre_dim', ['GenreID'], 'Genre_dim', ['GenreID']),
+        ('FK_Country_dim', ['CountryID'], 'Country_dim', ['CountryID']),
+    ], indexes=[
+        # The PK covers MovieID; the other foreign keys get their own indexes for joins and cascades
+        ('IX_MovieGenreFact_GenreID', ['GenreID']),
+        ('IX_MovieGenreFact_MovieTypeID', ['MovieTypeID']),
+        ('IX_MovieGenreFact_CountryID', ['CountryID']),
+    ]),
+}
+
+# Referenced tables first
+LOAD_ORDER = ["MovieType_dim", "Country_dim", "Movie_dim", "Genre_dim", "MovieGenreFact_dim"]
+
+
+class StarSchema:
+    def __init__(self, engine, specs: dict = None, design: PhysicalDesign = None):
+        self.engine = engine
+        self.specs = specs or STAR_SCHEMA
+        # Storage, indexes and statistics of the fact table (utils.physical_design)
+        self.design = design or PhysicalDesign()
+        self.mssql = engine.dialect.name == "mssql"
+        self.schema = "dbo" if self.mssql else None
+        self.quote = engine.dialect.identifier_preparer.quote
+
+    def __contains__(self, table_name: str):
+        return table_name in self.specs
+
+    def _table(self, table_name: str):
+        return f"{self.quote(self.schema)}.{self.quote(table_name)}" if self.schema else self.quote(table_name)
+
+    def _column_list(self, columns: list):
+        return ", ".join(self.quote(column) for column in columns)
+
+    def _names(self, table_names):
+        names = list(table_names) if table_names is not None else list(self.specs)
+        return [name for name in LOAD_ORDER if name in names] + [name for name in names if name not in LOAD_ORDER]
+
+    def sa_table(self, table_name: str):
+        # Columns and nullability only: keys are added after the bulk fill
+        spec = self.specs[table_name]
+        return sa.Table(table_name, sa.MetaData(schema=self.schema),
+                        *[sa.Column(name, type_, nullable=nullable) for name, type_, nullable in spec.columns])
+
+    def create_sql(self, table_name: str):
+        return str(CreateTable(self.sa_table(table_name)).compile(dialect=self.engine.dialect)).strip()
+
+    def drop(self, table_names: list = None):
+        # Referencing tables first; foreign keys pointing at a dropped table are removed with it
+        names = self._names(table_names)
+        inspector = sa.inspect(self.engine)
+        with self.engine.begin() as con:
+            for name in reversed(names):
+                if self.mssql:
+                    for spec in self.specs.values():
+                        for fk_name, _, referenced, _ in spec.foreign_keys:
+                            if referenced == name and spec.name not in names:
+                                con.exec_driver_sql(
+                                    f"IF OBJECT_ID(N'{self.schema}.{fk_name}', 'F') IS NOT NULL "
+                                    f"ALTER TABLE {self._table(spec.name)} DROP CONSTRAINT {self.quote(fk_name)}")
+                if inspector.has_table(name, schema=self.schema):
+                    con.exec_driver_sql(f"DROP TABLE {self._table(name)}")
+
+    def create(self, table_names: list = None):
+        with self.engine.begin() as con:
+            for name in self._names(table_names):
+                con.exec_driver_sql(self.create_sql(name))
+
+    def recreate(self, table_name: str):
+        self.drop([table_name])
+        self.create([table_name])
+
+    def conform(self, table_name: str, df: pd.DataFrame):
+        # The frame's columns in table order, with integer/boolean columns as real integers/booleans
+        # (a left join can leave whole-number columns as float64) and datetime64 DATE columns as dates
+        spec = self.specs[table_name]
+        unknown = [column for column in df.columns if column not in spec.column_names]
+        if unknown:
+            raise ValueError(f"{table_name} has no column(s) {', '.join(unknown)}")
+        missing = [name for name, _, nullable in spec.columns if not nullable and name not in df.columns]
+        if missing:
+            raise ValueError(f"{table_name} is missing required column(s) {', '.join(missing)}")
+
+        columns = {}
+        for name, type_, nullable in spec.columns:
+            if name not in df.columns:
+                continue
+            values = df[name]
+            if isinstance(type_, sa.Integer) and not pd.api.types.is_integer_dtype(values):
+                values = values.astype("Int64" if values.isna().any() else "int64")
+            elif isinstance(type_, sa.Boolean) and not pd.api.types.is_bool_dtype(values):
+                values = values.astype("boolean" if values.isna().any() else bool)
+            elif isinstance(type_, sa.Date) and not isinstance(type_, sa.DateTime) \
+                    and pd.api.types.is_datetime64_any_dtype(values):
+                values = values.dt.date.astype(object).where(values.notna(), None)
+            if not nullable and values.isna().any():
+                raise ValueError(f"{table_name}.{name} is NOT NULL but has {int(values.isna().sum())} missing values")
+            columns[name] = values
+        return pd.DataFrame(columns, index=df.index)
+
+    def key_sql(self, table_names: list = None, design: PhysicalDesign = None):
+        # Every key statement, in dependency order: primary keys (after the clustered index of the table with a
+        # physical design), then foreign keys, then indexes
+        names = self._names(table_names)
+        design = design or self.design
+        primary_keys, foreign_keys, indexes = [], [], []
+        for name in names:
+            spec = self.specs[name]
+            table = self._table(name)
+            table_design = design if name == design.table_name else None
+            spec_indexes = spec.indexes if table_design is None or table_design.fk_indexes else []
+            if self.mssql:
+                clustering = "CLUSTERED"
+                on = ""
+                if table_design is not None:
+                    primary_keys += table_design.storage_sql(self)
+                    clustering = "CLUSTERED" if table_design.clustered_primary_key else "NONCLUSTERED"
+                    on = f" ON {table_design.primary_key_filegroup}" if table_design.primary_key_filegroup else ""
+                primary_keys.append(f"ALTER TABLE {table} ADD CONSTRAINT {self.quote('PK_' + name)} "
+                                    f"PRIMARY KEY {clustering} ({self._column_list(spec.primary_key)}){on}")
+                for fk_name, columns, referenced, referenced_columns in spec.foreign_keys:
+                    foreign_keys.append(f"ALTER TABLE {table} WITH NOCHECK ADD CONSTRAINT {self.quote(fk_name)} "
+                                        f"FOREIGN KEY ({self._column_list(columns)}) "
+                                        f"REFERENCES {self._table(referenced)} ({self._column_list(referenced_columns)}) "
+                                        f"ON UPDATE CASCADE ON DELETE CASCADE")
+                for index_name, columns in spec_indexes:
+                    indexes.append(f"CREATE NONCLUSTERED INDEX {self.quote(index_name)} ON {table} "
+                                   f"({self._column_list(columns)})")
+            else:
+                primary_keys.append(f"CREATE UNIQUE INDEX {self.quote('PK_' + name)} ON {table} "
+                                    f"({self._column_list(spec.primary_key)})")
+                for index_name, columns in spec_indexes:
+                    indexes.append(f"CREATE INDEX {self.quote(index_name)} ON {table} ({self._column_list(columns)})")
+            if table_design is not None:
+                indexes += table_design.index_sql(self)
+        return primary_keys + foreign_keys + indexes
+
+    def build_keys(self, table_names: list = None, design: PhysicalDesign = None):
+        # One pass over the filled tables, in a single transaction
+        with span("load.build_keys", tables=self._names(table_names)), self.engine.begin() as con:
+            for statement in self.key_sql(table_names, design):
+                con.exec_driver_sql(statement)
+
+    def statistics_sql(self, table_names: list = None, design: PhysicalDesign = None):
+        return (design or self.design).statistics_sql(self, self._names(table_names))
+
+    def refresh_statistics(self, table_names: list = None, design: PhysicalDesign = None):
+        # After every load, full or incremental, so plans see the new row counts and value distributions
+        statements = self.statistics_sql(table_names, design)
+        if not statements:
+            return
+        with span("load.statistics", tables=self._names(table_names)), self.engine.begin() as con:
+            for statement in statements:
+                con.exec_driver_sql(statement)
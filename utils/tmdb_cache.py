@@ -0,0 +1,95 @@
+# tmdb_cache.py
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_TTL = 30 * 24 * 3600  # 30 days
+
+
+class TMDbCache:
+    # On-disk cache of TMDb responses keyed by IMDb ID (or any other request key).
+    # Empty results are stored too, so titles TMDb doesn't know about are not re-queried.
+    def __init__(self, path: str = "./data/tmdb_cache.sqlite", ttl_seconds: float = DEFAULT_TTL,
+                 max_entries: int = None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.con = sqlite3.connect(path)
+        self.con.execute(
+            "CREATE TABLE IF NOT EXISTS tmdb_cache ("
+            "key TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+            "fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.con.execute("CREATE INDEX IF NOT EXISTS ix_tmdb_cache_accessed ON tmdb_cache (accessed_at)")
+        self.con.commit()
+
+    def close(self):
+        self.con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.con.execute("SELECT COUNT(*) FROM tmdb_cache").fetchone()[0]
+
+    def _is_fresh(self, fetched_at: float, now: float):
+        return self.ttl_seconds is None or now - fetched_at < self.ttl_seconds
+
+    def get(self, key: str):
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: list, batch_size: int = 500):
+        # Returns {key: payload} for fresh entries only; stale and missing keys are left out
+        now = time.time()
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        for i in range(0, len(keys), batch_size):
+            batch = keys[i:i + batch_size]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.con.execute(
+                f"SELECT key, payload, fetched_at FROM tmdb_cache WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            for key, payload, fetched_at in rows:
+                if self._is_fresh(fetched_at, now):
+                    found[key] = json.loads(payload)
+        if found:
+            self.con.executemany(
+                "UPDATE tmdb_cache SET accessed_at = ? WHERE key = ?", [(now, key) for key in found]
+            )
+            self.con.commit()
+        return found
+
+    def missing_or_stale(self, keys: list):
+        fresh = self.get_many(keys)
+        return [key for key in dict.fromkeys(keys) if key not in fresh]
+
+    def put(self, key: str, payload):
+        self.put_many({key: payload})
+
+    def put_many(self, items: dict):
+        now = time.time()
+        self.con.executemany(
+            "INSERT OR REPLACE INTO tmdb_cache (key, payload, fetched_at, accessed_at) VALUES (?, ?, ?, ?)",
+            [(key, json.dumps(payload), now, now) for key, payload in items.items()]
+        )
+        self.con.commit()
+        self.evict()
+
+    def evict(self):
+        # Drop expired entries, then the least recently used ones above max_entries
+        if self.ttl_seconds is not None:
+            self.con.execute("DELETE FROM tmdb_cache WHERE fetched_at < ?", (time.time() - self.ttl_seconds,))
+        if self.max_entries is not None:
+            self.con.execute(
+                "DELETE FROM tmdb_cache WHERE key IN ("
+                "SELECT key FROM tmdb_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+        self.con.commit()
@@ -1,6 +1,9 @@
 # tmdb_csv_uploader.py
 from utils.datasetup import *
 from utils.dimension_classes import AzureDB
+from utils.tmdb_fetcher import MOVIE_APPEND_TO_RESPONSE, TMDB_BASE_URL, TMDbFetcher
+from utils.tmdb_cache import TMDbCache
+import os
 import requests
 import pandas as pd
 
@@ -12,23 +15,59 @@ class APICSVUploader:
         blob_name="imdb_dataset.csv"
         database=AzureDB()
         database.access_container("csv-files")
-        df = database.access_blob_csv(blob_name=blob_name)
+        df = database.access_blob_csv(blob_name=blob_name, usecols=["tconst"])
 
         imdb_ids = df["tconst"].dropna().unique().tolist()  # Drop nulls and keep unique ones
         print("Retrieved IMDb IDs:", imdb_ids)
         return imdb_ids
 
     @staticmethod
-    def get_tmdb_data_by_imdb_id(imdb_id: str):
-        url = f"https://api.themoviedb.org/3/find/{imdb_id}?external_source=imdb_id"
+    def tmdb_get(path: str, params: dict = None, base_url: str = TMDB_BASE_URL, timeout: float = 10):
         headers = {
             "accept": "application/json",
             "Authorization": f"Bearer {tmdb_api_token}"
         }
-        response = requests.get(url, headers=headers)
-        print(response.text)
+        response = requests.get(f"{base_url.rstrip('/')}/{path}", params=params, headers=headers, timeout=timeout)
+        # An error body (401, 404, 429, 5xx) must not pass for an empty result, or it would be cached as one
+        response.raise_for_status()
         data = response.json()
+        if isinstance(data, dict) and data.get("success") is False:
+            raise requests.HTTPError(f"TMDb error {data.get('status_code')}: {data.get('status_message')}", response=response)
+        return data
+
+    @staticmethod
+    def get_tmdb_data_by_imdb_id(imdb_id: str, base_url: str = TMDB_BASE_URL):
+        data = APICSVUploader.tmdb_get(f"find/{imdb_id}", params={"external_source": "imdb_id"}, base_url=base_url)
         return data.get("movie_results", [])
+
+    @staticmethod
+    def get_tmdb_movie_details(tmdb_id: int, base_url: str = TMDB_BASE_URL):
+        return APICSVUploader.tmdb_get(f"movie/{tmdb_id}", params={"append_to_response": ",".join(MOVIE_APPEND_TO_RESPONSE)},
+                                       base_url=base_url)
+
+    @staticmethod
+    def get_enriched_tmdb_data_by_imdb_id(imdb_id: str, base_url: str = TMDB_BASE_URL):
+        return [{**result, "details": APICSVUploader.get_tmdb_movie_details(result["id"], base_url=base_url)}
+                for result in APICSVUploader.get_tmdb_data_by_imdb_id(imdb_id, base_url=base_url)]
+
+    @staticmethod
+    def flatten_movie_details(details: dict, region: str = "US"):
+        # The /movie/{id} response (with release_dates and external_ids appended) as flat columns.
+        # TMDb reports an unknown runtime, budget or revenue as 0, so those become empty
+        release_dates = next((country["release_dates"] for country in details.get("release_dates", {}).get("results", [])
+                              if country.get("iso_3166_1") == region), [])
+        # Theatrical release first (type 3), then limited (2), then anything else; earliest date within a type
+        release_dates = sorted(release_dates, key=lambda r: ({3: 0, 2: 1}.get(r.get("type"), 2), r.get("release_date") or ""))
+        certification = next((r["certification"] for r in release_dates if r.get("certification")), None)
+        return {
+            "runtime": details.get("runtime") or None,
+            "budget": details.get("budget") or None,
+            "revenue": details.get("revenue") or None,
+            "status": details.get("status"),
+            "regional_release_date": release_dates[0]["release_date"][:10] if release_dates else None,
+            "certification": certification,
+            "wikidata_id": details.get("external_ids", {}).get("wikidata_id"),
+        }
     
     @staticmethod
     def convert_json_to_csv(json_data: list, output_path: str):
@@ -41,29 +80,164 @@ class APICSVUploader:
         print(f"CSV saved to {output_path}") 
 
     @staticmethod
-    def generate_tmdb_csv(imdb_ids: list, output_path: str = "./data/tmdb_dataset.csv"):
+    def iter_tmdb_data(imdb_ids: list, concurrent: bool = False, max_workers: int = 8,
+                       requests_per_second: float = 40, base_url: str = None, enrich: bool = False):
+        # Yields (imdb_id, movie_results, error) for each ID.
+        # enrich=True adds each result's /movie/{id} details, release dates and external IDs under "details"
+        if not concurrent:
+            fetch = APICSVUploader.get_enriched_tmdb_data_by_imdb_id if enrich else APICSVUploader.get_tmdb_data_by_imdb_id
+            for imdb_id in imdb_ids:
+                print(f"Fetching data for {imdb_id}")
+                try:
+                    yield imdb_id, fetch(imdb_id, base_url=base_url or TMDB_BASE_URL), None
+                except requests.RequestException as ex:
+                    yield imdb_id, [], ex
+            return
+
+        # Fetched over a pooled session by a bounded thread pool
+        fetcher_kwargs = {"max_workers": max_workers, "requests_per_second": requests_per_second}
+        if base_url:
+            fetcher_kwargs["base_url"] = base_url
+        with TMDbFetcher(tmdb_api_token, **fetcher_kwargs) as fetcher:
+            yield from fetcher.fetch_many(imdb_ids, fetch=fetcher.find_and_enrich if enrich else None)
+
+    @staticmethod
+    def iter_fetched(imdb_ids: list, cache: TMDbCache = None, cache_batch_size: int = 500, **fetch_kwargs):
+        # Yields (imdb_id, movie_results) for every ID that was fetched successfully.
+        # With a cache, results (including empty ones) are written back in batches as they arrive.
+        enrich = fetch_kwargs.get("enrich", False)
+        pending = {}
+        for imdb_id, data, error in APICSVUploader.iter_tmdb_data(imdb_ids, **fetch_kwargs):
+            if error is not None:
+                print(f"❌ Failed to fetch {imdb_id}: {error}")
+                continue
+            yield imdb_id, data
+            if cache is not None:
+                pending[APICSVUploader.cache_key(imdb_id, enrich)] = data
+                if len(pending) >= cache_batch_size:
+                    cache.put_many(pending)
+                    pending = {}
+        if cache is not None and pending:
+            cache.put_many(pending)
+
+    @staticmethod
+    def cache_key(imdb_id: str, enrich: bool = False):
+        # Enriched results are cached apart from the plain /find ones
+        return f"movie_details/{imdb_id}" if enrich else imdb_id
+
+    @staticmethod
+    def get_cached(cache: TMDbCache, imdb_ids: list, enrich: bool = False):
+        # {imdb_id: movie_results} for the IDs with a fresh cache entry
+        keys = {APICSVUploader.cache_key(imdb_id, enrich): imdb_id for imdb_id in imdb_ids}
+        return {keys[key]: data for key, data in cache.get_many(list(keys)).items()}
+
+    @staticmethod
+    def fetch_tmdb_data(imdb_ids: list, cache: TMDbCache = None, cache_batch_size: int = 500, **fetch_kwargs):
+        # Returns {imdb_id: movie_results} for every ID that was fetched successfully
+        return dict(APICSVUploader.iter_fetched(imdb_ids, cache=cache, cache_batch_size=cache_batch_size, **fetch_kwargs))
+
+    @staticmethod
+    def records_for_id(imdb_id: str, movie_results: list):
+        # Each record tagged with its imdb_id; enriched results have their details flattened into extra columns
+        records = []
+        for item in movie_results:
+            if "details" in item:
+                details = item["details"]
+                item = {key: value for key, value in item.items() if key != "details"}
+                item.update(APICSVUploader.flatten_movie_details(details))
+            records.append({**item, 'imdb_id': imdb_id})
+        return records
+
+    @staticmethod
+    def records_from_results(imdb_ids: list, results_by_id: dict):
+        # Flatten results in input order
         combined_data = []
         for imdb_id in imdb_ids:
-            print(f"Fetching data for {imdb_id}")
-            data = APICSVUploader.get_tmdb_data_by_imdb_id(imdb_id)
-            for item in data:
-                item['imdb_id'] = imdb_id # Add imdb_id to each record
-                combined_data.append(item)
-        APICSVUploader.convert_json_to_csv(combined_data, output_path)
+            combined_data.extend(APICSVUploader.records_for_id(imdb_id, results_by_id.get(imdb_id, [])))
+        return combined_data
 
     @staticmethod
-    def get_tmdb_genre_list():
-        url = "https://api.themoviedb.org/3/genre/movie/list?language=en"
-        headers = {
-            "accept": "application/json",
-            "Authorization": f"Bearer {tmdb_api_token}"
-        }
-        response = requests.get(url, headers=headers)
-        print(response.text)
-        data = response.json()
-        return data.get("genres", [])
+    def generate_tmdb_csv(imdb_ids: list, output_path: str = "./data/tmdb_dataset.csv", concurrent: bool = False,
+                          max_workers: int = 8, requests_per_second: float = 40, base_url: str = None,
+                          cache: TMDbCache = None, enrich: bool = False):
+        fetch_kwargs = {"concurrent": concurrent, "max_workers": max_workers,
+                        "requests_per_second": requests_per_second, "base_url": base_url, "enrich": enrich}
+        if cache is None:
+            results_by_id = APICSVUploader.fetch_tmdb_data(imdb_ids, **fetch_kwargs)
+            combined_data = APICSVUploader.records_from_results(imdb_ids, results_by_id)
+            APICSVUploader.convert_json_to_csv(combined_data, output_path)
+            return
+
+        # Incremental mode: only hit the API for IDs that are missing from the cache or stale
+        cached = APICSVUploader.get_cached(cache, imdb_ids, enrich)
+        to_fetch = [imdb_id for imdb_id in dict.fromkeys(imdb_ids) if imdb_id not in cached]
+        print(f"♻️ {len(cached)} IMDb IDs served from cache, {len(to_fetch)} to fetch")
+        fetched = APICSVUploader.fetch_tmdb_data(to_fetch, cache=cache, **fetch_kwargs)
+        APICSVUploader.merge_tmdb_csv(imdb_ids, fetched, cached, output_path)
+
+    @staticmethod
+    def stream_tmdb_to_blob(imdb_ids: list, blob_name: str = "tmdb_dataset.csv", container_name: str = "csv-files",
+                            concurrent: bool = True, max_workers: int = 8, requests_per_second: float = 40,
+                            base_url: str = None, cache: TMDbCache = None, block_size: int = 8 * 1024 * 1024,
+                            max_concurrency: int = 4, database: AzureDB = None, enrich: bool = False):
+        # Records go straight to the blob as they are fetched: encoded batch by batch (CSV, .csv.gz or .parquet by
+        # the blob's name), staged as blocks in parallel with the fetching and committed in one go at the end,
+        # so neither the records nor the file are ever held whole. A failed run leaves the old blob in place.
+        # Records are written in the order they arrive.
+        fetch_kwargs = {"concurrent": concurrent, "max_workers": max_workers,
+                        "requests_per_second": requests_per_second, "base_url": base_url, "enrich": enrich}
+        database = database or AzureDB()
+        database.access_container(container_name)
+        to_fetch = list(dict.fromkeys(imdb_ids))
+        with database.open_blob_writer(blob_name, block_size=block_size, max_concurrency=max_concurrency) as writer:
+            if cache is not None:
+                # Only hit the API for IDs that are missing from the cache or stale
+                cached = APICSVUploader.get_cached(cache, to_fetch, enrich)
+                to_fetch = [imdb_id for imdb_id in to_fetch if imdb_id not in cached]
+                print(f"♻️ {len(cached)} IMDb IDs served from cache, {len(to_fetch)} to fetch")
+                for imdb_id, data in cached.items():
+                    writer.write_many(APICSVUploader.records_for_id(imdb_id, data))
+            for imdb_id, data in APICSVUploader.iter_fetched(to_fetch, cache=cache, **fetch_kwargs):
+                writer.write_many(APICSVUploader.records_for_id(imdb_id, data))
+        print(f"✅ {writer.rows} TMDb records streamed to blob {container_name}/{blob_name}")
+        return writer.rows
+
+    @staticmethod
+    def merge_tmdb_csv(imdb_ids: list, fetched: dict, cached: dict, output_path: str):
+        # Replace rows of re-fetched IDs in the existing CSV and add any cached IDs it is missing
+        if os.path.exists(output_path):
+            existing = pd.read_csv(output_path)
+        else:
+            existing = pd.DataFrame(columns=['imdb_id'])
+        present = set(existing['imdb_id'].dropna())
+        existing = existing[~existing['imdb_id'].isin(fetched.keys())]
+
+        updates = dict(fetched)
+        updates.update({imdb_id: data for imdb_id, data in cached.items() if imdb_id not in present})
+        new_records = APICSVUploader.records_from_results(imdb_ids, updates)
+        if not new_records:
+            print(f"✅ {output_path} already up to date")
+            return
+
+        merged = pd.DataFrame(new_records)
+        if len(existing):
+            merged = pd.concat([existing, merged], ignore_index=True)
+        merged.to_csv(output_path, index=False)
+        print(f"CSV saved to {output_path} ({len(new_records)} new or refreshed rows)")
+
+    @staticmethod
+    def get_tmdb_genre_list(base_url: str = TMDB_BASE_URL):
+        return APICSVUploader.tmdb_get("genre/movie/list", params={"language": "en"}, base_url=base_url).get("genres", [])
 
     @staticmethod
-    def generate_tmdb_movie_csv(output_path: str = "./data/tmdb_genre_list_dataset.csv"):
-        genres = APICSVUploader.get_tmdb_genre_list()
+    def generate_tmdb_movie_csv(output_path: str = "./data/tmdb_genre_list_dataset.csv", cache: TMDbCache = None,
+                                base_url: str = TMDB_BASE_URL):
+        genres = cache.get("genre/movie/list") if cache is not None else None
+        if genres is None:
+            genres = APICSVUploader.get_tmdb_genre_list(base_url=base_url)
+            # An empty list is never a real genre list, so it is not cached and the next run asks again
+            if cache is not None and genres:
+                cache.put("genre/movie/list", genres)
+        else:
+            print("♻️ Genre list served from cache")
         APICSVUploader.convert_json_to_csv(genres, output_path)
\ No newline at end of file
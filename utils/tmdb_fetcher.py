@@ -0,0 +1,180 @@
+# tmdb_fetcher.py
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+TMDB_BASE_URL = "https://api.themoviedb.org/3"
+# Sub-resources fetched with a movie's details in the same /movie/{id} request
+MOVIE_APPEND_TO_RESPONSE = ("release_dates", "external_ids")
+
+
+class RateLimiter:
+    # Token bucket shared by all worker threads: at most `rate` requests per second
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.rate <= 0:
+                    return
+                else:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        # Block every worker until the server's Retry-After window has passed
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class TMDbFetcher:
+    def __init__(self, api_token: str, base_url: str = TMDB_BASE_URL, max_workers: int = 8,
+                 requests_per_second: float = 40, max_retries: int = 5, backoff_base: float = 0.5,
+                 backoff_max: float = 30, timeout: float = 10, progress_every: int = 500):
+        self.base_url = base_url.rstrip("/")
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.progress_every = progress_every
+        self.rate_limiter = RateLimiter(requests_per_second, burst=max_workers)
+
+        # One keep-alive session with a connection pool sized to the worker count
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "accept": "application/json",
+            "Authorization": f"Bearer {api_token}"
+        })
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _retry_after(self, response):
+        # Retry-After may be delta-seconds or an HTTP date
+        value = response.headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _backoff(self, attempt: int):
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get_json(self, path: str, params: dict = None):
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code == 429:
+                wait = self._retry_after(response)
+                if wait is None:
+                    wait = self._backoff(attempt)
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+                self.rate_limiter.pause(wait)
+                continue
+            if response.status_code >= 500:
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+                time.sleep(self._backoff(attempt))
+                continue
+
+            response.raise_for_status()
+            data = response.json()
+            # TMDb error payloads ({"success": false, "status_code": 34, ...}) must never pass for a result
+            if isinstance(data, dict) and data.get("success") is False:
+                raise requests.HTTPError(f"TMDb error {data.get('status_code')}: {data.get('status_message')}",
+                                         response=response)
+            return data
+
+    def find_by_imdb_id(self, imdb_id: str):
+        data = self.get_json(f"find/{imdb_id}", params={"external_source": "imdb_id"})
+        return data.get("movie_results", [])
+
+    def movie_details(self, tmdb_id: int, append_to_response: tuple = MOVIE_APPEND_TO_RESPONSE):
+        # Details plus every appended sub-resource in one request
+        return self.get_json(f"movie/{tmdb_id}", params={"append_to_response": ",".join(append_to_response)})
+
+    def find_and_enrich(self, imdb_id: str):
+        # /find results, each with its /movie/{id} details under "details": one extra request per title
+        return [{**result, "details": self.movie_details(result["id"])} for result in self.find_by_imdb_id(imdb_id)]
+
+    def fetch_many(self, imdb_ids: list, fetch=None):
+        # Yields (imdb_id, results, error) as they complete
+        fetch = fetch or self.find_by_imdb_id
+        total = len(imdb_ids)
+        done = failed = 0
+        start = time.monotonic()
+        print(f"🚀 Fetching {total} TMDb records with {self.max_workers} workers")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # A bounded window of submitted requests, so results are handed on as they arrive instead of
+            # piling up in finished futures while a slow consumer (e.g. a blob writer) catches up
+            remaining = iter(imdb_ids)
+            futures = {}
+
+            def submit(count):
+                for imdb_id in itertools.islice(remaining, count):
+                    futures[executor.submit(fetch, imdb_id)] = imdb_id
+
+            submit(self.max_workers * 4)
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                submit(len(finished))
+                for future in finished:
+                    imdb_id = futures.pop(future)
+                    try:
+                        results, error = future.result(), None
+                    except Exception as ex:
+                        results, error = [], ex
+                        failed += 1
+                    done += 1
+                    if done % self.progress_every == 0 or done == total:
+                        elapsed = time.monotonic() - start
+                        rate = done / elapsed if elapsed > 0 else 0.0
+                        print(f"📈 {done}/{total} fetched ({failed} failed) - {rate:.1f} req/s")
+                    yield imdb_id, results, error